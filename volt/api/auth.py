@@ -16,6 +16,7 @@
 from oslo.config import cfg
 import webob.exc
 
+from volt.api import token_cache
 from volt.common import policy
 from volt.common import wsgi
 from volt.common import context
@@ -57,10 +58,6 @@ class BaseContextMiddleware(wsgi.Middleware):
 
 
 class ContextMiddleware(BaseContextMiddleware):
-    def __init__(self, app):
-        self.policy_enforcer = policy.Enforcer()
-        super(ContextMiddleware, self).__init__(app)
-
     def process_request(self, req):
         """Convert authentication information into a request context
 
@@ -87,19 +84,34 @@ class ContextMiddleware(BaseContextMiddleware):
             'roles': [],
             'is_admin': False,
             'read_only': True,
-            'policy_enforcer': self.policy_enforcer,
+            'policy_enforcer': policy.get_enforcer(),
         }
         return context.RequestContext(**kwargs)
 
     def _get_authenticated_context(self, req):
+        #NOTE(bcwaldon): This header is deprecated in favor of X-Auth-Token
+        token = req.headers.get('X-Auth-Token',
+                                req.headers.get('X-Storage-Token'))
+        cache = token_cache.get_cache()
+        kwargs = cache.get(token) if token else None
+        if kwargs is None:
+            kwargs = self._parse_identity(req, token)
+            if token:
+                cache.put(token, kwargs)
+
+        kwargs = dict(kwargs, roles=list(kwargs['roles']),
+                      policy_enforcer=policy.get_enforcer())
+        return context.RequestContext(**kwargs)
+
+    def _parse_identity(self, req, token):
+        """ Return the arguments of the request context from the identity
+        headers which authtoken set for the token.
+        """
         #NOTE(bcwaldon): X-Roles is a csv string, but we need to parse
         # it into a list to be useful
         roles_header = req.headers.get('X-Roles', '')
         roles = [r.strip().lower() for r in roles_header.split(',')]
 
-        #NOTE(bcwaldon): This header is deprecated in favor of X-Auth-Token
-        deprecated_token = req.headers.get('X-Storage-Token')
-
         service_catalog = None
         if req.headers.get('X-Service-Catalog') is not None:
             try:
@@ -109,19 +121,16 @@ class ContextMiddleware(BaseContextMiddleware):
                 raise webob.exc.HTTPInternalServerError(
                     _('Invalid service catalog json.'))
 
-        kwargs = {
+        return {
             'user': req.headers.get('X-User-Id'),
             'tenant': req.headers.get('X-Tenant-Id'),
             'roles': roles,
             'is_admin': CONF.admin_role.strip().lower() in roles,
-            'auth_tok': req.headers.get('X-Auth-Token', deprecated_token),
+            'auth_tok': token,
             'owner_is_tenant': CONF.owner_is_tenant,
             'service_catalog': service_catalog,
-            'policy_enforcer': self.policy_enforcer,
         }
 
-        return context.RequestContext(**kwargs)
-
 
 class UnauthenticatedContextMiddleware(BaseContextMiddleware):
     def process_request(self, req):
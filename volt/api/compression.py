@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2014 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+""" Compression of the responses negotiated through Accept-Encoding.
+
+    Responses of a known length are compressed at once when they reach
+    compression_min_size. Streamed responses, e.g. the paginated listings,
+    are compressed chunk by chunk and every chunk is flushed, so the client
+    can decode what it received so far.
+"""
+import time
+import zlib
+
+from oslo.config import cfg
+
+from volt.common import stats
+from volt.common import wsgi
+from volt.openstack.common.gettextutils import _
+
+
+compression_opts = [
+    cfg.IntOpt('compression_min_size', default=1024,
+               help=_('Responses of a known length smaller than this many '
+                      'bytes are sent uncompressed.')),
+    cfg.IntOpt('compression_level', default=6,
+               help=_('zlib compression level of the responses, from 1 '
+                      '(fastest) to 9 (smallest).')),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(compression_opts)
+
+ENCODINGS = ('gzip', 'deflate')
+
+# zlib window bits of every content coding, gzip adds its header and trailer
+WBITS = {'gzip': 16 + zlib.MAX_WBITS, 'deflate': zlib.MAX_WBITS}
+
+
+def ratio():
+    """Return compressed bytes per uncompressed byte, or None."""
+    bytes_in = stats.get('compression.bytes_in')
+    if not bytes_in:
+        return None
+    return float(stats.get('compression.bytes_out')) / bytes_in
+
+
+class CompressionMiddleware(wsgi.Middleware):
+    """
+    Compresses the responses of the rest of the pipeline with gzip or
+    deflate. See api-paste.ini for its place in a pipeline.
+
+    Counts the compressed responses, their bytes before and after
+    compression and the microseconds spent in zlib in the worker counters.
+    """
+
+    def __call__(self, environ, start_response):
+        encoding = None
+        if ('HTTP_ACCEPT_ENCODING' in environ and
+                environ['REQUEST_METHOD'] != 'HEAD'):
+            encoding = wsgi.Request(environ).accept_encoding.best_match(
+                ENCODINGS)
+        if encoding is None:
+            return self.application(environ, start_response)
+
+        captured = []
+        written = []
+
+        def capture(status, headers, exc_info=None):
+            captured[:] = [status, headers, exc_info]
+            return written.append
+
+        app_iter = self.application(environ, capture)
+        body = iter(app_iter)
+        # Applications may start the response on their first chunk
+        while not captured:
+            try:
+                written.append(next(body))
+            except StopIteration:
+                break
+        if not captured:
+            # The response was never started, which the server reports
+            return app_iter
+        status, headers, exc_info = captured
+
+        length = self._get_length(status, headers)
+        if length is not None and length < CONF.compression_min_size:
+            start_response(status, headers, exc_info)
+            if not written:
+                return app_iter
+            return self._chain(written, body, app_iter)
+
+        headers = [(name, value) for name, value in headers
+                   if name.lower() != 'content-length']
+        headers.append(('Content-Encoding', encoding))
+        headers.append(('Vary', 'Accept-Encoding'))
+        compressor = zlib.compressobj(CONF.compression_level, zlib.DEFLATED,
+                                      WBITS[encoding])
+        if length is None:
+            start_response(status, headers, exc_info)
+            return self._compress_stream(compressor, written, body, app_iter)
+
+        try:
+            data = ''.join(written) + ''.join(body)
+        finally:
+            self._close(app_iter)
+        compressed = self._compress(compressor, data, zlib.Z_FINISH)
+        headers.append(('Content-Length', str(len(compressed))))
+        start_response(status, headers, exc_info)
+        return [compressed]
+
+    def _get_length(self, status, headers):
+        """
+        Returns the length of a body to compress, None if it is streamed,
+        or -1 if the response must be sent as is.
+        """
+        if status[:3] in ('204', '304'):
+            return -1
+        length = None
+        for name, value in headers:
+            name = name.lower()
+            if name == 'content-encoding':
+                return -1
+            if name == 'content-length':
+                length = int(value)
+        return length
+
+    def _compress(self, compressor, data, mode):
+        start = time.time()
+        compressed = compressor.compress(data) + compressor.flush(mode)
+        stats.incr('compression.cpu_us', int((time.time() - start) * 1e6))
+        stats.incr('compression.bytes_in', len(data))
+        stats.incr('compression.bytes_out', len(compressed))
+        if mode == zlib.Z_FINISH:
+            stats.incr('compression.responses')
+        return compressed
+
+    def _compress_stream(self, compressor, written, body, app_iter):
+        try:
+            for chunk in written:
+                yield self._compress(compressor, chunk, zlib.Z_SYNC_FLUSH)
+            for chunk in body:
+                if chunk:
+                    yield self._compress(compressor, chunk, zlib.Z_SYNC_FLUSH)
+            yield self._compress(compressor, '', zlib.Z_FINISH)
+        finally:
+            self._close(app_iter)
+
+    def _chain(self, written, body, app_iter):
+        try:
+            for chunk in written:
+                yield chunk
+            for chunk in body:
+                yield chunk
+        finally:
+            self._close(app_iter)
+
+    def _close(self, app_iter):
+        if hasattr(app_iter, 'close'):
+            app_iter.close()
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2014 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+""" ETags and conditional requests of the topology reads.
+
+    Compute nodes poll GET /volumes/query/<ID> and HEAD /volumes/<ID> to
+    learn whether their parents changed. Both responses carry an ETag and
+    a request whose If-None-Match lists it is answered with 304 Not
+    Modified.
+
+    The ETag of a query hashes the peer id and the parents of the host, so
+    every worker computes the same one. A worker remembers the ETag it
+    returned to each host with the version of the tree at that time (see
+    impl_btree.BTree.touch) and, until the tree changes, answers the next
+    conditional query of the host without running the executor. The ETag
+    of the peers of a volume is the version of its tree.
+"""
+import collections
+import hashlib
+
+from oslo.config import cfg
+
+from volt.common import stats
+from volt.openstack.common.gettextutils import _
+from volt.openstack.common import jsonutils
+
+
+conditional_opts = [
+    cfg.IntOpt('etag_cache_size', default=10000,
+               help=_('Number of hosts and volumes whose last query ETag is '
+                      'remembered by every API worker, 0 disables 304 '
+                      'responses without running the executor.')),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(conditional_opts)
+
+_CACHE = None
+
+
+def matches(if_none_match, etag):
+    """ Whether an If-None-Match header lists etag, with the weak
+    comparison of RFC 7232.
+    """
+    if etag is None:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    if etag.startswith('W/'):
+        etag = etag[2:]
+    for tag in if_none_match.split(','):
+        tag = tag.strip()
+        if tag.startswith('W/'):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+
+def not_modified(if_none_match, etag):
+    """ Whether a conditional request is answered with 304 Not Modified,
+    counted in the etag.hits and etag.misses counters.
+    """
+    if matches(if_none_match, etag):
+        stats.incr('etag.hits')
+        return True
+    stats.incr('etag.misses')
+    return False
+
+
+def hit_rate():
+    """Return the share of conditional requests answered with 304, or None."""
+    hits = stats.get('etag.hits')
+    total = hits + stats.get('etag.misses')
+    if not total:
+        return None
+    return float(hits) / total
+
+
+def query_etag(result):
+    """Return the ETag of the result of Executor.get_volume_parents."""
+    digest = hashlib.md5()
+    peer_id = result.get('peer_id') or ''
+    if isinstance(peer_id, unicode):
+        peer_id = peer_id.encode('utf-8')
+    digest.update(peer_id)
+    for parent in result.get('parents') or []:
+        encoded = getattr(parent, 'encoded', None)
+        if encoded is None:
+            encoded = jsonutils.dumps(parent, sort_keys=True)
+        digest.update('\n')
+        digest.update(encoded)
+    return 'W/"%s"' % digest.hexdigest()
+
+
+def volume_etag(executor, volume_id):
+    """Return the ETag of the peers of a volume, or None."""
+    version = executor.get_volume_version(volume_id)
+    if version is None:
+        return None
+    return 'W/"%s"' % version
+
+
+class ETagCache(object):
+    """ Bounded cache of the ETag of the last query of every host for
+    every volume, with the version of the tree it was computed at.
+
+    Once full, the oldest half is dropped.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        # (volume_id, host) -> (version, etag)
+        self.entries = collections.OrderedDict()
+
+    def get(self, key, version):
+        entry = self.entries.get(key)
+        if entry is None or entry[0] != version:
+            return None
+        return entry[1]
+
+    def put(self, key, version, etag):
+        if self.size <= 0:
+            return
+        self.entries.pop(key, None)
+        if len(self.entries) >= self.size:
+            for _i in xrange(len(self.entries) - self.size // 2):
+                self.entries.popitem(last=False)
+        self.entries[key] = (version, etag)
+
+    def clear(self):
+        self.entries.clear()
+
+
+def get_cache():
+    global _CACHE
+    if _CACHE is None:
+        _CACHE = ETagCache(CONF.etag_cache_size)
+    return _CACHE
+
+
+def cached_query_etag(executor, volume_id, host, if_none_match):
+    """ Return the ETag to answer a conditional query with 304 Not
+    Modified without running the executor, or None if the tree changed
+    since the last query of host or the ETag does not match.
+    """
+    version = executor.get_volume_version(volume_id)
+    if version is None:
+        return None
+    etag = get_cache().get((volume_id, host), version)
+    if not matches(if_none_match, etag):
+        return None
+    stats.incr('etag.hits')
+    return etag
+
+
+def store_query_etag(executor, volume_id, host, result):
+    """Return the ETag of the result of a query and remember it."""
+    etag = query_etag(result)
+    version = executor.get_volume_version(volume_id)
+    if version is not None and result.get('peer_id') is not None:
+        get_cache().put((volume_id, host), version, etag)
+    return etag
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2014 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+""" Raw WSGI handlers for heartbeats and queries of the v1 API.
+
+    These two requests make up almost all of the traffic. The middleware
+    answers them without webob, a request context or the router, with the
+    same responses as the v1 controllers. Any request it can't answer that
+    way, e.g. one with a body or one a follower has to redirect, goes down
+    the pipeline unchanged. A request the executor fails is answered with
+    the error of the controller, it is never executed twice.
+
+    Conditional queries are answered with 304 Not Modified as by the
+    controller, see volt.api.conditional.
+"""
+import uuid
+
+from oslo.config import cfg
+import webob.exc
+
+from volt.api import conditional
+from volt.api import heartbeat
+from volt.api.v1 import members
+from volt.api.v1 import volumes
+from volt.common import binary
+from volt.common import exception
+from volt.common import wsgi
+from volt import executor
+from volt.executor import replication
+from volt.executor import singleflight
+
+CONF = cfg.CONF
+CONF.import_opt('allow_anonymous_access', 'volt.api.auth')
+
+HEARTBEAT_PATH = '/v1/members/heartbeat'
+QUERY_PREFIX = '/v1/volumes/query/'
+
+
+class FastPathMiddleware(wsgi.Middleware):
+    """
+    Serves PUT /v1/members/heartbeat and GET /v1/volumes/query/<ID> in front
+    of the context middleware of either pipeline of api-paste.ini.
+    """
+
+    def __init__(self, application):
+        super(FastPathMiddleware, self).__init__(application)
+        self.executor = executor.get_default_executor()
+        self.serializer = wsgi.JSONResponseSerializer()
+
+    def __call__(self, environ, start_response):
+        try:
+            return self._serve(environ, start_response)
+        except webob.exc.HTTPError as e:
+            e.headers['x-openstack-request-id'] = 'req-%s' % uuid.uuid4()
+            return e(environ, start_response)
+
+    def _serve(self, environ, start_response):
+        result = None
+        etag = None
+        if self._is_plain(environ):
+            method = environ['REQUEST_METHOD']
+            path = environ.get('SCRIPT_NAME', '') + environ['PATH_INFO']
+            if method == 'PUT' and path == HEARTBEAT_PATH:
+                result = self._heartbeat(environ['REMOTE_ADDR'])
+            elif method == 'GET' and path.startswith(QUERY_PREFIX):
+                volume_id = path[len(QUERY_PREFIX):]
+                if volume_id and '/' not in volume_id:
+                    volume_id = volume_id.decode('utf-8', 'replace')
+                    if_none_match = environ.get('HTTP_IF_NONE_MATCH')
+                    if if_none_match:
+                        etag = conditional.cached_query_etag(
+                            self.executor, volume_id, environ['REMOTE_ADDR'],
+                            if_none_match)
+                        if etag is not None:
+                            return self._not_modified(etag, start_response)
+                    result = self._query(environ['REMOTE_ADDR'], volume_id)
+                    if result is not None:
+                        etag = conditional.store_query_etag(
+                            self.executor, volume_id, environ['REMOTE_ADDR'],
+                            result)
+                        if (if_none_match and
+                                conditional.not_modified(if_none_match,
+                                                         etag)):
+                            return self._not_modified(etag, start_response)
+        if result is None:
+            return self.application(environ, start_response)
+
+        content_type = 'application/json'
+        if 'HTTP_ACCEPT' in environ:
+            content_type = wsgi.Request(environ).best_match_content_type()
+        if content_type == binary.CONTENT_TYPE:
+            body = binary.dumps(result)
+        else:
+            body = self.serializer.to_json(result)
+        headers = [('Content-Type', content_type),
+                   ('Content-Length', str(len(body)))]
+        if etag is not None:
+            headers.append(('ETag', etag))
+        headers.append(('x-openstack-request-id', 'req-%s' % uuid.uuid4()))
+        start_response('200 OK', headers)
+        return [body]
+
+    def _not_modified(self, etag, start_response):
+        start_response('304 Not Modified',
+                       [('ETag', etag),
+                        ('x-openstack-request-id', 'req-%s' % uuid.uuid4())])
+        return []
+
+    def _is_plain(self, environ):
+        """
+        Whether the request carries nothing the rest of the pipeline would
+        act upon: no body, no method override and no identity which the
+        context middleware would reject.
+        """
+        if environ.get('CONTENT_LENGTH', '0') not in ('', '0'):
+            return False
+        if ('HTTP_TRANSFER_ENCODING' in environ or
+                '_method' in environ.get('QUERY_STRING', '') or
+                'HTTP_X_SERVICE_CATALOG' in environ):
+            return False
+        identity = environ.get('HTTP_X_IDENTITY_STATUS')
+        return (identity in (None, 'Confirmed') or
+                CONF.allow_anonymous_access)
+
+    def _heartbeat(self, host):
+        """Same as volt.api.v1.members.Controller.heartbeat"""
+        if replication.is_follower():
+            return None
+        try:
+            result = heartbeat.heartbeat(self.executor, host)
+        except exception.VoltException as e:
+            error = members.heartbeat_error(host, e)
+            if error is None:
+                raise
+            raise error
+        finally:
+            self.executor.flush()
+        return result
+
+    def _query(self, host, volume_id):
+        """Same as volt.api.v1.volumes.Controller.query"""
+        if replication.get_follower(self.executor):
+            if not self.executor.is_placed(volume_id, host):
+                return None
+        else:
+            executor.start_scanning(self.executor)
+        try:
+            return singleflight.get_volume_parents(self.executor, volume_id,
+                                                   host=host)
+        except exception.VoltException as e:
+            error = volumes.query_error(e)
+            if error is None:
+                raise
+            raise error
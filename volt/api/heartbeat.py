@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2014 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+""" Heartbeats acknowledged without looking up the parents of the host.
+
+    A heartbeat refreshes the timestamp of the host and answers the parents
+    of all its peers, which update_status looks up in every tree the host
+    joined. With async_heartbeat, a heartbeat only refreshes the timestamp
+    and answers the parents computed for the previous heartbeat of the host.
+
+    The cache listens to the topology of the executor. When the parents of
+    a host may have changed, its next heartbeat queues the host, once
+    however many heartbeats it sends meanwhile, and one of
+    heartbeat_workers greenthreads computes its parents again for the
+    following heartbeats. The first heartbeat of a host computes them
+    before it is answered.
+"""
+import os
+
+import eventlet
+from eventlet import queue
+from oslo.config import cfg
+
+from volt.common import stats
+from volt.openstack.common.gettextutils import _
+from volt.openstack.common import log as logging
+
+
+LOG = logging.getLogger(__name__)
+
+heartbeat_opts = [
+    cfg.BoolOpt('async_heartbeat', default=False,
+                help=_('Answer heartbeats with the parents computed for the '
+                       'previous heartbeat of the host, and compute them '
+                       'again in the background when they changed.')),
+    cfg.IntOpt('heartbeat_workers', default=4,
+               help=_('Number of greenthreads of every API worker computing '
+                      'the parents of the hosts for async_heartbeat.')),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(heartbeat_opts)
+
+_CACHE = None
+
+
+class HeartbeatCache(object):
+    """ The last parents of every host, registered both as a listener and
+    as a topology listener of the executor.
+    """
+
+    def __init__(self, executor, workers):
+        self.executor = executor
+        self.workers = workers
+        # host -> result of Executor.update_status
+        self.results = {}
+        # Hosts whose parents may have changed since their result
+        self.stale = set()
+        # Hosts waiting for a worker
+        self.queued = set()
+        self.queue = queue.LightQueue()
+        self.pid = None
+        self.threads = []
+
+    def __call__(self, event, payload):
+        if event == 'evict':
+            self.results.pop(payload['host'], None)
+            self.stale.discard(payload['host'])
+        elif event == 'reparent':
+            hosts = payload['hosts']
+            if hosts is None:
+                self.stale.update(self.results)
+            else:
+                self.stale.update(host for host in hosts
+                                  if host in self.results)
+
+    def heartbeat(self, host):
+        """ Refresh the timestamp of host and return the last result of
+        Executor.update_status for it.
+        """
+        if not self.executor.touch_host(host):
+            self.results.pop(host, None)
+            self.stale.discard(host)
+            return []
+        result = self.results.get(host)
+        if result is None:
+            result = self.results[host] = self.executor.update_status(host)
+        elif host in self.stale:
+            self._schedule(host)
+        return result
+
+    def _schedule(self, host):
+        if host in self.queued:
+            stats.incr('heartbeat.coalesced')
+            return
+        self.queued.add(host)
+        self.queue.put(host)
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.threads = [eventlet.spawn(self.run)
+                            for _i in xrange(self.workers)]
+
+    def run(self):
+        while True:
+            host = self.queue.get()
+            self.queued.discard(host)
+            # Changes made while computing mark the host stale again
+            self.stale.discard(host)
+            if host not in self.results:
+                continue
+            try:
+                self.results[host] = self.executor.update_status(host)
+                stats.incr('heartbeat.recomputed')
+            except Exception:
+                LOG.exception(_('Failed to compute the parents of %s'), host)
+            finally:
+                self.executor.flush()
+
+
+def get_cache(executor):
+    """ Return the cache of the worker, listening to executor from its
+    first use.
+    """
+    global _CACHE
+    if _CACHE is None:
+        _CACHE = HeartbeatCache(executor, max(1, CONF.heartbeat_workers))
+        executor.add_listener(_CACHE)
+        executor.add_topology_listener(_CACHE)
+    return _CACHE
+
+
+def heartbeat(executor, host):
+    """ Executor.update_status, or its cached result with
+    async_heartbeat.
+    """
+    if CONF.async_heartbeat:
+        return get_cache(executor).heartbeat(host)
+    return executor.update_status(host=host)
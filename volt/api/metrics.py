@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2014 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+""" Request metrics and the /metrics endpoint.
+
+    Every request is counted by method, route (see
+    volt.api.ratelimit.route_path) and status, and its latency until the
+    response started is recorded in the histogram of its method and route.
+    The methods and the paths clients make up are folded into the OTHER
+    method and the unmatched route, so that they can't add series.
+    GET /metrics returns them with the executor call latencies and the
+    counters of the worker, in the text format of Prometheus.
+"""
+import time
+
+from volt.api import ratelimit
+from volt.common import metrics
+from volt.common import wsgi
+
+METRICS_PATH = '/metrics'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+METHODS = frozenset(['GET', 'HEAD', 'POST', 'PUT', 'DELETE'])
+OTHER_METHOD = 'OTHER'
+UNMATCHED_ROUTE = 'unmatched'
+
+
+def request_labels(method, path):
+    """Return the method and route labels of a request."""
+    if method not in METHODS:
+        method = OTHER_METHOD
+    route = ratelimit.route_path(path)
+    if route not in ratelimit.ROUTES:
+        route = UNMATCHED_ROUTE
+    return method, route
+
+
+class MetricsMiddleware(wsgi.Middleware):
+    """
+    Records the metrics of the requests to the rest of the pipeline and
+    serves /metrics. It goes first in a pipeline of api-paste.ini, so
+    that the requests rejected by the other filters are counted too.
+    """
+
+    def __call__(self, environ, start_response):
+        method = environ['REQUEST_METHOD']
+        path = environ.get('SCRIPT_NAME', '') + environ.get('PATH_INFO', '')
+        if path == METRICS_PATH and method in ('GET', 'HEAD'):
+            return self._export(method, start_response)
+
+        statuses = []
+
+        def _start_response(status, headers, exc_info=None):
+            statuses.append(status[:3])
+            if exc_info is None:
+                return start_response(status, headers)
+            return start_response(status, headers, exc_info)
+
+        start = time.time()
+        try:
+            return self.application(environ, _start_response)
+        finally:
+            method, route = request_labels(method, path)
+            metrics.record_request(method, route,
+                                   statuses[-1] if statuses else '500',
+                                   time.time() - start)
+
+    def _export(self, method, start_response):
+        body = metrics.export()
+        start_response('200 OK', [('Content-Type', CONTENT_TYPE),
+                                  ('Content-Length', str(len(body)))])
+        return [body] if method == 'GET' else []
@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2014 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+""" Admission control of the API requests.
+
+    Every host has a token bucket per route, e.g. one for its heartbeats
+    and one for its queries, which refills at rate_limit_per_second up to
+    rate_limit_burst requests. A request finding its bucket empty is
+    answered with 429 Too Many Requests and a Retry-After header, before
+    any other work. Besides, a worker serves at most max_concurrent_requests
+    requests at once, the long polls of watch and events excepted, so that
+    a storm can't take all the greenthreads of the server pool.
+
+    A bucket which stayed idle long enough to refill completely behaves as
+    a new one, such buckets are dropped when rate_limit_max_buckets is
+    reached and at least every time a bucket refills. If all buckets are
+    still in use, the least recently used half is dropped.
+"""
+import math
+import time
+
+from oslo.config import cfg
+
+from volt.common import stats
+from volt.common import wsgi
+from volt.openstack.common.gettextutils import _
+
+
+ratelimit_opts = [
+    cfg.FloatOpt('rate_limit_per_second', default=10.0,
+                 help=_('Requests per second a host is allowed to send to '
+                        'each route, e.g. to PUT /v1/members/heartbeat, '
+                        'over the long run. 0 disables the limit.')),
+    cfg.IntOpt('rate_limit_burst', default=50,
+               help=_('Requests a host is allowed to send to each route at '
+                      'once, after it has been idle.')),
+    cfg.IntOpt('rate_limit_max_buckets', default=65536,
+               help=_('Number of hosts and routes whose token bucket is '
+                      'kept by every worker.')),
+    cfg.ListOpt('rate_limit_exempt_hosts', default=[],
+                help=_('Addresses which are never rate limited, e.g. those '
+                       'of the replication followers.')),
+    cfg.IntOpt('max_concurrent_requests', default=800,
+               help=_('Requests a worker serves at once, the others are '
+                      'answered with 429 Too Many Requests. Keep it below '
+                      'wsgi_default_pool_size. 0 disables the cap.')),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(ratelimit_opts)
+
+# The segments of the request paths which are part of the routes, the
+# others are identifiers
+ROUTE_SEGMENTS = frozenset([
+    'v1', 'volumes', 'query', 'register', 'remove', 'members', 'heartbeat',
+    'watch', 'events', 'replication', 'status', 'snapshot', 'journal',
+    'stats', 'profile',
+])
+
+# The routes of the API as returned by route_path
+ROUTES = frozenset([
+    '/', '/v1', '/v1/', '/v1/volumes', '/v1/volumes/*', '/v1/volumes/*/*',
+    '/v1/volumes/query', '/v1/volumes/query/*', '/v1/volumes/register',
+    '/v1/volumes/remove', '/v1/members/heartbeat', '/v1/members/watch',
+    '/v1/events', '/v1/replication/status', '/v1/replication/snapshot',
+    '/v1/replication/journal', '/v1/stats', '/v1/profile',
+])
+
+# Long polls, which wait most of the time and are left out of the cap, the
+# watches have their own, see watch_max_parked
+LONG_POLL_ROUTES = frozenset(['GET /v1/members/watch', 'GET /v1/events',
+                              'GET /v1/profile'])
+
+
+def route_path(path):
+    """ Return the route of a request path, e.g. /v1/volumes/query/* for
+    /v1/volumes/query/<ID>.
+    """
+    segments = path.split('/')
+    for index, segment in enumerate(segments):
+        if segment and segment not in ROUTE_SEGMENTS:
+            segments[index] = '*'
+    return '/'.join(segments)
+
+
+def route_of(method, path):
+    """ Return the route of a request, e.g. GET /v1/volumes/query/* for
+    GET /v1/volumes/query/<ID>.
+    """
+    return '%s %s' % (method, route_path(path))
+
+
+class TokenBuckets(object):
+    """ Bounded token buckets, e.g. one per host and route.
+    """
+
+    def __init__(self, rate, burst, size):
+        self.rate = rate
+        self.burst = burst
+        self.size = size
+        # Seconds an empty bucket takes to refill
+        self.refill_time = burst / rate
+        # key -> [tokens, time of the last update]
+        self.buckets = {}
+        self.swept_at = 0
+
+    def take(self, key, now=None):
+        """ Take a token from the bucket of key.
+
+        :returns: 0 if there was one, otherwise the seconds until there is
+        """
+        now = now or time.time()
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            if (len(self.buckets) >= self.size or
+                    now - self.swept_at >= self.refill_time):
+                self._evict(now)
+            self.buckets[key] = [self.burst - 1.0, now]
+            return 0
+        tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        if tokens >= 1:
+            bucket[0] = tokens - 1
+            return 0
+        bucket[0] = tokens
+        return (1 - tokens) / self.rate
+
+    def _evict(self, now):
+        self.swept_at = now
+        idle = now - self.refill_time
+        for key, bucket in self.buckets.items():
+            if bucket[1] <= idle:
+                del self.buckets[key]
+        if len(self.buckets) >= self.size:
+            by_use = sorted(self.buckets.items(),
+                            key=lambda item: item[1][1])
+            for key, bucket in by_use[:len(by_use) - self.size // 2]:
+                del self.buckets[key]
+        stats.incr('ratelimit.sweeps')
+
+
+class _Releasing(object):
+    """ Counts a request with a streamed response as served until the
+    server closes the response.
+    """
+
+    def __init__(self, middleware, app_iter):
+        self.middleware = middleware
+        self.app_iter = app_iter
+
+    def __iter__(self):
+        return iter(self.app_iter)
+
+    def close(self):
+        if self.middleware is not None:
+            self.middleware.concurrent -= 1
+            self.middleware = None
+        if hasattr(self.app_iter, 'close'):
+            self.app_iter.close()
+
+
+class RateLimitMiddleware(wsgi.Middleware):
+    """
+    Applies the admission control to the rest of the pipeline. See
+    api-paste.ini for its place in a pipeline.
+    """
+
+    def __init__(self, application):
+        super(RateLimitMiddleware, self).__init__(application)
+        self.buckets = None
+        if CONF.rate_limit_per_second > 0:
+            self.buckets = TokenBuckets(CONF.rate_limit_per_second,
+                                        max(1, CONF.rate_limit_burst),
+                                        CONF.rate_limit_max_buckets)
+        self.exempt_hosts = frozenset(CONF.rate_limit_exempt_hosts)
+        self.max_concurrent = CONF.max_concurrent_requests
+        self.concurrent = 0
+
+    def __call__(self, environ, start_response):
+        host = environ.get('REMOTE_ADDR')
+        if host in self.exempt_hosts:
+            return self.application(environ, start_response)
+        route = route_of(environ['REQUEST_METHOD'],
+                         environ.get('SCRIPT_NAME', '') +
+                         environ.get('PATH_INFO', ''))
+
+        if self.buckets is not None:
+            retry_after = self.buckets.take((host, route))
+            if retry_after:
+                stats.incr('ratelimit.rejected')
+                return self._reject(retry_after, start_response)
+
+        if not self.max_concurrent or route in LONG_POLL_ROUTES:
+            return self.application(environ, start_response)
+        if self.concurrent >= self.max_concurrent:
+            stats.incr('ratelimit.rejected_concurrency')
+            return self._reject(1, start_response)
+
+        self.concurrent += 1
+        try:
+            app_iter = self.application(environ, start_response)
+        except Exception:
+            self.concurrent -= 1
+            raise
+        if isinstance(app_iter, list):
+            self.concurrent -= 1
+            return app_iter
+        return _Releasing(self, app_iter)
+
+    def _reject(self, retry_after, start_response):
+        retry_after = str(int(math.ceil(retry_after)))
+        body = _('Too many requests, retry after %s seconds.') % retry_after
+        body = body.encode('utf-8')
+        start_response('429 Too Many Requests',
+                       [('Content-Type', 'text/plain; charset=UTF-8'),
+                        ('Content-Length', str(len(body))),
+                        ('Retry-After', retry_after)])
+        return [body]
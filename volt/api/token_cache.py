@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2014 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+""" Cache of the request contexts built for validated tokens.
+
+    Behind authtoken, the identity headers of a request only depend on its
+    token, so ContextMiddleware parses them, the service catalog included,
+    once per token and reuses the result for the repeated requests of the
+    same compute node. Entries expire after token_cache_time and are
+    dropped as soon as their token shows up in the revocation list of the
+    identity service.
+"""
+import hashlib
+import os
+import time
+import urllib2
+
+import eventlet
+from oslo.config import cfg
+
+from volt.openstack.common.gettextutils import _
+from volt.openstack.common import jsonutils
+from volt.openstack.common import log as logging
+
+
+LOG = logging.getLogger(__name__)
+
+token_cache_opts = [
+    cfg.IntOpt('token_cache_time', default=300,
+               help=_('Seconds an API worker reuses the request context '
+                      'built for a validated token, 0 disables the '
+                      'cache.')),
+    cfg.IntOpt('token_cache_size', default=1024,
+               help=_('Number of tokens whose request context is cached by '
+                      'every API worker.')),
+    cfg.StrOpt('token_revocation_url',
+               help=_('URL of the list of revoked tokens of the identity '
+                      'service, e.g. '
+                      'http://keystone:35357/v2.0/tokens/revoked. It must '
+                      'answer with the JSON document {"revoked": [{"id": '
+                      '...}]}, i.e. the list without its CMS signature.')),
+    cfg.StrOpt('token_revocation_admin_token', secret=True,
+               help=_('Token sent to fetch the list of revoked tokens.')),
+    cfg.IntOpt('token_revocation_interval', default=10,
+               help=_('Seconds between two fetches of the list of revoked '
+                      'tokens.')),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(token_cache_opts)
+
+_CACHE = None
+_POLLER_PID = None
+
+
+def token_ids(token):
+    """ Return the ids a token may have in the revocation list: the token
+    itself and, for PKI tokens, the MD5 hash keystone lists instead.
+    """
+    return (token, hashlib.md5(token).hexdigest())
+
+
+class TokenCache(object):
+    """ Bounded cache of the context arguments of validated tokens.
+
+    Once full, expired entries are dropped first, then the oldest half.
+    """
+
+    def __init__(self, ttl, size):
+        self.ttl = ttl
+        self.size = size
+        # token -> (expiry, context arguments)
+        self.entries = {}
+
+    def get(self, token, now=None):
+        entry = self.entries.get(token)
+        if entry is None:
+            return None
+        if entry[0] <= (now or time.time()):
+            self.entries.pop(token, None)
+            return None
+        return entry[1]
+
+    def put(self, token, value, now=None):
+        if self.ttl <= 0 or self.size <= 0:
+            return
+        now = now or time.time()
+        if len(self.entries) >= self.size:
+            self._evict(now)
+        self.entries[token] = (now + self.ttl, value)
+
+    def _evict(self, now):
+        for token, (expiry, value) in self.entries.items():
+            if expiry <= now:
+                del self.entries[token]
+        if len(self.entries) >= self.size:
+            by_expiry = sorted(self.entries.items(),
+                               key=lambda item: item[1][0])
+            for token, entry in by_expiry[:len(by_expiry) - self.size // 2]:
+                del self.entries[token]
+
+    def revoke(self, revoked):
+        """ Drop the tokens whose id is in revoked.
+
+        :returns: the number of dropped tokens
+        """
+        dropped = 0
+        for token in self.entries.keys():
+            if any(token_id in revoked for token_id in token_ids(token)):
+                self.entries.pop(token, None)
+                dropped += 1
+        return dropped
+
+    def clear(self):
+        self.entries.clear()
+
+
+class RevocationPoller(object):
+    """ Fetches the revocation list of the identity service and drops the
+    revoked tokens from a TokenCache.
+    """
+
+    def __init__(self, cache, url, interval):
+        self.cache = cache
+        self.url = url
+        self.interval = interval
+        self.thread = None
+
+    def fetch(self):
+        """Return the set of revoked token ids."""
+        request = urllib2.Request(self.url)
+        if CONF.token_revocation_admin_token:
+            request.add_header('X-Auth-Token',
+                               CONF.token_revocation_admin_token)
+        response = urllib2.urlopen(request, timeout=30)
+        try:
+            body = jsonutils.loads(response.read())
+        finally:
+            response.close()
+        return set(token['id'] for token in body.get('revoked', ()))
+
+    def poll(self):
+        dropped = self.cache.revoke(self.fetch())
+        if dropped:
+            LOG.info(_('Dropped %d revoked tokens from the token cache'),
+                     dropped)
+
+    def run(self):
+        while True:
+            try:
+                self.poll()
+            except Exception as e:
+                LOG.warn(_('Failed to fetch revoked tokens from %(url)s: '
+                           '%(e)s'), {'url': self.url, 'e': e})
+            eventlet.sleep(self.interval)
+
+    def start(self):
+        if self.thread is None:
+            self.thread = eventlet.spawn(self.run)
+
+
+def get_cache():
+    """ Return the TokenCache of the process.
+
+    The first call in every process starts polling the revocation list,
+    if there is one.
+    """
+    global _CACHE, _POLLER_PID
+
+    if _CACHE is None:
+        _CACHE = TokenCache(CONF.token_cache_time, CONF.token_cache_size)
+    if _POLLER_PID != os.getpid():
+        _POLLER_PID = os.getpid()
+        if CONF.token_revocation_url and CONF.token_cache_time > 0:
+            RevocationPoller(_CACHE, CONF.token_revocation_url,
+                             CONF.token_revocation_interval).start()
+    return _CACHE
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2014 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import time
+
+from webob import Response
+from webob.exc import HTTPForbidden
+from webob.exc import HTTPNotFound
+
+from volt.common import wsgi
+from volt import executor
+from volt.executor import events
+from volt.openstack.common.gettextutils import _
+from volt.openstack.common import jsonutils
+
+# Seconds without events after which a comment keeps the stream open
+KEEPALIVE_INTERVAL = 15
+
+
+def sse_message(event, data, event_id=None):
+    """Return a server-sent event."""
+    lines = []
+    if event_id is not None:
+        lines.append('id: %s' % event_id)
+    lines.append('event: %s' % event)
+    lines.append('data: %s' % jsonutils.dumps(data))
+    return '\n'.join(lines) + '\n\n'
+
+
+class Controller(object):
+    """
+    WSGI controller for the topology events in Volt v1 API
+
+        GET /events -- Streams the topology events of the worker which
+                       serves the request as server-sent events, one per
+                       event and a 'dropped' event counting the events
+                       lost when the client does not keep up,
+                       administrators only. The stream ends when the
+                       worker drains.
+    """
+
+    def __init__(self):
+        self.executor = executor.get_default_executor()
+
+    def index(self, req):
+        stream = events.STREAM
+        if stream is None:
+            msg = _("Topology events are not enabled on this instance.")
+            raise HTTPNotFound(explanation=msg)
+        if not req.context.is_admin:
+            raise HTTPForbidden()
+        response = Response(request=req, content_type='text/event-stream')
+        response.headers['Cache-Control'] = 'no-cache'
+        response.app_iter = self._iter_events(stream)
+        return response
+
+    def _iter_events(self, stream):
+        subscriber = stream.subscribe()
+        try:
+            # Sent at once, so that the client knows it is subscribed
+            yield ': subscribed\n\n'
+            idle_since = time.time()
+            while True:
+                batch, dropped = stream.wait(subscriber)
+                messages = []
+                if dropped:
+                    messages.append(sse_message('dropped',
+                                                {'count': dropped}))
+                for entry in batch:
+                    messages.append(sse_message(entry[2],
+                                                events.event_dict(entry),
+                                                event_id=entry[0]))
+                if messages:
+                    idle_since = time.time()
+                    yield ''.join(messages)
+                elif time.time() - idle_since >= KEEPALIVE_INTERVAL:
+                    idle_since = time.time()
+                    yield ': keepalive\n\n'
+                if events.DRAINING:
+                    # After the last delivery, so that no event is lost
+                    break
+        finally:
+            stream.unsubscribe(subscriber)
+
+
+def create_resource():
+    """Events resource factory method"""
+    return wsgi.Resource(Controller())
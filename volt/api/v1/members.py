@@ -14,25 +14,52 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
-import eventlet
+from oslo.config import cfg
+from webob.exc import HTTPBadRequest
 from webob.exc import HTTPNotFound
 from webob.exc import HTTPForbidden
+from webob.exc import HTTPTooManyRequests
 
+from volt.api import heartbeat
+from volt.api.v1 import replication as replication_api
+from volt.api import watch
 from volt.common import policy
 from volt.common import exception
+from volt.common import stats
 from volt.common import wsgi
 from volt import executor
+from volt.executor import replication
 from volt.openstack.common import log as logging
 from volt.openstack.common.gettextutils import _
 
+CONF = cfg.CONF
+
 LOG = logging.getLogger(__name__)
 
 
+def heartbeat_error(host, error):
+    """ Return the HTTP error answering a heartbeat of host which raised
+    error, or None if the error is unexpected.
+    """
+    if isinstance(error, exception.NotFound):
+        msg = _("Host %s not found") % host
+        LOG.debug(msg)
+        return HTTPNotFound(msg)
+    return None
+
+
 class Controller(object):
+    """
+    WSGI controller for the members resource in Volt v1 API
+
+        PUT /members/heartbeat -- Refreshes the requesting host, see
+                                  volt.api.heartbeat for async_heartbeat
+        GET /members/watch -- Waits until the parents of the requesting
+                              host change, see volt.api.watch
+    """
 
     def __init__(self):
-        self.policy = policy.Enforcer()
-        self.pool = eventlet.GreenPool(size=1024)
+        self.policy = policy.get_enforcer()
         self.executor = executor.get_default_executor()
 
     def _enforce(self, req, action):
@@ -42,6 +69,7 @@ class Controller(object):
         except exception.Forbidden:
             raise HTTPForbidden()
 
+    @executor.flush_after
     def heartbeat(self, req):
         """
         Client send periodical heartbeat to Volt server.
@@ -50,18 +78,53 @@ class Controller(object):
 
         """
         #self._enforce(req, 'heartbeat')
+        if replication.is_follower():
+            raise replication_api.redirect_to_primary(req)
         host = req.environ['REMOTE_ADDR']
 
         LOG.debug(_("host_ip = %(host)s."), {'host': host})
 
         try:
-            result = self.executor.update_status(host=host)
-        except exception.NotFound:
-            msg = _("Host %s not found") % host
-            LOG.debug(msg)
-            raise HTTPNotFound(msg)
+            result = heartbeat.heartbeat(self.executor, host)
+        except exception.VoltException as e:
+            error = heartbeat_error(host, e)
+            if error is None:
+                raise
+            raise error
         return result
 
+    def watch(self, req):
+        """
+        Parks the request until the parents of one of the peers of the
+        requesting host change, or until ?timeout=<SECONDS> expire, at most
+        watch_timeout. Pass the cursor of the previous response as
+        ?cursor=<CURSOR> not to miss the changes made in between, a cursor
+        unknown to the worker is answered changed at once. Past
+        watch_max_parked parked watches, answers 429 Too Many Requests.
+
+        :param req: the Request object coming from the wsgi layer
+        :retval The response body is a mapping of the following form::
+
+            {'changed': <BOOLEAN>, 'cursor': <CURSOR>}
+        """
+        host = req.environ['REMOTE_ADDR']
+        timeout = CONF.watch_timeout
+        if 'timeout' in req.params:
+            try:
+                timeout = min(timeout, int(req.params['timeout']))
+            except ValueError:
+                raise HTTPBadRequest(_("timeout param must be an integer"))
+            if timeout < 0:
+                raise HTTPBadRequest(_("timeout param must be positive"))
+        replication.get_follower(self.executor)
+        registry = watch.get_registry(self.executor)
+        if registry.is_full():
+            stats.incr('watch.rejected')
+            raise HTTPTooManyRequests(headers={'Retry-After': '1'})
+        changed, cursor = registry.watch(host, req.params.get('cursor'),
+                                         timeout)
+        return {'changed': changed, 'cursor': cursor}
+
 
 def create_resource():
     """volt members resource factory method"""
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2014 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from oslo.config import cfg
+from webob import Response
+from webob.exc import HTTPBadRequest
+from webob.exc import HTTPConflict
+from webob.exc import HTTPForbidden
+from webob.exc import HTTPNotFound
+
+from volt.common import exception
+from volt.common import profiler
+from volt.common import wsgi
+from volt.openstack.common.gettextutils import _
+
+CONF = cfg.CONF
+
+CONTENT_TYPES = {
+    'collapsed': 'text/plain',
+    'text': 'text/plain',
+    'pstats': 'application/octet-stream',
+}
+
+
+class Controller(object):
+    """
+    WSGI controller for the profiler in Volt v1 API, see
+    volt.common.profiler
+
+        GET /profile -- Profiles the worker which serves the request for
+                        ?duration=<SECONDS> with ?mode=sample (collapsed
+                        stacks) or ?mode=cprofile (?format=text or
+                        pstats), administrators only
+    """
+
+    def index(self, req):
+        if not CONF.enable_profiler:
+            msg = _("The profiler is not enabled on this instance.")
+            raise HTTPNotFound(explanation=msg)
+        if not req.context.is_admin:
+            raise HTTPForbidden()
+
+        try:
+            duration = float(req.params.get('duration', 10))
+        except ValueError:
+            raise HTTPBadRequest(_("duration param must be a number"))
+        if duration <= 0:
+            raise HTTPBadRequest(_("duration param must be positive"))
+        mode = req.params.get('mode', 'sample')
+        fmt = req.params.get('format')
+        try:
+            report = profiler.run(mode, duration, fmt)
+        except exception.ProfilerBusy as e:
+            raise HTTPConflict(explanation="%s" % e)
+        except exception.Invalid as e:
+            raise HTTPBadRequest(explanation="%s" % e)
+
+        fmt = fmt or profiler.FORMATS[mode][0]
+        return Response(request=req, body=report,
+                        content_type=CONTENT_TYPES[fmt])
+
+
+def create_resource():
+    """Profiler resource factory method"""
+    return wsgi.Resource(Controller())
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2014 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from webob.exc import HTTPBadRequest
+from webob.exc import HTTPForbidden
+from webob.exc import HTTPGone
+from webob.exc import HTTPNotFound
+from webob.exc import HTTPTemporaryRedirect
+
+from volt.common import exception
+from volt.common import wsgi
+from volt import executor
+from volt.executor import replication
+from volt.openstack.common import log as logging
+from volt.openstack.common.gettextutils import _
+
+LOG = logging.getLogger(__name__)
+
+
+def redirect_to_primary(req):
+    """Return the response which sends a request of a follower to the
+    primary."""
+    location = replication.primary_url(req.path_qs)
+    LOG.debug(_("Redirecting %(method)s to primary %(location)s"),
+              {'method': req.method, 'location': location})
+    return HTTPTemporaryRedirect(location=location)
+
+
+class Controller(object):
+    """
+    WSGI controller for the replication API in Volt v1 API
+
+        GET /replication/status -- Returns the replication role and, on a
+                                   follower, its lag behind the primary
+        GET /replication/snapshot -- Returns the executor state of the
+                                     primary and its journal position
+        GET /replication/journal?since=<SEQ>&limit=<N> -- Returns the
+                                     mutations which followed entry <SEQ>
+
+    The snapshot and the journal expose the whole topology, they are
+    served to administrators only.
+    """
+
+    def __init__(self):
+        self.executor = executor.get_default_executor()
+
+    def _get_journal(self, req):
+        if not req.context.is_admin:
+            raise HTTPForbidden()
+        if replication.JOURNAL is None:
+            msg = _("Replication journal is not enabled on this instance.")
+            raise HTTPNotFound(explanation=msg)
+        return replication.JOURNAL
+
+    def status(self, req):
+        follower = replication.get_follower(self.executor)
+        if follower is not None:
+            return follower.status()
+        if replication.JOURNAL is not None:
+            return {'role': 'primary', 'seq': replication.JOURNAL.seq}
+        return {'role': 'standalone'}
+
+    def snapshot(self, req):
+        journal = self._get_journal(req)
+        return {'seq': journal.seq, 'state': self.executor.dump_state()}
+
+    def journal(self, req):
+        journal = self._get_journal(req)
+        try:
+            since = int(req.params.get('since', 0))
+            limit = int(req.params.get('limit', 1000))
+        except ValueError:
+            raise HTTPBadRequest(explanation=_("since and limit must be "
+                                               "integers."))
+        try:
+            entries = journal.since(since, limit)
+        except exception.JournalTruncated as e:
+            raise HTTPGone(explanation="%s" % e)
+        return {'seq': journal.seq, 'entries': entries}
+
+
+def create_resource():
+    """Replication resource factory method"""
+    return wsgi.Resource(Controller())
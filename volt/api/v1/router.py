@@ -14,8 +14,12 @@
 #    under the License.
 
 
+from volt.api.v1 import events
 from volt.api.v1 import volumes
 from volt.api.v1 import members
+from volt.api.v1 import profiler
+from volt.api.v1 import replication
+from volt.api.v1 import stats
 from volt.common import wsgi
 
 
@@ -33,7 +37,19 @@ class API(wsgi.Router):
         mapper.connect("/volumes/{volume_id}",
                        controller=volumes_resource,
                        action='index',
-                       conditions={'method': ['HEAD']})
+                       conditions={'method': ['GET', 'HEAD']})
+        mapper.connect("/volumes/query",
+                       controller=volumes_resource,
+                       action='batch_query',
+                       conditions={'method': ['POST']})
+        mapper.connect("/volumes/register",
+                       controller=volumes_resource,
+                       action='batch_register',
+                       conditions={'method': ['POST']})
+        mapper.connect("/volumes/remove",
+                       controller=volumes_resource,
+                       action='batch_remove',
+                       conditions={'method': ['POST']})
         mapper.connect("/volumes/query/{volume_id}",
                        controller=volumes_resource,
                        action='query',
@@ -57,5 +73,45 @@ class API(wsgi.Router):
                        controller=members_resource,
                        action="heartbeat",
                        conditions={'method': ['PUT']})
+        mapper.connect("/members/watch",
+                       controller=members_resource,
+                       action="watch",
+                       conditions={'method': ['GET']})
+
+        replication_resource = replication.create_resource()
+
+        mapper.connect("/replication/status",
+                       controller=replication_resource,
+                       action="status",
+                       conditions={'method': ['GET']})
+        mapper.connect("/replication/snapshot",
+                       controller=replication_resource,
+                       action="snapshot",
+                       conditions={'method': ['GET']})
+        mapper.connect("/replication/journal",
+                       controller=replication_resource,
+                       action="journal",
+                       conditions={'method': ['GET']})
+
+        events_resource = events.create_resource()
+
+        mapper.connect("/events",
+                       controller=events_resource,
+                       action="index",
+                       conditions={'method': ['GET']})
+
+        stats_resource = stats.create_resource()
+
+        mapper.connect("/stats",
+                       controller=stats_resource,
+                       action="index",
+                       conditions={'method': ['GET']})
+
+        profiler_resource = profiler.create_resource()
+
+        mapper.connect("/profile",
+                       controller=profiler_resource,
+                       action="index",
+                       conditions={'method': ['GET']})
 
         super(API, self).__init__(mapper)
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2014 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import os
+
+from webob.exc import HTTPForbidden
+
+from volt.api import compression
+from volt.api import conditional
+from volt.common import stats
+from volt.common import wsgi
+
+
+class Controller(object):
+    """
+    WSGI controller for the stats resource in Volt v1 API
+
+        GET /stats -- Returns the counters of the worker which served the
+                      request, e.g. to compare the connections accepted by
+                      each worker, the ratio of the bytes it sent
+                      compressed to their uncompressed size and the share
+                      of conditional requests it answered with 304
+
+    The counters are per worker, they are not aggregated across the
+    workers, and the response names the worker by its pid. They are
+    served to administrators only.
+    """
+
+    def index(self, req):
+        if not req.context.is_admin:
+            raise HTTPForbidden()
+        result = {'pid': os.getpid(), 'scope': 'worker',
+                  'counters': stats.snapshot()}
+        compression_ratio = compression.ratio()
+        if compression_ratio is not None:
+            result['compression_ratio'] = compression_ratio
+        etag_hit_rate = conditional.hit_rate()
+        if etag_hit_rate is not None:
+            result['etag_hit_rate'] = etag_hit_rate
+        return result
+
+
+def create_resource():
+    """Stats resource factory method"""
+    return wsgi.Resource(Controller())
@@ -19,23 +19,78 @@ from webob.exc import HTTPBadRequest
 from webob.exc import HTTPForbidden
 from webob.exc import HTTPConflict
 from webob.exc import HTTPNotFound
+from webob.exc import HTTPNotModified
 
 from webob import Response
-import eventlet
+from oslo.config import cfg
 
+from volt.api import conditional
+from volt.api.v1 import replication as replication_api
 from volt.common import policy
 from volt.common import exception
 from volt import executor
+from volt.executor import replication
+from volt.executor import singleflight
 from volt.common import wsgi
 from volt.openstack.common import log as logging
 from volt.openstack.common.gettextutils import _
 from volt.openstack.common import jsonutils
 
 SUPPORTED_PARAMS = ('host', 'port', 'iqn', 'lun', 'peer_id')
+SUPPORTED_FILTERS = ('marker', 'host', 'status')
+
+volumes_opts = [
+    cfg.IntOpt('max_batch_size', default=1000,
+               help=_('Maximum number of items accepted by a batch '
+                      'request.')),
+    cfg.IntOpt('api_limit_max', default=1000,
+               help=_('Maximum page size of a listing, and page size of a '
+                      'listing requested with the marker parameter but '
+                      'without the limit parameter. A listing requested '
+                      'without both is not paginated.')),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(volumes_opts)
 
 LOG = logging.getLogger(__name__)
 
 
+def batch_result(item, error):
+    """Return the entry of an item in the response of a batch."""
+    if error is None:
+        item['status'] = 200
+    else:
+        item['status'] = batch_status(error)
+        item['error'] = '%s' % error
+    return item
+
+
+def batch_status(error):
+    """Return the HTTP status code of an item of a batch which failed."""
+    if isinstance(error, exception.NotFound):
+        return 404
+    if isinstance(error, (exception.Duplicate, exception.DuplicateItem)):
+        return 409
+    if isinstance(error, exception.Invalid):
+        return 400
+    return 500
+
+
+def query_error(error):
+    """ Return the HTTP error answering a query which raised error, or
+    None if the error is unexpected.
+    """
+    if isinstance(error, exception.NotFound):
+        msg = _("this volume is not found in tracker.")
+        return HTTPNotFound(explanation=msg, content_type="text/plain")
+    if isinstance(error, exception.InvalidParameterValue):
+        return HTTPBadRequest()
+    if isinstance(error, exception.Duplicate):
+        return HTTPConflict()
+    return None
+
+
 class Controller(object):
     """
     WSGI controller for tracked volumes information in Volt v1 API
@@ -43,28 +98,37 @@ class Controller(object):
     The tracked volumes API is a RESTful web service for volume
     metadata. The API is as follows::
 
-        GET /volumes -- Returns a set of brief metadata about volumes
+        GET /volumes -- Returns a set of brief metadata about volumes,
+                        paginated by ?marker=<ID>&limit=<N> and filtered
+                        by ?host=<HOST>&status=<STATUS>
         HEAD /volumes/<ID> -- Returns detailed metadata about volumes
-                            with id <ID>
-        GET /volumes/<ID> -- Search volumes metadata about volumes
-                             matching the id <ID>. Because the client
-                             uses this result to build the iscsi
-                             connections, in order to promote overall
-                             r/w performance and limit the number of
-                             connections, executor always returns
-                             partial matching list.
+                            with id <ID>, the ETag of the response only
+                            changes with the tree of the volume
+        GET /volumes/<ID> -- Lists the peers of volume <ID>, paginated
+                             and filtered as GET /volumes
+        GET /volumes/query/<ID> -- Search the parents of the requesting
+                             host among the peers of volume <ID>.
+                             Because the client uses this result to
+                             build the iscsi connections, in order to
+                             promote overall r/w performance and limit
+                             the number of connections, executor always
+                             returns partial matching list.
+        POST /volumes/query -- Search the parents of the requesting host
+                               for several volumes at once
         POST /volumes/<ID> -- Register a new volume and store metadata
                              with id <ID>
+        POST /volumes/register -- Register several peers at once
+        POST /volumes/remove -- Remove several peers at once
         DELETE /volumes/<ID> -- Delete all tracked volume with id <ID>
         DELETE /volumes -- Delete all tracked volumes
+
+    GET /volumes/query/<ID> and GET or HEAD /volumes/<ID> answer
+    If-None-Match with 304 Not Modified.
     """
 
     def __init__(self):
-        self.policy = policy.Enforcer()
-        self.pool = eventlet.GreenPool(size=1024)
+        self.policy = policy.get_enforcer()
         self.executor = executor.get_default_executor()
-#         self.pool.spawn_n(self.executor.kickoff_dead_node())
-        self.scanning_thread = executor.ScanningThread(self.executor)
 
     def _enforce(self, req, action):
         """Authorize an action against our policies"""
@@ -73,6 +137,41 @@ class Controller(object):
         except exception.Forbidden:
             raise HTTPForbidden()
 
+    def _redirect_if_follower(self, req):
+        """Send a mutating request received by a follower to the primary"""
+        if replication.is_follower():
+            raise replication_api.redirect_to_primary(req)
+
+    def _start_scanning(self):
+        executor.start_scanning(self.executor)
+
+    def _get_batch(self, body, key):
+        """
+        Extracts the list of items of a batch request.
+
+        :raises HTTPBadRequest if the list is missing or too long
+        """
+        items = body.get(key) if isinstance(body, dict) else None
+        if not isinstance(items, list):
+            msg = _("The request body must contain a list of %s.") % key
+            raise HTTPBadRequest(explanation=msg)
+        if len(items) > CONF.max_batch_size:
+            msg = (_("A batch is limited to %d items.") %
+                   CONF.max_batch_size)
+            raise HTTPBadRequest(explanation=msg)
+        return items
+
+    def _check_ids(self, *ids):
+        """
+        Checks the ids of an item of a batch, None for an optional one.
+
+        :raises HTTPBadRequest if an id is not a string
+        """
+        for value in ids:
+            if value is not None and not isinstance(value, basestring):
+                msg = _("The ids of a batch must be strings.")
+                raise HTTPBadRequest(explanation=msg)
+
     def _get_query_params(self, req):
         """
         Extracts necessary query params from request.
@@ -87,33 +186,77 @@ class Controller(object):
 
         return params
 
+    def _get_listing_params(self, req):
+        """
+        Extracts the pagination and filter params of a listing.
+
+        The page size is limit, at most api_limit_max which is also the
+        default of a listing given a marker. A listing given neither is
+        complete, as before pagination.
+
+        :raises HTTPBadRequest if limit is not a positive integer
+        """
+        params = {}
+        for PARAM in SUPPORTED_FILTERS:
+            if PARAM in req.params:
+                params[PARAM] = req.params[PARAM]
+        if 'limit' in req.params:
+            try:
+                limit = int(req.params['limit'])
+            except ValueError:
+                raise HTTPBadRequest(_("limit param must be an integer"))
+            if limit < 0:
+                raise HTTPBadRequest(_("limit param must be positive"))
+            params['limit'] = min(CONF.api_limit_max, limit)
+        elif 'marker' in params:
+            params['limit'] = CONF.api_limit_max
+        return params
+
     def index(self, req, volume_id=None):
         """
-        Returns the following information for all tracked volumes:
+        Returns the following information for all tracked volumes, ordered
+        by id:
 
             * id -- The opaque volume identifier
             * count -- The number of registered volumes with this id
 
+        or, given a volume_id, the peers of that volume ordered by peer_id.
+        The list is streamed as it is encoded. The next page starts after
+        the last id, or peer_id, of the previous one. The peers of a volume
+        are not listed again for an If-None-Match request listing the ETag
+        of its tree.
+
         :param req: The WSGI/Webob Request object
-        :retval The response body is a mapping of the following form::
+        :retval The response body is a list of the following form::
 
-            {'volumes': [
-                {'id': <ID>,
-                 'count': <COUNT>}, ...
-            ]}
+            [{'id': <ID>,
+              'count': <COUNT>}, ...]
         """
         #self._enforce(req, 'get_volumes')
+        replication.get_follower(self.executor)
+        params = self._get_listing_params(req)
+
+        if volume_id is not None:
+            etag = conditional.volume_etag(self.executor, volume_id)
+            if_none_match = req.headers.get('If-None-Match')
+            if if_none_match and conditional.not_modified(if_none_match,
+                                                          etag):
+                raise HTTPNotModified(headers={'ETag': etag})
+            if etag is not None:
+                req.environ[wsgi.ETAG_ENVIRON_KEY] = etag
 
         try:
             if volume_id is None:
-                volumes = self.executor.get_volumes_list()
+                volumes = self.executor.iter_volumes(**params)
             else:
-                volumes = self.executor.get_volumes_detail(volume_id)
+                volumes = self.executor.iter_volume_peers(volume_id,
+                                                          **params)
         except exception.Invalid as e:
             raise HTTPBadRequest(explanation="%s" % e)
 
         return volumes
 
+    @executor.flush_after
     def remove(self, req, volume_id, peer_id=None, body=None):
         """
         Remove the volume metadata from Volt
@@ -126,6 +269,7 @@ class Controller(object):
         :raises HttpNotFound if volume is not available
         """
         #self._enforce(req, 'remove_volume')
+        self._redirect_if_follower(req)
         params = self._get_query_params(body)
         assert(peer_id is not None)
         try:
@@ -140,6 +284,7 @@ class Controller(object):
         else:
             return Response(body='', status=200)
 
+    @executor.flush_after
     def register(self, req, volume_id, peer_id, body=None):
         """
         Adds the volume metadata to the registry and assigns
@@ -153,6 +298,7 @@ class Controller(object):
         :raises HTTPBadRequest if volume metadata is not valid
         """
         #self._enforce(req, 'register_volume')
+        self._redirect_if_follower(req)
         params = self._get_query_params(body)
         #if self.scanning_thread.status == 'init':
         #    self.scanning_thread.start()
@@ -184,6 +330,7 @@ class Controller(object):
 
         return volume_meta
 
+    @executor.flush_after
     def query(self, req, volume_id, body=None):
         """
         Returns detailed information for all available volumes with id
@@ -206,25 +353,178 @@ class Controller(object):
         #host = params.get('host', None)
         host = req.environ['REMOTE_ADDR']
         peer_id = params.get('peer_id', None)
-        if self.scanning_thread.status == 'init':
-            self.scanning_thread.start()
-            self.scanning_thread.status = 'running'
+        if_none_match = req.headers.get('If-None-Match')
+        if if_none_match:
+            etag = conditional.cached_query_etag(self.executor, volume_id,
+                                                 host, if_none_match)
+            if etag is not None:
+                raise HTTPNotModified(headers={'ETag': etag})
+        if replication.get_follower(self.executor):
+            # A follower only answers for peers already placed by the
+            # primary, placing a new peer is a mutation.
+            if not self.executor.is_placed(volume_id, host):
+                raise replication_api.redirect_to_primary(req)
+        else:
+            self._start_scanning()
         try:
-            target = self.executor.get_volume_parents(volume_id=volume_id,
-                                                      peer_id=peer_id,
-                                                      host=host)
-        except exception.NotFound as e:
-            msg = _("this volume is not found in tracker.")
-            raise HTTPNotFound(explanation=msg,
-                               request=req,
-                               content_type="text/plain")
-        except exception.InvalidParameterValue:
-            raise HTTPBadRequest()
-        except exception.Duplicate:
-            raise HTTPConflict()
-
+            target = singleflight.get_volume_parents(self.executor,
+                                                     volume_id,
+                                                     peer_id=peer_id,
+                                                     host=host)
+        except exception.VoltException as e:
+            error = query_error(e)
+            if error is None:
+                raise
+            raise error
+
+        etag = conditional.store_query_etag(self.executor, volume_id, host,
+                                            target)
+        if if_none_match and conditional.not_modified(if_none_match, etag):
+            raise HTTPNotModified(headers={'ETag': etag})
+        req.environ[wsgi.ETAG_ENVIRON_KEY] = etag
         return target
 
+    @executor.flush_after
+    def batch_query(self, req, body=None):
+        """
+        Returns the parents of the requesting host for several volumes,
+        placing the host in the trees it did not join yet
+
+        :param req: The WSGI/Webob Request object
+        :param body: A mapping of the following form::
+
+            {'volumes': [<ID> or {'volume_id': <ID>,
+                                  'peer_id': <PEER_ID>}, ...]}
+
+        :retval The response body lists the result of every volume in the
+                order of the request::
+
+            {'volumes': [
+                {'volume_id': <ID>,
+                 'status': 200,
+                 'peer_id': <PEER_ID>,
+                 'parents': [...]},
+                {'volume_id': <ID>,
+                 'status': <STATUS>,
+                 'error': <MESSAGE>}, ...
+            ]}
+        """
+        queries = []
+        for item in self._get_batch(body, 'volumes'):
+            if isinstance(item, dict):
+                query = (item.get('volume_id'), item.get('peer_id'))
+            else:
+                query = (item, None)
+            if query[0] is None:
+                msg = _("Every volume of a batch must have an id.")
+                raise HTTPBadRequest(explanation=msg)
+            self._check_ids(*query)
+            queries.append(query)
+        host = req.environ['REMOTE_ADDR']
+
+        if replication.get_follower(self.executor):
+            if not all(self.executor.is_placed(volume_id, host)
+                       for volume_id, peer_id in queries):
+                raise replication_api.redirect_to_primary(req)
+        else:
+            self._start_scanning()
+
+        results = self.executor.get_volumes_parents(queries, host=host)
+
+        volumes = []
+        for (volume_id, peer_id), result in zip(queries, results):
+            item = {'volume_id': volume_id}
+            if isinstance(result, exception.VoltException):
+                volumes.append(batch_result(item, result))
+            else:
+                item.update(result)
+                volumes.append(batch_result(item, None))
+        return {'volumes': volumes}
+
+    def _get_batch_peers(self, body):
+        peers = []
+        for item in self._get_batch(body, 'peers'):
+            if not isinstance(item, dict):
+                msg = _("Every peer of a batch must be a mapping.")
+                raise HTTPBadRequest(explanation=msg)
+            peer = self._get_query_params(item)
+            peer['volume_id'] = item.get('volume_id')
+            self._check_ids(peer['volume_id'], peer.get('peer_id'))
+            peers.append(peer)
+        return peers
+
+    @executor.flush_after
+    def batch_register(self, req, body=None):
+        """
+        Registers several peers through a single executor call
+
+        :param req: The WSGI/Webob Request object
+        :param body: A mapping of the following form::
+
+            {'peers': [
+                {'volume_id': <ID>,
+                 'peer_id': <PEER_ID>,
+                 'host': <HOST>,
+                 'port': <PORT>,
+                 'iqn': <IQN>,
+                 'lun': <LUN>}, ...
+            ]}
+
+        :retval The response body lists the registered metadata of every
+                peer, or its error, in the order of the request::
+
+            {'peers': [
+                {'volume_id': <ID>, 'status': 200, 'peer_id': <PEER_ID>,
+                 'host': <HOST>, ...},
+                {'volume_id': <ID>, 'status': <STATUS>,
+                 'error': <MESSAGE>}, ...
+            ]}
+        """
+        self._redirect_if_follower(req)
+        peers = self._get_batch_peers(body)
+        results = self.executor.add_volumes_metadata(peers)
+
+        response = []
+        for peer, result in zip(peers, results):
+            item = {'volume_id': peer['volume_id']}
+            if isinstance(result, exception.VoltException):
+                item['peer_id'] = peer.get('peer_id')
+                response.append(batch_result(item, result))
+            else:
+                item.update(result)
+                response.append(batch_result(item, None))
+        return {'peers': response}
+
+    @executor.flush_after
+    def batch_remove(self, req, body=None):
+        """
+        Removes several peers through a single executor call, the topology
+        of every affected tree is repaired once
+
+        :param req: The WSGI/Webob Request object
+        :param body: A mapping of the following form::
+
+            {'peers': [{'volume_id': <ID>, 'peer_id': <PEER_ID>}, ...]}
+
+        :retval The response body lists the outcome of every peer in the
+                order of the request::
+
+            {'peers': [
+                {'volume_id': <ID>, 'peer_id': <PEER_ID>, 'status': 200},
+                {'volume_id': <ID>, 'peer_id': <PEER_ID>,
+                 'status': <STATUS>, 'error': <MESSAGE>}, ...
+            ]}
+        """
+        self._redirect_if_follower(req)
+        peers = [(peer['volume_id'], peer.get('peer_id'))
+                 for peer in self._get_batch_peers(body)]
+        results = self.executor.delete_volumes_metadata(peers)
+
+        return {'peers': [batch_result({'volume_id': volume_id,
+                                        'peer_id': peer_id}, error)
+                          for (volume_id, peer_id), error
+                          in zip(peers, results)]}
+
 
 def create_resource():
     """Volumes resource factory method"""
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2014 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+""" Long polling of the parents of a host.
+
+    GET /v1/members/watch parks the request of a host until a change of the
+    topology moves one of its peers to other parents, or until a timeout.
+    Each host has a HostCondition which counts these changes. The watchers
+    of a host wait on a single event of its condition, so a parked watcher
+    costs one sleeping greenthread and a notification wakes only the
+    watchers of the moved hosts. Every parked watcher holds a greenthread
+    of the server pool though, so a worker parks at most watch_max_parked
+    of them and answers the others with 429 Too Many Requests, which leaves
+    the rest of the pool to the heartbeats and the queries.
+
+    The response carries a cursor, which the next watch of the host passes
+    back to learn about the changes made in between. Cursors are only
+    known to the worker which returned them, a watch sent to another worker
+    is answered changed at once, so that the host queries its parents again
+    rather than missing a change.
+"""
+import uuid
+
+import eventlet
+from eventlet import event
+from oslo.config import cfg
+
+from volt.common import stats
+from volt.openstack.common.gettextutils import _
+
+
+watch_opts = [
+    cfg.IntOpt('watch_timeout', default=30,
+               help=_('Longest time in seconds a watch of the parents of a '
+                      'host is parked before it is answered unchanged.')),
+    cfg.IntOpt('watch_max_parked', default=100,
+               help=_('Watches a worker parks at once, the others are '
+                      'answered with 429 Too Many Requests. Each parked '
+                      'watch holds a greenthread of the server pool, keep '
+                      'the sum of this and max_concurrent_requests below '
+                      'wsgi_default_pool_size. 0 disables the cap.')),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(watch_opts)
+
+# Tells the cursors of two workers apart
+_EPOCH = uuid.uuid4().hex[:8]
+
+_REGISTRY = None
+
+
+class HostCondition(object):
+    """ Counts the changes of the parents of one host and wakes its
+    watchers.
+    """
+    __slots__ = ('seq', 'event')
+
+    def __init__(self):
+        self.seq = 0
+        self.event = None
+
+    def notify(self):
+        self.seq += 1
+        if self.event is not None:
+            waiters, self.event = self.event, None
+            waiters.send(self.seq)
+
+    def wait(self, since, timeout):
+        """ Wait until the count of changes exceeds since, at most timeout
+        seconds, and return the count.
+        """
+        if since == self.seq:
+            if self.event is None:
+                self.event = event.Event()
+            waiters = self.event
+            with eventlet.Timeout(timeout, False):
+                waiters.wait()
+        return self.seq
+
+
+class WatchRegistry(object):
+    """ The conditions of the watched hosts, registered as a topology
+    listener of the executor (see Executor.add_topology_listener).
+    """
+
+    def __init__(self):
+        # host -> HostCondition
+        self.conditions = {}
+        # Watches waiting on a condition
+        self.parked = 0
+
+    def __call__(self, event, payload):
+        if event != 'reparent':
+            return
+        hosts = payload['hosts']
+        if hosts is None:
+            conditions = self.conditions.values()
+        else:
+            conditions = [self.conditions[host] for host in hosts
+                          if host in self.conditions]
+        for condition in conditions:
+            condition.notify()
+        stats.incr('watch.notified', len(conditions))
+
+    def is_full(self):
+        """Whether the worker parks watch_max_parked watches already."""
+        return 0 < CONF.watch_max_parked <= self.parked
+
+    def watch(self, host, cursor, timeout):
+        """ Wait for a change of the parents of host after cursor.
+
+        :param cursor: the cursor returned by the previous watch, or None
+        :returns: whether the parents changed and the cursor of the next
+                  watch, changed at once for a cursor of another worker
+        """
+        condition = self.conditions.get(host)
+        if condition is None:
+            condition = self.conditions[host] = HostCondition()
+        since = condition.seq
+        if cursor:
+            epoch, _sep, seq = cursor.partition('-')
+            if epoch != _EPOCH or not seq.isdigit():
+                stats.incr('watch.foreign_cursors')
+                return True, '%s-%d' % (_EPOCH, since)
+            since = int(seq)
+        self.parked += 1
+        stats.incr('watch.parked')
+        try:
+            seq = condition.wait(since, timeout)
+        finally:
+            self.parked -= 1
+            stats.incr('watch.parked', -1)
+        return seq != since, '%s-%d' % (_EPOCH, seq)
+
+
+def get_registry(executor):
+    """ Return the registry of the worker, listening to executor from its
+    first use.
+    """
+    global _REGISTRY
+    if _REGISTRY is None:
+        _REGISTRY = WatchRegistry()
+        executor.add_topology_listener(_REGISTRY)
+    return _REGISTRY
@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2014 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+""" Compact binary encoding of API responses.
+
+    Clients ask for it with ``Accept: application/x-volt-binary``. A message
+    is the magic ``VOLT``, the schema version byte and one value. Every
+    value starts with a one byte tag:
+
+        N, T, F         null, true, false
+        i <varint>      integer, zigzag encoded
+        d <8 bytes>     IEEE 754 double, little endian
+        s <varint> ...  string of that many UTF-8 bytes, which is appended
+                        to the dictionary of the message
+        u <varint> ...  string of that many UTF-8 bytes, which is not
+                        added to the dictionary
+        r <varint>      the string at that index of the dictionary
+        l <varint> ...  list of that many values
+        m <varint> ...  mapping of that many key and value pairs, the keys
+                        are strings
+        c <varint> ...  chunk of a streamed list, the list ends with an
+                        empty chunk
+
+    Varints are unsigned LEB128. The dictionary of every message starts
+    with STATIC_STRINGS, the keys and values of the responses, which thus
+    take two bytes. Other strings are dictionary encoded while they are
+    written, so a message can be streamed without a first pass over it.
+
+    The encoding of a value which only refers to STATIC_STRINGS does not
+    depend on the message, the tree nodes keep that of their identity
+    (see impl_btree.Identity) and the encoder copies it as is.
+"""
+import datetime
+import struct
+
+CONTENT_TYPE = 'application/x-volt-binary'
+MAGIC = 'VOLT'
+SCHEMA_VERSION = 1
+
+HEADER = MAGIC + chr(SCHEMA_VERSION)
+
+# Changing these strings requires a new SCHEMA_VERSION
+STATIC_STRINGS = (
+    'peer_id', 'parents', 'host', 'port', 'iqn', 'lun', 'status', 'id',
+    'count', 'volume_id', 'volumes', 'peers', 'error', 'OK', 'pending',
+)
+
+_STATIC_INDEX = dict((string, index)
+                     for index, string in enumerate(STATIC_STRINGS))
+
+_DOUBLE = struct.Struct('<d')
+# Single byte varints
+_SMALL = [chr(n) for n in range(128)]
+
+
+def _varint(n):
+    if n < 128:
+        return _SMALL[n]
+    out = []
+    while n >= 128:
+        out.append(chr(n & 127 | 128))
+        n >>= 7
+    out.append(chr(n))
+    return ''.join(out)
+
+
+class Encoder(object):
+    """ Encodes the values of one message, keeping its dictionary.
+    """
+
+    def __init__(self, default=None, index_strings=True):
+        """
+        :param default: called with any value of another type, returns a
+                        value which can be encoded, as for json.dumps
+        :param index_strings: whether the strings which are not static are
+                              added to the dictionary, otherwise the
+                              encoding does not depend on the message
+        """
+        self.default = default
+        self.index_strings = index_strings
+        self.strings = _STATIC_INDEX.copy()
+
+    def encode(self, value, out):
+        """Append the encoding of value to the list out."""
+        kind = type(value)
+        if kind is str or kind is unicode:
+            self._encode_string(value, out)
+        elif kind is int or kind is long:
+            out.append('i')
+            out.append(_varint(value << 1 if value >= 0
+                               else (-value << 1) - 1))
+        elif isinstance(value, dict):
+            if kind is not dict:
+                encoded = getattr(value, 'binary', None)
+                if encoded is not None:
+                    out.append(encoded)
+                    return
+            out.append('m')
+            out.append(_varint(len(value)))
+            for key, item in value.iteritems():
+                if type(key) is not str and type(key) is not unicode:
+                    raise TypeError('%r is not a string' % (key,))
+                self._encode_string(key, out)
+                self.encode(item, out)
+        elif isinstance(value, (list, tuple)):
+            out.append('l')
+            out.append(_varint(len(value)))
+            for item in value:
+                self.encode(item, out)
+        elif value is None:
+            out.append('N')
+        elif value is True:
+            out.append('T')
+        elif value is False:
+            out.append('F')
+        elif kind is float:
+            out.append('d')
+            out.append(_DOUBLE.pack(value))
+        elif isinstance(value, basestring):
+            self._encode_string(value, out)
+        elif isinstance(value, (int, long)):
+            self.encode(int(value), out)
+        elif self.default is not None:
+            self.encode(self.default(value), out)
+        else:
+            raise TypeError('%r can not be encoded' % (value,))
+
+    def _encode_string(self, value, out):
+        index = self.strings.get(value)
+        if index is not None:
+            out.append('r')
+            out.append(_varint(index))
+            return
+        if self.index_strings:
+            self.strings[value] = len(self.strings)
+            out.append('s')
+        else:
+            out.append('u')
+        if isinstance(value, unicode):
+            value = value.encode('utf-8')
+        out.append(_varint(len(value)))
+        out.append(value)
+
+
+def _sanitizer(obj):
+    if isinstance(obj, datetime.datetime):
+        return obj.isoformat()
+    if hasattr(obj, 'to_dict'):
+        return obj.to_dict()
+    raise TypeError('%r can not be encoded' % (obj,))
+
+
+def dumps(value, default=_sanitizer):
+    """Return the message encoding value."""
+    out = [HEADER]
+    Encoder(default).encode(value, out)
+    return ''.join(out)
+
+
+def fragment(value):
+    """ Return the encoding of value, without header, which can be copied
+    into any message.
+    """
+    out = []
+    Encoder(index_strings=False).encode(value, out)
+    return ''.join(out)
+
+
+def iter_dumps(items, chunk_items, default=_sanitizer):
+    """ Encode the items of an iterable as a streamed list, yielding one
+    chunk of the message per chunk_items items.
+    """
+    encoder = Encoder(default)
+    out = [HEADER]
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == chunk_items:
+            out.append('c')
+            out.append(_varint(len(batch)))
+            for value in batch:
+                encoder.encode(value, out)
+            yield ''.join(out)
+            out = []
+            batch = []
+    if batch:
+        out.append('c')
+        out.append(_varint(len(batch)))
+        for value in batch:
+            encoder.encode(value, out)
+    out.append('c')
+    out.append(_varint(0))
+    yield ''.join(out)
+
+
+class _Decoder(object):
+
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+        self.strings = list(STATIC_STRINGS)
+
+    def varint(self):
+        result = shift = 0
+        while True:
+            byte = ord(self.data[self.pos])
+            self.pos += 1
+            result |= (byte & 127) << shift
+            if byte < 128:
+                return result
+            shift += 7
+
+    def value(self):
+        tag = self.data[self.pos]
+        self.pos += 1
+        if tag == 'N':
+            return None
+        if tag == 'T':
+            return True
+        if tag == 'F':
+            return False
+        if tag == 'i':
+            n = self.varint()
+            return n >> 1 if not n & 1 else -((n + 1) >> 1)
+        if tag == 'd':
+            self.pos += 8
+            return _DOUBLE.unpack(self.data[self.pos - 8:self.pos])[0]
+        if tag == 's':
+            length = self.varint()
+            self.pos += length
+            value = self.data[self.pos - length:self.pos].decode('utf-8')
+            self.strings.append(value)
+            return value
+        if tag == 'u':
+            length = self.varint()
+            self.pos += length
+            return self.data[self.pos - length:self.pos].decode('utf-8')
+        if tag == 'r':
+            return self.strings[self.varint()]
+        if tag == 'l':
+            return [self.value() for _i in xrange(self.varint())]
+        if tag == 'm':
+            result = {}
+            for _i in xrange(self.varint()):
+                key = self.value()
+                result[key] = self.value()
+            return result
+        if tag == 'c':
+            items = []
+            count = self.varint()
+            while count:
+                items.extend(self.value() for _i in xrange(count))
+                if self.data[self.pos] != 'c':
+                    raise ValueError('Truncated streamed list')
+                self.pos += 1
+                count = self.varint()
+            return items
+        raise ValueError('Unknown tag %r at offset %d' % (tag, self.pos - 1))
+
+
+def loads(data):
+    """ Return the value encoded by a message.
+
+    :raises ValueError: if data is not a message of this schema version
+    """
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError('Not a volt binary message')
+    version = ord(data[len(MAGIC)])
+    if version != SCHEMA_VERSION:
+        raise ValueError('Unsupported schema version %d' % version)
+    decoder = _Decoder(data)
+    decoder.pos = len(HEADER)
+    try:
+        value = decoder.value()
+    except (IndexError, struct.error):
+        raise ValueError('Truncated volt binary message')
+    if decoder.pos != len(data):
+        raise ValueError('Trailing data after the volt binary message')
+    return value
@@ -38,7 +38,7 @@ class RequestContext(object):
         self.owner_is_tenant = owner_is_tenant
         self.request_id = str(uuid.uuid4())
         self.service_catalog = service_catalog
-        self.policy_enforcer = policy_enforcer or policy.Enforcer()
+        self.policy_enforcer = policy_enforcer or policy.get_enforcer()
         self.is_admin = is_admin
         if not self.is_admin:
             self.is_admin = \
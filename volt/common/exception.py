@@ -335,6 +335,14 @@ class DuplicateLocation(Duplicate):
     message = _("The location %(location)s already exists")
 
 
+class JournalTruncated(NotFound):
+    message = _("Journal entries following %(seq)s are no longer available.")
+
+
+class ProfilerBusy(Duplicate):
+    message = _("A profile of this worker is already running.")
+
+
 class DuplicateItem(VoltException):
     message = _("The item %(param)s already exists")
 
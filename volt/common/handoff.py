@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2014 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+""" Handoff of the listening socket and the executor state on reload.
+
+    On SIGHUP the master asks every worker to write its executor state to
+    a file, then execs a new master which inherits the bound listening
+    socket and restores the state before forking its own workers. The old
+    workers stop accepting and drain their in-flight requests meanwhile.
+"""
+import fcntl
+import os
+import sys
+import time
+
+import eventlet.greenio
+from eventlet.green import socket
+from oslo.config import cfg
+
+from volt import executor
+from volt.openstack.common import fileutils
+from volt.openstack.common.gettextutils import _
+from volt.openstack.common import jsonutils
+from volt.openstack.common import log as logging
+
+
+LOG = logging.getLogger(__name__)
+
+handoff_opts = [
+    cfg.StrOpt('state_handoff_dir', default='/var/lib/volt/handoff',
+               help=_('Directory where workers write their executor state '
+                      'for the new master during a reload.')),
+    cfg.IntOpt('reload_timeout', default=30,
+               help=_('Seconds a reload waits for the workers to write '
+                      'their executor state before starting the new '
+                      'master without it.')),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(handoff_opts)
+
+LISTEN_FD_ENV = 'VOLT_LISTEN_FD'
+STATE_FILES_ENV = 'VOLT_STATE_FILES'
+
+
+def inherited_socket():
+    """ Return the listening socket handed over by the previous master, or
+    None if this process was not started by a reload.
+    """
+    if LISTEN_FD_ENV not in os.environ:
+        return None
+    fd, family = [int(value) for value in
+                  os.environ.pop(LISTEN_FD_ENV).split(':')]
+    sock = eventlet.greenio.GreenSocket(
+        socket.fromfd(fd, family, socket.SOCK_STREAM))
+    os.close(fd)
+    LOG.info(_('Inherited listening socket %s'), sock.getsockname())
+    return sock
+
+
+def state_path(pid):
+    return os.path.join(CONF.state_handoff_dir, 'volt-api-%d.json' % pid)
+
+
+def write_state(path):
+    """Write the state of the default executor atomically to path."""
+    fileutils.ensure_tree(os.path.dirname(path))
+    state = executor.get_default_executor().dump_state()
+    tmp_path = '%s.tmp' % path
+    with open(tmp_path, 'w') as f:
+        f.write(jsonutils.dumps(state))
+    os.rename(tmp_path, path)
+
+
+def wait_for_files(paths, timeout):
+    """Return the paths which exist once all do or timeout expires."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if all(os.path.exists(path) for path in paths):
+            break
+        time.sleep(0.05)
+    return [path for path in paths if os.path.exists(path)]
+
+
+def merge_states(states):
+    """ Merge the states written by several workers.
+
+    Each worker serves its own copy of the trees, so for every volume the
+    largest tree is kept. Hosts keep their latest heartbeat.
+    """
+    volumes = {}
+    hosts = {}
+    for state in states:
+        for volume_id, records in state['volumes'].items():
+            if len(records) > len(volumes.get(volume_id, ())):
+                volumes[volume_id] = records
+        for host, host_state in state['hosts'].items():
+            merged = hosts.setdefault(host, {'timestamp': '', 'peers': []})
+            merged['timestamp'] = max(merged['timestamp'],
+                                      host_state['timestamp'])
+            merged['peers'] = sorted(set(merged['peers']) |
+                                     set(host_state['peers']))
+    return {'volumes': volumes, 'hosts': hosts}
+
+
+def restore_state():
+    """ Restore the state handed over by the previous master into the
+    default executor.
+    """
+    if STATE_FILES_ENV not in os.environ:
+        return
+    paths = os.environ.pop(STATE_FILES_ENV).split(os.pathsep)
+    states = []
+    for path in filter(None, paths):
+        try:
+            with open(path) as f:
+                states.append(jsonutils.loads(f.read()))
+        except (IOError, ValueError) as e:
+            LOG.warn(_('Ignoring executor state %(path)s: %(e)s'),
+                     {'path': path, 'e': e})
+        fileutils.delete_if_exists(path)
+    if not states:
+        return
+
+    state = merge_states(states)
+    volt_executor = executor.get_default_executor()
+    volt_executor.restore_state(state)
+    volt_executor.flush()
+    LOG.info(_('Restored %(volumes)d trees and %(hosts)d hosts from the '
+               'previous master'),
+             {'volumes': len(state['volumes']),
+              'hosts': len(state['hosts'])})
+
+
+def spawn_master(sock, state_files):
+    """ Exec a new master which inherits sock and restores state_files.
+
+    :param sock: the listening socket, or None if the workers bind their own
+    :returns: the pid of the new master
+    """
+    if sock is not None:
+        fd = sock.fileno()
+        flags = fcntl.fcntl(fd, fcntl.F_GETFD)
+        fcntl.fcntl(fd, fcntl.F_SETFD, flags & ~fcntl.FD_CLOEXEC)
+
+    pid = os.fork()
+    if pid == 0:
+        try:
+            if sock is not None:
+                os.environ[LISTEN_FD_ENV] = '%d:%d' % (fd, sock.family)
+            os.environ[STATE_FILES_ENV] = os.pathsep.join(state_files)
+            os.execv(sys.executable, [sys.executable] + sys.argv)
+        finally:
+            os._exit(1)
+    return pid
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2014 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+""" Latency histograms of the current worker process.
+
+    The requests are counted by method, route and status and their latency
+    is recorded by method and route (see volt.api.metrics), the executor
+    calls are timed by name. A histogram has log-linear buckets, nine per
+    power of ten from 10 us to 10 s, so an observation costs a bisect and
+    two additions and the quantiles are known within a bucket.
+
+    As the counters of volt.common.stats, the histograms are neither shared
+    with nor aggregated by the master, every worker exports its own.
+"""
+import bisect
+import functools
+import time
+
+from oslo.config import cfg
+
+from volt.common import stats
+from volt.openstack.common.gettextutils import _
+
+
+metrics_opts = [
+    cfg.BoolOpt('time_executor_calls', default=True,
+                help=_('Record the latency of the executor calls, exported '
+                       'at /metrics.')),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(metrics_opts)
+
+# Upper bounds, in seconds, of the buckets of every histogram
+BOUNDS = tuple(float('%de%d' % (mantissa, exponent))
+               for exponent in range(-5, 1)
+               for mantissa in range(1, 10)) + (10.0,)
+
+# The calls of Executor which instrument times, those returning generators
+# are left out as only their creation would be timed
+EXECUTOR_CALLS = (
+    'get_volume_parents', 'get_volumes_parents', 'add_volume_metadata',
+    'add_volumes_metadata', 'delete_volume_metadata',
+    'delete_volumes_metadata', 'update_status', 'touch_hosts',
+    'kickoff_expired_hosts', 'flush',
+)
+
+# (method, route, status) -> number of requests
+REQUESTS = {}
+# (method, route) -> Histogram of the request latencies
+LATENCIES = {}
+# name -> Histogram of the executor call latencies
+CALLS = {}
+
+
+class Histogram(object):
+    """ Counts of the observations falling in each bucket of BOUNDS, the
+    last one counting those above all bounds.
+    """
+    __slots__ = ('counts', 'sum')
+
+    def __init__(self):
+        self.counts = [0] * (len(BOUNDS) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BOUNDS, value)] += 1
+        self.sum += value
+
+
+def record_request(method, route, status, elapsed):
+    key = (method, route, status)
+    REQUESTS[key] = REQUESTS.get(key, 0) + 1
+    histogram = LATENCIES.get((method, route))
+    if histogram is None:
+        histogram = LATENCIES[(method, route)] = Histogram()
+    histogram.observe(elapsed)
+
+
+def record_call(name, elapsed):
+    histogram = CALLS.get(name)
+    if histogram is None:
+        histogram = CALLS[name] = Histogram()
+    histogram.observe(elapsed)
+
+
+def timed(name, func):
+    """Return func recording the latency of its calls under name."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.time()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            record_call(name, time.time() - start)
+    return wrapper
+
+
+def instrument(executor):
+    """ Time the calls of EXECUTOR_CALLS made to executor, when
+    time_executor_calls is set.
+    """
+    if not CONF.time_executor_calls:
+        return
+    for name in EXECUTOR_CALLS:
+        func = getattr(executor, name, None)
+        if func is not None:
+            setattr(executor, name, timed(name, func))
+
+
+def reset():
+    REQUESTS.clear()
+    LATENCIES.clear()
+    CALLS.clear()
+
+
+def _labels(**labels):
+    return ','.join('%s="%s"' % (name, str(value).replace('\\', '\\\\')
+                                 .replace('"', '\\"'))
+                    for name, value in sorted(labels.items()))
+
+
+def _histogram_lines(name, labels, histogram):
+    lines = []
+    cumulative = 0
+    for bound, count in zip(BOUNDS, histogram.counts):
+        cumulative += count
+        lines.append('%s_bucket{%s} %d' % (name, _labels(le=repr(bound),
+                                                         **labels),
+                                           cumulative))
+    cumulative += histogram.counts[-1]
+    lines.append('%s_bucket{%s} %d' % (name, _labels(le='+Inf', **labels),
+                                       cumulative))
+    lines.append('%s_sum{%s} %r' % (name, _labels(**labels), histogram.sum))
+    lines.append('%s_count{%s} %d' % (name, _labels(**labels), cumulative))
+    return lines
+
+
+def export():
+    """Return all metrics in the text format of Prometheus."""
+    lines = [
+        '# HELP volt_http_requests_total Requests served, by status.',
+        '# TYPE volt_http_requests_total counter',
+    ]
+    for (method, route, status), count in sorted(REQUESTS.items()):
+        lines.append('volt_http_requests_total{%s} %d' %
+                     (_labels(method=method, route=route, status=status),
+                      count))
+
+    lines.extend([
+        '# HELP volt_http_request_duration_seconds Latency of the requests '
+        'until their response started.',
+        '# TYPE volt_http_request_duration_seconds histogram',
+    ])
+    for (method, route), histogram in sorted(LATENCIES.items()):
+        lines.extend(_histogram_lines('volt_http_request_duration_seconds',
+                                      {'method': method, 'route': route},
+                                      histogram))
+
+    lines.extend([
+        '# HELP volt_executor_call_duration_seconds Latency of the '
+        'executor calls.',
+        '# TYPE volt_executor_call_duration_seconds histogram',
+    ])
+    for name, histogram in sorted(CALLS.items()):
+        lines.extend(_histogram_lines('volt_executor_call_duration_seconds',
+                                      {'call': name}, histogram))
+
+    lines.extend([
+        '# HELP volt_stat Counters of volt.common.stats.',
+        '# TYPE volt_stat untyped',
+    ])
+    for name, value in sorted(stats.snapshot().items()):
+        lines.append('volt_stat{%s} %r' % (_labels(name=name), value))
+    return '\n'.join(lines) + '\n'
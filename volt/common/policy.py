@@ -16,10 +16,16 @@
 
 """Policy Engine For Glance"""
 
+import ast
 import copy
+import itertools
+import os
 import os.path
+import threading
+import time
 
 from oslo.config import cfg
+import six
 
 from volt.common import exception
 from volt.openstack.common import jsonutils
@@ -35,11 +41,199 @@ DEFAULT_RULES = {
     'default': policy.TrueCheck(),
 }
 
+policy_reload_opts = [
+    cfg.IntOpt('policy_reload_interval', default=5,
+               help=_('Seconds between two checks of the policy file for '
+                      'changes by every API worker, 0 disables the '
+                      'reload.')),
+    cfg.IntOpt('policy_cache_size', default=1024,
+               help=_('Number of policy decisions remembered by every API '
+                      'worker, 0 disables the cache.')),
+]
+
 CONF = cfg.CONF
+CONF.register_opts(policy_reload_opts)
 
 _rules = None
+_compiled = None
 _checks = {}
 
+_ENFORCER = None
+_RELOADER_PID = None
+
+
+class _CurrentRules(object):
+    """ Stands for the enforcer which the checks of openstack.common.policy
+    are called with, they only look up the rules in use through it.
+    """
+
+    @property
+    def rules(self):
+        return _rules
+
+
+_CURRENT_RULES = _CurrentRules()
+
+
+def _true(target, creds):
+    return True
+
+
+def _false(target, creds):
+    return False
+
+
+class CompiledRules(object):
+    """ The rules in use compiled into plain functions of (target, creds).
+
+    The decisions of the rules which combine several checks and only
+    depend on the roles and the tenant of the credentials are remembered
+    per (action, roles, tenant) in a bounded LRU, which drops its least
+    recently used half once full. A single check is cheaper to evaluate
+    than to look up. The rules are compiled again whenever they change.
+    """
+
+    def __init__(self, rules, cache_size):
+        # Also stands for the enforcer of the checks which are not compiled
+        self.rules = rules
+        self.cache_size = cache_size
+        # name -> (function, independent of the target, cached)
+        self.compiled = {}
+        # (action, roles, tenant) -> [decision, last use]
+        self.decisions = {}
+        self.uses = itertools.count()
+        for name in rules:
+            self._compile_rule(name, ())
+
+    def _compile_rule(self, name, seen):
+        """ Return the function of the rule name, whether its decisions are
+        independent of the target and whether they are remembered.
+
+        :raises: KeyError if there is no such rule, nor a default one
+        """
+        try:
+            return self.compiled[name]
+        except KeyError:
+            pass
+        rule = self.rules[name]
+        if name in seen:
+            # Circular references are left to openstack.common.policy
+            return self._compile_check(rule), False, False
+        func, memoizable = self._compile(rule, seen + (name,))
+        cached = memoizable and isinstance(rule, (policy.AndCheck,
+                                                  policy.OrCheck))
+        self.compiled[name] = func, memoizable, cached
+        return self.compiled[name]
+
+    def _compile_check(self, rule):
+        return lambda target, creds: rule(target, creds, self)
+
+    def _compile(self, rule, seen):
+        if isinstance(rule, policy.TrueCheck):
+            return _true, True
+        if isinstance(rule, policy.FalseCheck):
+            return _false, True
+        if isinstance(rule, policy.NotCheck):
+            func, memoizable = self._compile(rule.rule, seen)
+            return (lambda target, creds: not func(target, creds)), memoizable
+        if isinstance(rule, (policy.AndCheck, policy.OrCheck)):
+            compiled = [self._compile(sub_rule, seen)
+                        for sub_rule in rule.rules]
+            funcs = [func for func, memoizable in compiled]
+            memoizable = all(memoizable for func, memoizable in compiled)
+            if isinstance(rule, policy.AndCheck):
+                def func(target, creds):
+                    for sub_func in funcs:
+                        if not sub_func(target, creds):
+                            return False
+                    return True
+            else:
+                def func(target, creds):
+                    for sub_func in funcs:
+                        if sub_func(target, creds):
+                            return True
+                    return False
+            return func, memoizable
+        if isinstance(rule, policy.RoleCheck):
+            role = rule.match.lower()
+            return (lambda target, creds:
+                    role in [r.lower() for r in creds['roles']], True)
+        if isinstance(rule, policy.RuleCheck):
+            try:
+                return self._compile_rule(rule.match, seen)[:2]
+            except KeyError:
+                # We don't have any matching rule; fail closed
+                return _false, True
+        if isinstance(rule, policy.GenericCheck):
+            memoizable = '%(' not in rule.match and rule.kind != 'user'
+            return self._compile_generic(rule), memoizable
+        # http: and user defined checks
+        return self._compile_check(rule), False
+
+    def _compile_generic(self, rule):
+        kind, match = rule.kind, rule.match
+        try:
+            # Try to interpret kind as a literal
+            leftval = six.text_type(ast.literal_eval(kind))
+        except ValueError:
+            leftval = None
+        except Exception:
+            return self._compile_check(rule)
+
+        def func(target, creds):
+            try:
+                value = match % target
+            except KeyError:
+                return False
+            if leftval is not None:
+                return value == leftval
+            try:
+                return value == six.text_type(creds[kind])
+            except KeyError:
+                return False
+        return func
+
+    def is_memoizable(self, name):
+        """Whether the decisions of the rule name ignore the target"""
+        try:
+            return self._compile_rule(name, ())[1]
+        except KeyError:
+            return True
+
+    def decide(self, name, target, creds):
+        try:
+            func, memoizable, cached = (self.compiled.get(name) or
+                                        self._compile_rule(name, ()))
+        except KeyError:
+            # If the rule doesn't exist, fail closed
+            return False
+        if not cached or self.cache_size <= 0:
+            return func(target, creds)
+
+        key = (name, tuple(creds.get('roles', ())), creds.get('tenant'))
+        try:
+            entry = self.decisions[key]
+        except KeyError:
+            if len(self.decisions) >= self.cache_size:
+                self._evict()
+            entry = self.decisions[key] = [func(target, creds), None]
+        entry[1] = next(self.uses)
+        return entry[0]
+
+    def _evict(self):
+        """Drop the least recently used half of the decisions"""
+        by_use = sorted(self.decisions.items(), key=lambda item: item[1][1])
+        for key, entry in by_use[:len(by_use) - self.cache_size // 2]:
+            del self.decisions[key]
+
+
+def _get_compiled():
+    global _compiled
+
+    if _compiled is None or _compiled.rules is not _rules:
+        _compiled = CompiledRules(_rules, CONF.policy_cache_size)
+    return _compiled
+
 
 def check(rule, target, creds, exc=None, *args, **kwargs):
     """
@@ -65,17 +259,13 @@ def check(rule, target, creds, exc=None, *args, **kwargs):
 
     # Allow the rule to be a Check tree
     if isinstance(rule, policy.BaseCheck):
-        result = rule(target, creds)
+        result = rule(target, creds, _CURRENT_RULES)
     elif not _rules:
         # No rules to reference means we're going to fail closed
         result = False
     else:
-        try:
-            # Evaluate the rule
-            result = _rules[rule](target, creds)
-        except KeyError:
-            # If the rule doesn't exist, fail closed
-            result = False
+        # Evaluate the rule
+        result = _get_compiled().decide(rule, target, creds)
 
     # If it is False, raise the exception if requested
     if exc and result is False:
@@ -88,18 +278,22 @@ def check(rule, target, creds, exc=None, *args, **kwargs):
 def set_rules(rules):
     """Set the rules in use for policy checks."""
 
-    global _rules
+    global _rules, _compiled
 
     _rules = rules
+    _compiled = None
+    if rules:
+        _compiled = CompiledRules(rules, CONF.policy_cache_size)
 
 
 # Ditto
 def reset():
     """Clear the rules used for policy checks."""
 
-    global _rules
+    global _rules, _compiled
 
     _rules = None
+    _compiled = None
 
 
 class Enforcer(object):
@@ -123,6 +317,7 @@ class Enforcer(object):
         if _rules:
             rules_obj = policy.Rules(rules)
             _rules.update(rules_obj)
+            set_rules(_rules)
         else:
             set_rules(rules)
 
@@ -142,6 +337,19 @@ class Enforcer(object):
 
         self.set_rules(rules)
 
+    def reload_if_changed(self):
+        """Reload the rules if the policy file changed on disk"""
+        if not self.policy_path:
+            return False
+        try:
+            mtime = os.path.getmtime(self.policy_path)
+        except OSError:
+            return False
+        if mtime == self.policy_file_mtime:
+            return False
+        self.load_rules()
+        return True
+
     @staticmethod
     def _find_policy_file():
         """Locate the policy json data file"""
@@ -215,5 +423,47 @@ class Enforcer(object):
            :param context: Glance request context
            :returns: A non-False value if context role is admin.
         """
-        target = context.to_dict()
+        if _rules and _get_compiled().is_memoizable('context_is_admin'):
+            # The decision doesn't depend on the target
+            target = {}
+        else:
+            target = context.to_dict()
         return self.check(context, 'context_is_admin', target)
+
+
+class PolicyReloader(threading.Thread):
+    """ Reload the rules of an enforcer whenever the policy file changes.
+    """
+    def __init__(self, enforcer, interval):
+        self.enforcer = enforcer
+        self.interval = interval
+        threading.Thread.__init__(self)
+        self.daemon = True
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                if self.enforcer.reload_if_changed():
+                    LOG.info(_('Reloaded policy from %s'),
+                             self.enforcer.policy_path)
+            except Exception:
+                LOG.exception(_('Failed to reload policy from %s'),
+                              self.enforcer.policy_path)
+
+
+def get_enforcer():
+    """ Return the Enforcer shared by the whole process.
+
+    The first call in every process, e.g. in every API worker, starts
+    reloading the policy file in the background when it changes.
+    """
+    global _ENFORCER, _RELOADER_PID
+
+    if _ENFORCER is None:
+        _ENFORCER = Enforcer()
+    if _RELOADER_PID != os.getpid():
+        _RELOADER_PID = os.getpid()
+        if CONF.policy_reload_interval > 0 and _ENFORCER.policy_path:
+            PolicyReloader(_ENFORCER, CONF.policy_reload_interval).start()
+    return _ENFORCER
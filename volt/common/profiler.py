@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2014 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+""" On demand profiling of the current worker process.
+
+    Nothing is installed until a profile is asked for, and everything is
+    removed once it is over, so the profiler costs nothing otherwise. A
+    profile covers every greenthread of the worker for a bounded duration,
+    one profile at a time.
+
+    The 'sample' mode arms a SIGPROF interval timer, every
+    profiler_sample_interval seconds of CPU time the signal handler records
+    the stack of the running greenthread. It returns collapsed stacks, one
+    'frame;frame;... count' line per stack as flamegraph.pl reads them.
+    The 'cprofile' mode runs cProfile, which slows down every call, and
+    returns the pstats report or its marshalled data as written by
+    pstats.Stats.dump_stats.
+"""
+import collections
+import cProfile
+import marshal
+import pstats
+import signal
+import StringIO
+
+import eventlet
+from oslo.config import cfg
+
+from volt.common import exception
+from volt.openstack.common.gettextutils import _
+
+
+profiler_opts = [
+    cfg.BoolOpt('enable_profiler', default=False,
+                help=_('Let administrators profile a worker with GET '
+                       '/v1/profile.')),
+    cfg.IntOpt('profiler_max_duration', default=60,
+               help=_('Longest profile in seconds.')),
+    cfg.FloatOpt('profiler_sample_interval', default=0.005,
+                 help=_('Seconds of CPU time between two stacks recorded by '
+                        'the sampling profiler.')),
+    cfg.IntOpt('profiler_max_stacks', default=10000,
+               help=_('Number of distinct stacks recorded by the sampling '
+                      'profiler, the samples of the others are only '
+                      'counted.')),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(profiler_opts)
+
+MODES = ('sample', 'cprofile')
+# Formats of every mode, the first one by default
+FORMATS = {
+    'sample': ('collapsed',),
+    'cprofile': ('text', 'pstats'),
+}
+
+_RUNNING = False
+
+
+def frame_name(code):
+    return '%s:%s' % (code.co_filename, code.co_name)
+
+
+class StackSampler(object):
+    """ Counts the stacks interrupted by SIGPROF.
+    """
+
+    def __init__(self, interval, max_stacks):
+        self.interval = interval
+        self.max_stacks = max_stacks
+        self.stacks = collections.defaultdict(int)
+        # Samples of the stacks beyond max_stacks
+        self.dropped = 0
+        self.previous = None
+
+    def _sample(self, signum, frame):
+        names = []
+        while frame is not None:
+            names.append(frame_name(frame.f_code))
+            frame = frame.f_back
+        stack = ';'.join(reversed(names))
+        if stack in self.stacks or len(self.stacks) < self.max_stacks:
+            self.stacks[stack] += 1
+        else:
+            self.dropped += 1
+
+    def start(self):
+        self.previous = signal.signal(signal.SIGPROF, self._sample)
+        # Restart the system calls the signal interrupts
+        signal.siginterrupt(signal.SIGPROF, False)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+    def stop(self):
+        signal.setitimer(signal.ITIMER_PROF, 0)
+        signal.signal(signal.SIGPROF, self.previous or signal.SIG_DFL)
+
+    def collapsed(self):
+        """Return the collapsed stacks, the most sampled first."""
+        lines = ['%s %d' % (stack, count) for stack, count in
+                 sorted(self.stacks.items(), key=lambda item: -item[1])]
+        if self.dropped:
+            lines.append('[dropped] %d' % self.dropped)
+        return '\n'.join(lines) + '\n'
+
+
+def _sample(duration, fmt):
+    sampler = StackSampler(CONF.profiler_sample_interval,
+                           CONF.profiler_max_stacks)
+    sampler.start()
+    try:
+        eventlet.sleep(duration)
+    finally:
+        sampler.stop()
+    return sampler.collapsed()
+
+
+def _cprofile(duration, fmt, limit=50):
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        eventlet.sleep(duration)
+    finally:
+        profile.disable()
+    if fmt == 'pstats':
+        profile.create_stats()
+        return marshal.dumps(profile.stats)
+    output = StringIO.StringIO()
+    stats = pstats.Stats(profile, stream=output)
+    stats.sort_stats('cumulative').print_stats(limit)
+    return output.getvalue()
+
+
+def run(mode, duration, fmt=None):
+    """ Profile the worker for duration seconds, at most
+    profiler_max_duration, and return the report.
+
+    :param mode: one of MODES
+    :param fmt: one of the FORMATS of mode
+    :raises ProfilerBusy if a profile is running
+    """
+    global _RUNNING
+
+    if mode not in MODES:
+        raise exception.Invalid(_("mode must be one of %s") %
+                                ', '.join(MODES))
+    fmt = fmt or FORMATS[mode][0]
+    if fmt not in FORMATS[mode]:
+        raise exception.Invalid(_("format must be one of %s") %
+                                ', '.join(FORMATS[mode]))
+    if _RUNNING:
+        raise exception.ProfilerBusy()
+    duration = min(duration, CONF.profiler_max_duration)
+    _RUNNING = True
+    try:
+        if mode == 'sample':
+            return _sample(duration, fmt)
+        return _cprofile(duration, fmt)
+    finally:
+        _RUNNING = False
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2014 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+""" Counters of the current worker process.
+
+    Every worker counts on its own, the counters are neither shared with
+    nor aggregated by the master.
+"""
+import collections
+
+COUNTERS = collections.defaultdict(int)
+
+
+def incr(name, amount=1):
+    COUNTERS[name] += amount
+
+
+def get(name):
+    return COUNTERS.get(name, 0)
+
+
+def snapshot():
+    """Return a copy of all counters."""
+    return dict(COUNTERS)
+
+
+def reset():
+    COUNTERS.clear()
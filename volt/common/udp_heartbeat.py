@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2014 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+""" Heartbeats over UDP.
+
+    A host which only needs to stay alive, not to learn its parents, sends
+    a datagram to udp_heartbeat_port instead of PUT /v1/members/heartbeat.
+    The datagram is 28 bytes long:
+
+        magic 'VHB1' | timestamp, milliseconds, uint64 | HMAC (16 bytes)
+
+    The HMAC-SHA256 of udp_heartbeat_key covers the magic, the timestamp
+    and the source address of the datagram, which is the host refreshed as
+    REMOTE_ADDR is for HTTP. Datagrams older than udp_heartbeat_max_skew
+    seconds, or not newer than the last one of the host, are dropped.
+
+    Every worker reads the datagrams from a greenthread, up to
+    udp_heartbeat_batch_size at once, refreshes the timestamps of their
+    hosts with a single Executor.touch_hosts and flushes the executor
+    once per batch.
+"""
+import errno
+import hashlib
+import hmac
+import socket
+import struct
+import time
+
+import eventlet
+from eventlet import hubs
+from oslo.config import cfg
+
+from volt.common import stats
+from volt.common import utils
+from volt import executor
+from volt.executor import replication
+from volt.openstack.common.gettextutils import _
+from volt.openstack.common import log as logging
+
+
+LOG = logging.getLogger(__name__)
+
+udp_heartbeat_opts = [
+    cfg.IntOpt('udp_heartbeat_port', default=0,
+               help=_('Port on bind_host receiving the heartbeats sent '
+                      'over UDP, 0 disables them.')),
+    cfg.StrOpt('udp_heartbeat_key', secret=True,
+               help=_('Key of the HMAC authenticating the heartbeats sent '
+                      'over UDP, shared with the hosts.')),
+    cfg.IntOpt('udp_heartbeat_max_skew', default=30,
+               help=_('Seconds a heartbeat sent over UDP is accepted after, '
+                      'or before, its timestamp.')),
+    cfg.IntOpt('udp_heartbeat_batch_size', default=256,
+               help=_('Maximum number of heartbeats sent over UDP handled '
+                      'in a single executor call.')),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(udp_heartbeat_opts)
+
+MAGIC = 'VHB1'
+HEADER = struct.Struct('!4sQ')
+DIGEST_SIZE = 16
+DATAGRAM_SIZE = HEADER.size + DIGEST_SIZE
+
+
+def _digest(key, header, host):
+    return hmac.new(key, header + host, hashlib.sha256).digest()[:DIGEST_SIZE]
+
+
+def pack(key, host, timestamp=None):
+    """ Return the heartbeat datagram of host, as seen by the server.
+
+    :param timestamp: milliseconds since the epoch, now by default
+    """
+    if timestamp is None:
+        timestamp = int(time.time() * 1000)
+    header = HEADER.pack(MAGIC, timestamp)
+    return header + _digest(key, header, host)
+
+
+def unpack(key, host, datagram):
+    """Return the timestamp of a datagram sent by host, or None."""
+    if len(datagram) != DATAGRAM_SIZE:
+        return None
+    header = datagram[:HEADER.size]
+    magic, timestamp = HEADER.unpack(header)
+    if magic != MAGIC:
+        return None
+    expected = _digest(key, header, host)
+    if not utils.constant_time_compare(expected, datagram[HEADER.size:]):
+        return None
+    return timestamp
+
+
+def get_socket(reuse_port=False):
+    """ Bind the non blocking socket receiving the heartbeats.
+
+    :param reuse_port: bind a socket of this process only, with SO_REUSEPORT
+    """
+    bind_addr = (CONF.bind_host, CONF.udp_heartbeat_port)
+    family = socket.getaddrinfo(bind_addr[0], bind_addr[1], socket.AF_UNSPEC,
+                                socket.SOCK_DGRAM)[0][0]
+    sock = socket.socket(family, socket.SOCK_DGRAM)
+    # Lets the next master bind the port while this one drains
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind(bind_addr)
+    sock.setblocking(False)
+    return sock
+
+
+class UDPHeartbeatListener(object):
+    """ Refreshes the hosts whose heartbeats are received on a socket.
+    """
+
+    def __init__(self, sock, volt_executor, key):
+        self.sock = sock
+        self.executor = volt_executor
+        self.key = key
+        self.batch_size = max(1, CONF.udp_heartbeat_batch_size)
+        self.max_skew = CONF.udp_heartbeat_max_skew * 1000
+        # host -> timestamp of its last accepted heartbeat
+        self.last_seen = {}
+        self.thread = None
+
+    def receive(self):
+        """ Wait for the next datagrams and return them with the addresses
+        they were sent from, at most udp_heartbeat_batch_size.
+        """
+        datagrams = []
+        while len(datagrams) < self.batch_size:
+            try:
+                datagram, address = self.sock.recvfrom(DATAGRAM_SIZE + 1)
+            except socket.error as e:
+                if e.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    raise
+                if datagrams:
+                    break
+                hubs.trampoline(self.sock, read=True)
+                continue
+            datagrams.append((datagram, address[0]))
+        return datagrams
+
+    def process(self, datagrams, now=None):
+        """ Refresh the hosts of the authentic datagrams.
+
+        :returns: the number of hosts refreshed
+        """
+        now = now or int(time.time() * 1000)
+        hosts = set()
+        for datagram, host in datagrams:
+            timestamp = unpack(self.key, host, datagram)
+            if (timestamp is None or
+                    abs(now - timestamp) > self.max_skew or
+                    timestamp <= self.last_seen.get(host, 0)):
+                stats.incr('udp_heartbeat.rejected')
+                continue
+            self.last_seen[host] = timestamp
+            hosts.add(host)
+        stats.incr('udp_heartbeat.received', len(datagrams))
+        if not hosts or replication.is_follower():
+            return 0
+        try:
+            unknown = self.executor.touch_hosts(hosts)
+        finally:
+            self.executor.flush()
+        for host in unknown:
+            # Forgotten until it joins a tree again
+            self.last_seen.pop(host, None)
+        stats.incr('udp_heartbeat.unknown', len(unknown))
+        return len(hosts) - len(unknown)
+
+    def run(self):
+        while True:
+            try:
+                self.process(self.receive())
+            except Exception:
+                LOG.exception(_('Failed to handle heartbeats sent over UDP'))
+                eventlet.sleep(1)
+
+    def stop(self):
+        if self.thread is not None:
+            self.thread.kill()
+            self.thread = None
+
+
+def start(sock):
+    """ Handle the heartbeats received on sock from a greenthread of the
+    current process, and return the listener.
+    """
+    if not CONF.udp_heartbeat_key:
+        LOG.error(_('udp_heartbeat_key is not set, heartbeats sent over UDP '
+                    'are ignored'))
+        return None
+    listener = UDPHeartbeatListener(sock, executor.get_default_executor(),
+                                    CONF.udp_heartbeat_key)
+    listener.thread = eventlet.spawn(listener.run)
+    return listener
@@ -17,6 +17,7 @@
 
 import os
 import binascii
+import hmac
 
 from webob import exc
 from OpenSSL import crypto
@@ -197,3 +198,18 @@ def get_image_id_from_peerid(peer_id):
     else:
         (host, image_id) = peer_id.split(':')
         return image_id
+
+
+def _compare_digest(first, second):
+    """ Return true if the strings are equal, in a time which depends on
+    their length only.
+    """
+    if len(first) != len(second):
+        return False
+    result = 0
+    for x, y in zip(first, second):
+        result |= ord(x) ^ ord(y)
+    return result == 0
+
+
+constant_time_compare = getattr(hmac, 'compare_digest', _compare_digest)
@@ -25,15 +25,18 @@ import datetime
 import errno
 import json
 import os
+import re
 import signal
 import sys
 import time
+import types
 
 import eventlet
 from eventlet.green import socket
 from eventlet.green import ssl
 import eventlet.greenio
 import eventlet.wsgi
+import greenlet
 from oslo.config import cfg
 import routes
 import routes.middleware
@@ -41,8 +44,15 @@ import webob.dec
 import webob.exc
 from paste import deploy
 
+from volt.common import binary
 from volt.common import exception
+from volt.common import handoff
+from volt.common import stats
+from volt.common import udp_heartbeat
 from volt.common import utils
+from volt import executor
+from volt.executor import events
+from volt.executor import replication
 from volt.openstack.common import gettextutils
 from volt.openstack.common import jsonutils
 from volt.openstack.common import log as logging
@@ -85,6 +95,31 @@ eventlet_opts = [
                       'only supported \'poll\', however \'selects\' may be '
                       'appropriate for some platforms. See '
                       'http://eventlet.net/doc/hubs.html for more details.')),
+    cfg.BoolOpt('reuse_port', default=False,
+                help=_('Let every worker bind its own listening socket with '
+                       'SO_REUSEPORT, so that the kernel balances the '
+                       'connections between the workers instead of waking '
+                       'them all on a shared socket.')),
+    cfg.BoolOpt('http_keepalive', default=True,
+                help=_('If False, the server closes the connection after '
+                       'every response. If True, HTTP/1.1 clients and '
+                       'clients asking for keep-alive can send several '
+                       'requests over the same connection.')),
+    cfg.IntOpt('client_socket_timeout', default=900,
+               help=_('Timeout for client connections\' socket operations. '
+                      'If an incoming connection is idle for this number of '
+                      'seconds it will be closed. A value of \'0\' means '
+                      'wait forever.')),
+    cfg.IntOpt('max_requests_per_connection', default=0,
+               help=_('Number of requests served over a keep-alive '
+                      'connection before the server closes it, so that '
+                      'long lived clients are spread again between the '
+                      'workers. A value of \'0\' means no limit.')),
+    cfg.IntOpt('wsgi_default_pool_size', default=1000,
+               help=_('Size of the pool of greenthreads serving the requests '
+                      'of every worker. Each parked GET /v1/members/watch '
+                      'holds one of them, keep it above the sum of '
+                      'watch_max_parked and max_concurrent_requests.')),
     cfg.IntOpt('max_header_line', default=16384,
                help=_('Maximum line size of message headers to be accepted. '
                       'max_header_line may need to be increased when using '
@@ -106,13 +141,30 @@ def get_bind_addr(default_port=None):
     return (CONF.bind_host, CONF.bind_port or default_port)
 
 
-def get_socket(default_port):
+def listen_reuse_port(bind_addr, family):
+    """
+    Listen on bind_addr with SO_REUSEPORT set, so that several processes can
+    bind the same address and the kernel spreads the connections
+    """
+    if not hasattr(socket, 'SO_REUSEPORT'):
+        raise RuntimeError(_("SO_REUSEPORT is not supported on this "
+                             "platform"))
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind(bind_addr)
+    sock.listen(CONF.backlog)
+    return sock
+
+
+def get_socket(default_port, reuse_port=False):
     """
     Bind socket to bind ip:port in conf
 
     note: Mostly comes from Swift with a few small changes...
 
     :param default_port: port to bind to if none is specified in conf
+    :param reuse_port: bind a socket of this process only, with SO_REUSEPORT
 
     :returns : a socket object as returned from socket.listen or
                ssl.wrap_socket if conf specifies cert_file
@@ -154,16 +206,21 @@ def get_socket(default_port):
 
         return ssl.wrap_socket(sock, **ssl_kwargs)
 
-    sock = utils.get_test_suite_socket()
+    sock = None
+    if not reuse_port:
+        sock = handoff.inherited_socket() or utils.get_test_suite_socket()
     retry_until = time.time() + 30
 
     if sock and use_ssl:
         sock = wrap_ssl(sock)
     while not sock and time.time() < retry_until:
         try:
-            sock = eventlet.listen(bind_addr,
-                                   backlog=CONF.backlog,
-                                   family=address_family)
+            if reuse_port:
+                sock = listen_reuse_port(bind_addr, address_family)
+            else:
+                sock = eventlet.listen(bind_addr,
+                                       backlog=CONF.backlog,
+                                       family=address_family)
             if use_ssl:
                 sock = wrap_ssl(sock)
 
@@ -188,16 +245,51 @@ def get_socket(default_port):
     return sock
 
 
+class HttpProtocol(eventlet.wsgi.HttpProtocol):
+    """
+    Counts the connections and requests handled by this worker, and closes
+    keep-alive connections after max_requests_per_connection requests
+    """
+
+    def setup(self):
+        stats.incr('wsgi.accepted')
+        self.requests = 0
+        eventlet.wsgi.HttpProtocol.setup(self)
+
+    def handle_one_response(self):
+        stats.incr('wsgi.requests')
+        self.requests += 1
+        if self.requests == CONF.max_requests_per_connection:
+            # Sends "Connection: close" with the response
+            self.close_connection = 1
+
+        # When eventlet.wsgi.server stops, it shuts down the connections
+        # which are idle and waits for the others. Some eventlet releases
+        # never mark a connection as busy, do it here.
+        conn_state = getattr(self, 'conn_state', None)
+        if conn_state is not None:
+            conn_state[2] = eventlet.wsgi.STATE_REQUEST
+        try:
+            return eventlet.wsgi.HttpProtocol.handle_one_response(self)
+        finally:
+            if (conn_state is not None and
+                    conn_state[2] == eventlet.wsgi.STATE_REQUEST):
+                conn_state[2] = eventlet.wsgi.STATE_IDLE
+
+
 class Server(object):
     """Server class to manage multiple WSGI sockets and applications."""
 
-    def __init__(self, name, loader=None, threads=1000):
+    def __init__(self, name, loader=None, threads=None):
         eventlet.wsgi.MAX_HEADER_LINE = CONF.max_header_line
-        self.threads = threads
+        self.threads = threads or CONF.wsgi_default_pool_size
         self.loader = loader or Loader()
         self.application = self.loader.load_app(name)
         self.children = []
         self.running = True
+        self.reloading = False
+        self.udp_sock = None
+        self.udp_listener = None
 
     def start(self, default_port):
         """
@@ -217,12 +309,26 @@ class Server(object):
 
         def hup(*args):
             """
-            Shuts down the server, but allows running requests to complete
+            Hands the listening socket and the executor state over to a new
+            master, and lets running requests complete
             """
             signal.signal(signal.SIGHUP, signal.SIG_IGN)
+            self.reloading = True
             self.running = False
 
-        self.sock = get_socket(default_port)
+        replication.check_workers(CONF.workers)
+        if executor.EXECUTOR is not None:
+            executor.EXECUTOR.driver.check_workers(CONF.workers)
+        self.default_port = default_port
+        if CONF.workers and CONF.reuse_port:
+            # Every worker binds its own socket, see run_child
+            self.sock = None
+        else:
+            self.sock = get_socket(default_port)
+        if CONF.udp_heartbeat_port and not (CONF.workers and
+                                            CONF.reuse_port):
+            self.udp_sock = udp_heartbeat.get_socket()
+        handoff.restore_state()
 
         os.umask(0o27)  # ensure files are created with the correct privileges
         self.logger = logging.getLogger('volt.wsgi.server')
@@ -231,15 +337,25 @@ class Server(object):
             # Useful for profiling, test, debug etc.
             self.pool = self.create_pool()
             self.pool.spawn_n(self._single_run, self.application, self.sock)
+            self._start_udp_heartbeat()
             return
         else:
             self.logger.info(_("Starting %d workers") % CONF.workers)
             signal.signal(signal.SIGTERM, kill_children)
             signal.signal(signal.SIGINT, kill_children)
             signal.signal(signal.SIGHUP, hup)
+            # The executor created by the application, or restoring the
+            # state, is inherited by the workers, which open their own
+            # connections to its storage
+            if executor.EXECUTOR is not None:
+                executor.EXECUTOR.driver.close()
             while len(self.children) < CONF.workers:
                 self.run_child()
 
+    @property
+    def client_socket_timeout(self):
+        return CONF.client_socket_timeout or None
+
     def create_pool(self):
         return eventlet.GreenPool(size=self.threads)
 
@@ -247,6 +363,8 @@ class Server(object):
         while self.running:
             try:
                 pid, status = os.wait()
+                if pid not in self.children:
+                    continue
                 if os.WIFEXITED(status) or os.WIFSIGNALED(status):
                     self.logger.info(_('Removing dead child %s') % pid)
                     self.children.remove(pid)
@@ -265,10 +383,54 @@ class Server(object):
             except KeyboardInterrupt:
                 self.logger.info(_('Caught keyboard interrupt. Exiting.'))
                 break
-        eventlet.greenio.shutdown_safe(self.sock)
-        self.sock.close()
+        if self.reloading:
+            self.reload()
+        elif self.sock is not None:
+            eventlet.greenio.shutdown_safe(self.sock)
+        if self.sock is not None:
+            self.sock.close()
+        if self.udp_sock is not None:
+            self.udp_sock.close()
         self.logger.debug(_('Exited'))
 
+    def reload(self):
+        """
+        Start a new master on the listening socket with the executor state
+        of the workers, then wait for the workers to drain.
+
+        The socket is only closed, never shut down, as it is shared with
+        the new master. With reuse_port the workers of the new master bind
+        their own sockets instead, and connections still queued on the
+        socket of an old worker when it stops accepting are reset. Requests
+        which complete in the old workers after their state was written are
+        not seen by the new master.
+        """
+        state_files = []
+        for pid in self.children:
+            state_files.append(handoff.state_path(pid))
+            os.kill(pid, signal.SIGHUP)
+        state_files = handoff.wait_for_files(state_files,
+                                             CONF.reload_timeout)
+        pid = handoff.spawn_master(self.sock, state_files)
+        self.logger.info(_('Started new master %(pid)s with the state of '
+                           '%(count)d workers') %
+                         {'pid': pid, 'count': len(state_files)})
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+        while self.children:
+            try:
+                pid, status = os.wait()
+                if pid in self.children:
+                    self.logger.info(_('Worker %s drained') % pid)
+                    self.children.remove(pid)
+            except OSError as err:
+                if err.errno == errno.ECHILD:
+                    break
+                if err.errno != errno.EINTR:
+                    raise
+
     def wait(self):
         """Wait until all servers have completed running."""
         try:
@@ -282,12 +444,16 @@ class Server(object):
     def run_child(self):
         pid = os.fork()
         if pid == 0:
-            signal.signal(signal.SIGHUP, signal.SIG_DFL)
+            signal.signal(signal.SIGHUP, self._drain)
             signal.signal(signal.SIGTERM, signal.SIG_DFL)
             # ignore the interrupt signal to avoid a race whereby
             # a child worker receives the signal before the parent
             # and is respawned unnecessarily as a result
             signal.signal(signal.SIGINT, signal.SIG_IGN)
+            if CONF.reuse_port:
+                self.sock = get_socket(self.default_port, reuse_port=True)
+                if CONF.udp_heartbeat_port:
+                    self.udp_sock = udp_heartbeat.get_socket(reuse_port=True)
             self.run_server()
             self.logger.info(_('Child %d exiting normally') % os.getpid())
             # self.pool.waitall() has been called by run_server, so
@@ -297,10 +463,36 @@ class Server(object):
             self.logger.info(_('Started child %s') % pid)
             self.children.append(pid)
 
+    def _drain(self, *args):
+        """
+        Write the executor state for the new master, stop accepting and
+        exit once the running requests have completed
+        """
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        if self.udp_listener is not None:
+            self.udp_listener.stop()
+        # The pool waits for the running requests, event streams included
+        events.drain()
+
+        def drain():
+            try:
+                handoff.write_state(handoff.state_path(os.getpid()))
+            except Exception:
+                self.logger.exception(_('Failed to write the executor '
+                                        'state'))
+            # eventlet.wsgi.server stops on SystemExit, it closes the idle
+            # connections and waits for the running requests. Closing the
+            # listening socket under a pending accept() hangs the poll hub.
+            eventlet.hubs.get_hub().schedule_call_global(
+                0, self.server_greenlet.throw, SystemExit())
+
+        # The state is written from a green thread, so that it is never
+        # taken in the middle of a request changing it.
+        eventlet.spawn_n(drain)
+
     def run_server(self):
         """Run a WSGI server."""
 
-        eventlet.wsgi.HttpProtocol.default_request_version = "HTTP/1.0"
         try:
             eventlet.hubs.use_hub(cfg.CONF.eventlet_hub)
         except Exception:
@@ -308,21 +500,34 @@ class Server(object):
             raise exception.WorkerCreationFailure(
                 reason=msg % cfg.CONF.eventlet_hub)
         self.pool = self.create_pool()
+        self.server_greenlet = greenlet.getcurrent()
+        self._start_udp_heartbeat()
         try:
             eventlet.wsgi.server(self.sock,
                                  self.application,
                                  log=logging.WritableLogger(self.logger),
                                  custom_pool=self.pool,
+                                 protocol=HttpProtocol,
+                                 keepalive=CONF.http_keepalive,
+                                 socket_timeout=self.client_socket_timeout,
                                  debug=False)
         except socket.error as err:
             if err[0] != errno.EINVAL:
                 raise
         self.pool.waitall()
 
+    def _start_udp_heartbeat(self):
+        """Handle the heartbeats sent over UDP in the current process."""
+        if self.udp_sock is not None:
+            self.udp_listener = udp_heartbeat.start(self.udp_sock)
+
     def _single_run(self, application, sock):
         """Start a WSGI server in a new green thread."""
         self.logger.info(_("Starting single process server"))
         eventlet.wsgi.server(sock, application, custom_pool=self.pool,
+                             protocol=HttpProtocol,
+                             keepalive=CONF.http_keepalive,
+                             socket_timeout=self.client_socket_timeout,
                              log=logging.WritableLogger(self.logger),
                              debug=False)
 
@@ -455,18 +660,60 @@ class Router(object):
         self.map = mapper
         self._router = routes.middleware.RoutesMiddleware(self._dispatch,
                                                           self.map)
+        self._table = compile_routes(self.map)
 
     @classmethod
     def factory(cls, global_conf, **local_conf):
         return cls(APIMapper())
 
-    @webob.dec.wsgify
-    def __call__(self, req):
+    def __call__(self, environ, start_response):
         """
         Route the incoming request to a controller based on self.map.
         If no match, return a 404.
         """
-        return self._router
+        found = self._match(environ)
+        if found is None:
+            return self._router(environ, start_response)
+        match, route = found
+        environ['wsgiorg.routing_args'] = ((), match)
+        environ['routes.route'] = route
+        return match['controller'](environ, start_response)
+
+    def _match(self, environ):
+        """
+        Look the request up in the compiled route table. Returns the match
+        dict and the route, or None if the request has to go through
+        self._router instead.
+        """
+        if self._table is None:
+            return None
+        method = environ['REQUEST_METHOD']
+        if ('_method' in environ.get('QUERY_STRING', '') or
+                (method == 'POST' and
+                 routes.middleware.is_form_post(environ))):
+            # Method overrides are left to RoutesMiddleware
+            return None
+        segments = environ['PATH_INFO'].split('/')
+        candidates = self._table.get((method, len(segments)))
+        if candidates is None or segments[0]:
+            return None
+        for literals, variables, route in candidates:
+            for index, literal in literals:
+                if segments[index] != literal:
+                    break
+            else:
+                match = route.defaults.copy()
+                for index, name in variables:
+                    value = segments[index]
+                    if not value:
+                        break
+                    if route.encoding:
+                        value = value.decode(route.encoding,
+                                             route.decode_errors)
+                    match[name] = value
+                else:
+                    return match, route
+        return None
 
     @staticmethod
     @webob.dec.wsgify
@@ -483,12 +730,68 @@ class Router(object):
         return app
 
 
+def _compile_route(route):
+    """
+    Split the path of a route into its literal and variable segments, or
+    return None if matching it takes more than comparing segments.
+    """
+    if (not route.routepath.startswith('/') or route.reqs or
+            route.redirect or set(route.conditions or ()) != set(['method'])):
+        return None
+    segments = route.routepath.split('/')
+    literals = []
+    variables = []
+    for index, segment in enumerate(segments):
+        if segment.startswith('{') and segment.endswith('}'):
+            name = segment[1:-1]
+            if (not re.match(r'\w+$', name) or
+                    name in ('path_info', 'format') or name in route.defaults):
+                return None
+            variables.append((index, name))
+        elif any(char in segment for char in '{}:*()'):
+            return None
+        else:
+            literals.append((index, segment))
+    return len(segments), tuple(literals), tuple(variables)
+
+
+def compile_routes(mapper):
+    """
+    Compile the routes of mapper into a table keyed by the request method
+    and the number of path segments. Each entry lists the candidate routes
+    in the order of the mapper, so that the first route connected still
+    wins. Returns None if any route can't be compiled, in which case every
+    request goes through RoutesMiddleware.
+    """
+    if mapper.prefix or mapper.sub_domains:
+        return None
+    table = {}
+    for route in mapper.matchlist:
+        if route.static:
+            continue
+        if route.routepath == '' and route.redirect:
+            # Only matches an empty PATH_INFO, which is never compiled
+            continue
+        compiled = _compile_route(route)
+        if compiled is None:
+            LOG.debug(_("Route %s can't be compiled, using RoutesMiddleware "
+                        "for all routes"), route.routepath)
+            return None
+        length, literals, variables = compiled
+        for method in route.conditions['method']:
+            table.setdefault((method, length), []).append(
+                (literals, variables, route))
+    return table
+
+
 class Request(webob.Request):
     """Add some OpenStack API-specific logic to the base webob.Request."""
 
     def best_match_content_type(self):
         """Determine the requested response content-type."""
-        supported = ('application/json',)
+        if 'HTTP_ACCEPT' not in self.environ:
+            return 'application/json'
+        supported = ('application/json', binary.CONTENT_TYPE)
         bm = self.accept.best_match(supported)
         return bm or 'application/json'
 
@@ -548,6 +851,16 @@ class JSONRequestDeserializer(object):
             return {}
 
 
+_encode_string = json.encoder.encode_basestring_ascii
+
+# Number of items of a streamed list encoded per chunk of the response
+STREAM_CHUNK_ITEMS = 100
+
+# Set by the actions to send an ETag with their result, see
+# volt.api.conditional
+ETAG_ENVIRON_KEY = 'volt.etag'
+
+
 class JSONResponseSerializer(object):
 
     def _sanitizer(self, obj):
@@ -559,11 +872,89 @@ class JSONResponseSerializer(object):
         return obj
 
     def to_json(self, data):
+        if isinstance(data, list):
+            encoded = [self._encode_parents(item) for item in data]
+            if None not in encoded:
+                return '[%s]' % ', '.join(encoded)
+        else:
+            encoded = self._encode_parents(data)
+            if encoded is not None:
+                return encoded
         return jsonutils.dumps(data, default=self._sanitizer)
 
+    def _encode_parents(self, data):
+        """
+        Encode the parents of a peer, e.g. {'peer_id': ..., 'parents': [...]},
+        by joining the encodings the parents carry (see impl_btree.Identity)
+        rather than encoding them again. Returns None for anything else,
+        which is left to jsonutils.
+        """
+        if type(data) is not dict:
+            return None
+        members = []
+        for key, value in data.iteritems():
+            if isinstance(value, list):
+                try:
+                    value = '[%s]' % ', '.join([parent.encoded
+                                                for parent in value])
+                except (AttributeError, TypeError):
+                    return None
+            elif isinstance(value, basestring):
+                value = _encode_string(value)
+            elif value is None:
+                value = 'null'
+            else:
+                return None
+            members.append('%s: %s' % (_encode_string(key), value))
+        return '{%s}' % ', '.join(members)
+
+    def iter_json(self, items):
+        """
+        Encode the items of a generator as a JSON list, chunk by chunk, so
+        that the response is sent while the items are being produced.
+        """
+        prefix = '['
+        batch = []
+        for item in items:
+            batch.append(item)
+            if len(batch) == STREAM_CHUNK_ITEMS:
+                # Encode the batch as a list and drop its brackets
+                yield prefix + jsonutils.dumps(batch,
+                                               default=self._sanitizer)[1:-1]
+                prefix = ', '
+                batch = []
+        if batch:
+            yield prefix + jsonutils.dumps(batch,
+                                           default=self._sanitizer)[1:-1] + ']'
+        else:
+            yield '[]' if prefix == '[' else ']'
+
     def default(self, response, result):
         response.content_type = 'application/json'
-        response.body = self.to_json(result)
+        if isinstance(result, types.GeneratorType):
+            # Sent with chunked transfer encoding
+            response.app_iter = self.iter_json(result)
+        else:
+            response.body = self.to_json(result)
+
+
+class BinaryResponseSerializer(object):
+    """Encodes the results of the actions with volt.common.binary."""
+
+    def _sanitizer(self, obj):
+        if isinstance(obj, datetime.datetime):
+            return obj.isoformat()
+        if hasattr(obj, "to_dict"):
+            return obj.to_dict()
+        raise TypeError('%r can not be encoded' % (obj,))
+
+    def default(self, response, result):
+        response.content_type = binary.CONTENT_TYPE
+        if isinstance(result, types.GeneratorType):
+            response.app_iter = binary.iter_dumps(result, STREAM_CHUNK_ITEMS,
+                                                  default=self._sanitizer)
+        else:
+            response.body = binary.dumps(result, default=self._sanitizer)
 
 
 def translate_exception(req, e):
@@ -612,6 +1003,10 @@ class Resource(object):
         self.controller = controller
         self.serializer = serializer or JSONResponseSerializer()
         self.deserializer = deserializer or JSONRequestDeserializer()
+        self.serializers = {
+            'application/json': self.serializer,
+            binary.CONTENT_TYPE: BinaryResponseSerializer(),
+        }
 
     @webob.dec.wsgify(RequestClass=Request)
     def __call__(self, request):
@@ -631,9 +1026,16 @@ class Resource(object):
             exc_info = sys.exc_info()
             raise translate_exception(request, e), None, exc_info[2]
 
+        if isinstance(action_result, webob.Response):
+            # e.g. a stream of another content type
+            return action_result
+
         try:
             response = webob.Response(request=request)
-            self.dispatch(self.serializer, action, response, action_result)
+            serializer = self.serializers[request.best_match_content_type()]
+            self.dispatch(serializer, action, response, action_result)
+            if ETAG_ENVIRON_KEY in request.environ:
+                response.headers['ETag'] = request.environ[ETAG_ENVIRON_KEY]
             return response
         except webob.exc.WSGIHTTPException as e:
             return translate_exception(request, e)
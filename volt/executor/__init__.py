@@ -18,10 +18,16 @@
 
 from oslo.config import cfg
 from stevedore import driver
+import collections
+import functools
 import threading
 import time
 import sys
 
+from volt.common import exception
+from volt.common import metrics
+from volt.executor import events
+from volt.executor import replication
 from volt.openstack.common.gettextutils import _
 
 EXECUTOR_NAMESPACE = 'volt.executor'
@@ -50,6 +56,9 @@ def get_default_executor():
             EXECUTOR_NAMESPACE, CONF.default_executor,
             invoke_on_load=True
         )
+        replication.setup(EXECUTOR.driver)
+        events.setup(EXECUTOR.driver)
+        metrics.instrument(EXECUTOR.driver)
     return EXECUTOR.driver
 
 
@@ -57,7 +66,38 @@ class Executor(object):
     """ The Base class of Executor
     """
     def __init__(self):
-        pass
+        self.listeners = []
+        self.topology_listeners = []
+
+    def add_listener(self, listener):
+        """ Register a callable which is invoked as listener(event, payload)
+        after every change of the tracked topology.
+
+        The events are 'join' (a peer asked for a slot), 'register',
+        'remove' and 'evict' (a host missed its heartbeats); the payload is a
+        dict of the arguments which reproduce the change.
+        """
+        self.listeners.append(listener)
+
+    def notify(self, event, **payload):
+        for listener in self.listeners:
+            listener(event, payload)
+
+    def add_topology_listener(self, listener):
+        """ Register a callable which is invoked as listener(event, payload)
+        with the consequences of the changes reported to the listeners of
+        add_listener, which followers do not replay.
+
+        The events are 'reparent', the parents of the hosts of the payload
+        in the tree of its volume_id may have changed (all three are None
+        when every tree was replaced), and 'status', a peer went from the
+        status old to new.
+        """
+        self.topology_listeners.append(listener)
+
+    def notify_topology(self, event, **payload):
+        for listener in self.topology_listeners:
+            listener(event, payload)
 
     def get_volumes_list(self):
         raise NotImplementedError()
@@ -65,21 +105,172 @@ class Executor(object):
     def get_volumes_detail(self, volume_id):
         raise NotImplementedError()
 
+    def iter_volumes(self, marker=None, limit=None, host=None, status=None):
+        """ Return a generator of one page of get_volumes_list.
+
+        The volumes are ordered by id, the page starts after the id marker
+        and holds at most limit volumes. With host or status only the
+        volumes with matching peers are listed, and only those peers are
+        counted. The page is selected before the generator is returned,
+        its records are built while it is consumed.
+        """
+        raise NotImplementedError()
+
+    def iter_volume_peers(self, volume_id, marker=None, limit=None,
+                          host=None, status=None):
+        """ Return a generator of one page of get_volumes_detail.
+
+        Every record carries the peer_id, by which the peers are ordered
+        and which marker refers to. host and status filter the peers.
+        """
+        raise NotImplementedError()
+
     def add_volume_metadata(self, volume_id, peer_id, **kwargs):
         raise NotImplementedError()
 
     def delete_volume_metadata(self, volume_id,  peer_id):
         raise NotImplementedError()
 
+    def add_volumes_metadata(self, peers):
+        """ Register several peers in one call.
+
+        :param peers: list of dicts with the volume_id and peer_id of every
+                      peer and the keyword arguments of add_volume_metadata
+        :returns: a list with, for every peer in order, either the result
+                  of add_volume_metadata or the VoltException it raised
+        """
+        results = []
+        for peer in peers:
+            kwargs = dict(peer)
+            volume_id = kwargs.pop('volume_id', None)
+            peer_id = kwargs.pop('peer_id', None)
+            try:
+                results.append(self.add_volume_metadata(volume_id, peer_id,
+                                                        **kwargs))
+            except exception.VoltException as e:
+                results.append(e)
+        return results
+
+    def delete_volumes_metadata(self, peers):
+        """ Remove several peers in one call.
+
+        :param peers: list of (volume_id, peer_id) pairs
+        :returns: a list with, for every peer in order, either None or the
+                  VoltException raised while removing it
+        """
+        results = []
+        for volume_id, peer_id in peers:
+            try:
+                self.delete_volume_metadata(volume_id, peer_id)
+                results.append(None)
+            except exception.VoltException as e:
+                results.append(e)
+        return results
+
     def get_volume_parents(self, volume_id, peer_id=None, host=None):
         raise NotImplementedError()
 
+    def get_volumes_parents(self, queries, host=None):
+        """ Place host and look up its parents in several trees at once.
+
+        The queries are handled tree by tree, in the order each tree first
+        appears in queries.
+
+        :param queries: list of (volume_id, peer_id) pairs
+        :returns: a list with, for every query in order, either the result
+                  of get_volume_parents or the VoltException it raised
+        """
+        by_volume = collections.OrderedDict()
+        for index, (volume_id, peer_id) in enumerate(queries):
+            by_volume.setdefault(volume_id, []).append((index, peer_id))
+
+        results = [None] * len(queries)
+        for volume_id, items in by_volume.items():
+            for index, peer_id in items:
+                try:
+                    results[index] = self.get_volume_parents(
+                        volume_id, peer_id=peer_id, host=host)
+                except exception.VoltException as e:
+                    results[index] = e
+        return results
+
+    def get_volume_version(self, volume_id):
+        """ Return a string which changes whenever the tree of volume_id
+        changes, or None if the volume is unknown or the executor does not
+        version its trees.
+        """
+        return None
+
+    def is_placed(self, volume_id, host):
+        """ Return true if the peer of host already has a slot in the tree
+        of volume_id.
+        """
+        raise NotImplementedError()
+
     def update_status(self, host):
         raise NotImplementedError()
-    
+
+    def touch_host(self, host):
+        """ Refresh the timestamp of host, as update_status does, without
+        looking up its parents.
+
+        :returns: whether host is tracked
+        """
+        raise NotImplementedError()
+
+    def touch_hosts(self, hosts):
+        """ Refresh the timestamps of several hosts in one call.
+
+        :returns: the list of the hosts which are not tracked
+        """
+        return [host for host in hosts if not self.touch_host(host)]
+
     def kickoff_dead_node(self):
         raise NotImplementedError()
 
+    def dump_state(self):
+        """ Return the whole tracked state as a json serializable dict.
+        """
+        raise NotImplementedError()
+
+    def restore_state(self, state):
+        """ Replace the tracked state with one returned by dump_state.
+        """
+        raise NotImplementedError()
+
+    def flush(self):
+        """ Persist the changes made during the current request cycle.
+
+        Executors which keep everything in memory have nothing to do.
+        """
+        pass
+
+    def close(self):
+        """ Release the resources which forked workers must not inherit,
+        e.g. a database connection. They are acquired again on next use.
+        """
+        pass
+
+    def check_workers(self, workers):
+        """ Raise RuntimeError if the executor can't be served by this
+        number of worker processes, e.g. because they would overwrite the
+        storage of each other.
+        """
+        pass
+
+
+def flush_after(action):
+    """ Decorator for controller actions which flushes the controller's
+    executor once the action has been handled, whatever its outcome.
+    """
+    @functools.wraps(action)
+    def wrapper(self, *args, **kwargs):
+        try:
+            return action(self, *args, **kwargs)
+        finally:
+            self.executor.flush()
+    return wrapper
+
 
 class ScanningThread(threading.Thread):
     """ timely scannning host info and kickoff dead nodes
@@ -88,6 +279,18 @@ class ScanningThread(threading.Thread):
         self.executor = excecutor
         self.status = 'init'
         threading.Thread.__init__(self)
-        
+        # Must not keep a draining worker alive once its requests completed
+        self.daemon = True
+
     def run(self):
         self.executor.kickoff_dead_node()
+
+
+def start_scanning(executor):
+    """ Start the ScanningThread of executor on first use, so that every
+    API handler serving it shares the same one.
+    """
+    if getattr(executor, 'scanning_thread', None) is None:
+        executor.scanning_thread = ScanningThread(executor)
+        executor.scanning_thread.start()
+        executor.scanning_thread.status = 'running'
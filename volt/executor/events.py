@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2014 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+""" Stream of the topology events for operators.
+
+    The events of the executor (join, register, remove, evict) and their
+    consequences (reparent, status) are collected into batches, which are
+    handed to every subscriber: the clients of GET /v1/events and, when
+    event_log_file is set, a greenthread appending them to that file as
+    JSON lines.
+
+    The executor only appends the event to the current batch. Batches are
+    sealed when they reach event_batch_size events or when a subscriber
+    polls, every event_batch_interval seconds. A subscriber keeps at most
+    event_buffer_size batches, a slow one loses its oldest batches and
+    counts the events it dropped. The streams of the clients end once the
+    worker drains, so that they do not keep it alive.
+"""
+import collections
+import os
+import time
+
+import eventlet
+from oslo.config import cfg
+
+from volt.common import stats
+from volt.openstack.common.gettextutils import _
+from volt.openstack.common import jsonutils
+from volt.openstack.common import log as logging
+
+
+LOG = logging.getLogger(__name__)
+
+events_opts = [
+    cfg.IntOpt('event_batch_size', default=100,
+               help=_('Maximum number of topology events of a batch.')),
+    cfg.FloatOpt('event_batch_interval', default=0.5,
+                 help=_('Seconds between two deliveries of the topology '
+                        'events to their subscribers.')),
+    cfg.IntOpt('event_buffer_size', default=100,
+               help=_('Number of batches of topology events buffered for a '
+                      'subscriber, the oldest ones are dropped when it does '
+                      'not keep up.')),
+    cfg.StrOpt('event_log_file',
+               help=_('File the topology events are appended to as JSON '
+                      'lines, by every worker.')),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(events_opts)
+
+STREAM = None
+# Set when the worker drains, see drain
+DRAINING = False
+
+
+def event_dict(entry):
+    """Return the JSON serializable form of an event of a batch."""
+    seq, timestamp, event, payload = entry
+    result = dict(payload)
+    if result.get('hosts') is not None:
+        result['hosts'] = sorted(result['hosts'])
+    result['seq'] = seq
+    result['time'] = timestamp
+    result['event'] = event
+    return result
+
+
+class Subscriber(object):
+    """ Bounded buffer of the batches of events not consumed yet.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.batches = collections.deque()
+        self.dropped = 0
+
+    def push(self, batch):
+        if len(self.batches) >= self.size:
+            dropped = len(self.batches.popleft())
+            self.dropped += dropped
+            stats.incr('events.dropped', dropped)
+        self.batches.append(batch)
+
+    def pop(self):
+        """Return the buffered events, oldest first, and empty the buffer."""
+        events = []
+        while self.batches:
+            events.extend(self.batches.popleft())
+        return events
+
+
+class EventStream(object):
+    """ Batches the events of an executor for its subscribers, registered
+    both as a listener and as a topology listener of the executor.
+    """
+
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+        self.subscribers = []
+        self.pending = []
+        self.seq = 0
+        self.sink = None
+
+    def __call__(self, event, payload):
+        if not self.subscribers:
+            return
+        if self.sink is not None:
+            self.sink.start()
+        self.seq += 1
+        self.pending.append((self.seq, time.time(), event, payload))
+        if len(self.pending) >= self.batch_size:
+            self.seal()
+
+    def seal(self):
+        """Hand the current batch to the subscribers."""
+        if not self.pending:
+            return
+        batch, self.pending = self.pending, []
+        for subscriber in self.subscribers:
+            subscriber.push(batch)
+        stats.incr('events.batches')
+        stats.incr('events.sent', len(batch))
+
+    def subscribe(self):
+        subscriber = Subscriber(CONF.event_buffer_size)
+        self.subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        if subscriber in self.subscribers:
+            self.subscribers.remove(subscriber)
+
+    def wait(self, subscriber):
+        """ Wait for the next delivery and return the events of subscriber
+        and the number of events it dropped since the last call.
+        """
+        eventlet.sleep(CONF.event_batch_interval)
+        self.seal()
+        dropped, subscriber.dropped = subscriber.dropped, 0
+        return subscriber.pop(), dropped
+
+
+class FileSink(object):
+    """ Appends the events of a stream to event_log_file.
+    """
+
+    def __init__(self, stream, path):
+        self.stream = stream
+        self.path = path
+        self.subscriber = stream.subscribe()
+        self.pid = None
+        self.thread = None
+
+    def run(self):
+        while True:
+            events, dropped = self.stream.wait(self.subscriber)
+            if not events and not dropped:
+                continue
+            lines = []
+            if dropped:
+                lines.append(jsonutils.dumps({'event': 'dropped',
+                                              'count': dropped,
+                                              'time': time.time()}))
+            lines.extend(jsonutils.dumps(event_dict(entry))
+                         for entry in events)
+            try:
+                with open(self.path, 'a') as sink:
+                    sink.write('\n'.join(lines) + '\n')
+            except IOError as e:
+                LOG.warn(_('Failed to write topology events to %(path)s: '
+                           '%(e)s'), {'path': self.path, 'e': e})
+
+    def start(self):
+        """ Start writing from the current process, the executor calls it
+        with every event so that it runs in the worker processes.
+        """
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.thread = eventlet.spawn(self.run)
+
+
+def drain():
+    """ End the streams of the clients after their next delivery, when
+    the worker stops serving requests.
+    """
+    global DRAINING
+    DRAINING = True
+
+
+def setup(executor):
+    """Attach the stream of topology events to the executor."""
+    global STREAM
+
+    if STREAM is None:
+        STREAM = EventStream(CONF.event_batch_size)
+        if CONF.event_log_file:
+            STREAM.sink = FileSink(STREAM, CONF.event_log_file)
+        executor.add_listener(STREAM)
+        executor.add_topology_listener(STREAM)
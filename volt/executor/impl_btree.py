@@ -20,20 +20,30 @@
 """
 import time
 import datetime
+import heapq
+import itertools
 import threading
 import random
+import uuid
 
 from collections import deque
+from collections import OrderedDict
 
+from volt.common import binary
 from volt.common import utils
 from volt.common import exception
 from volt import executor
 from volt.openstack.common.gettextutils import _
+from volt.openstack.common import jsonutils
 from volt.openstack.common import log as logging
+from volt.openstack.common import timeutils
 
 
 LOG = logging.getLogger(__name__)
 
+# Versions of the trees, never reused within a process, see BTree.touch
+_VERSIONS = itertools.count(1)
+
 
 def tree_find_available_slot(tree_root):
     """
@@ -44,19 +54,11 @@ def tree_find_available_slot(tree_root):
     node_queue.append(tree_root)
 
     slot = None
-    LOG.debug(_("len(node_queue)"), {'length': len(node_queue)})
 
     while len(node_queue):
         node = node_queue.popleft()
-        LOG.debug(_("node is None %(node)s, length %(length)s"),
-                  {'node': node is None, 'length': len(node_queue)})
         if node is None:
             continue
-        else:
-            LOG.debug(_("node's peer_id %(peer_id)s, status: "
-                        "%(status)s, host: %(host)s, tgt:%(iqn)s"),
-                      {'peer_id': node.peer_id, 'status': node.status,
-                       'host': node.host, 'iqn': node.iqn})
         if node_available(node):
             slot = node
             break
@@ -73,12 +75,8 @@ def update_tree_status(tree_root):
     node_queue = deque()
     node_queue.append(tree_root)
 
-    LOG.debug(_("len(node_queue)"), {'length': len(node_queue)})
-
     while len(node_queue):
         node = node_queue.popleft()
-        LOG.debug(_("node is None %(node)s, length %(length)s"),
-                  {'node': node is None, 'length': len(node_queue)})
         if node is None:
             continue
         else:
@@ -87,11 +85,6 @@ def update_tree_status(tree_root):
             else:
                 node.level = 0
 
-            LOG.debug(_("node's peer_id %(peer_id)s, status: "
-                        "%(status)s, host: %(host)s, level:%(level)s"),
-                      {'peer_id': node.peer_id, 'status': node.status,
-                       'host': node.host, 'level': node.level})
-
             node_queue.append(node.left)
             node_queue.append(node.right)
 
@@ -105,6 +98,60 @@ def node_available(node):
     return node.status == 'OK' and (not node.left or not node.right)
 
 
+def node_record(node, position):
+    """ Return a plain, serializable record of a tree node.
+
+    :param node: BTreeNode
+    :param position: 'left' or 'right' when the node is linked as a child
+                     of its parent, otherwise None
+    """
+    return {
+        'peer_id': node.peer_id,
+        'host': node.host,
+        'port': node.port,
+        'iqn': node.iqn,
+        'lun': node.lun,
+        'status': node.status,
+        'level': node.level,
+        'fake_root': node.fake_root,
+        'parent_id': node.parent.peer_id if node.parent else None,
+        'position': position,
+    }
+
+
+def node_matches(node, host=None, status=None):
+    """ Return true if the node matches the filters which are not None
+    """
+    return ((host is None or node.host == host) and
+            (status is None or node.status == status))
+
+
+def page_keys(keys, marker=None, limit=None):
+    """ Return the keys following marker in sorted order, at most limit of
+    them. Only limit keys are held while selecting a page.
+    """
+    if marker is not None:
+        keys = (key for key in keys if key > marker)
+    if limit is None:
+        return sorted(keys)
+    return heapq.nsmallest(limit, keys)
+
+
+class Identity(dict):
+    """ The identity of a node returned to clients, along with its JSON
+    and binary encodings, which the serializers join into the response
+    instead of encoding the dict again. The binary one is only computed
+    for the first binary response.
+    """
+    __slots__ = ('encoded', '_binary')
+
+    @property
+    def binary(self):
+        if self._binary is None:
+            self._binary = binary.fragment(dict(self))
+        return self._binary
+
+
 class BTreeNode(object):
 
     def __init__(self, peer_id=None, host=None,
@@ -128,18 +175,27 @@ class BTreeNode(object):
             self.level = 0
         self.peer_id = peer_id
         self.parents_list = None
+        self._identity = None
 
     def identity(self):
         """ Make BTreeNode callable to return to client.
+
+        The Identity is cached until BTree.update_nodes changes the node, it
+        is shared by all callers and must not be modified.
         """
-        return {
-            "host": self.host,
-            "port": self.port,
-            "iqn": self.iqn,
-            "lun": self.lun,
-            'status': self.status,
-            "peer_id": self.peer_id
-        }
+        if self._identity is None:
+            identity = Identity({
+                "host": self.host,
+                "port": self.port,
+                "iqn": self.iqn,
+                "lun": self.lun,
+                'status': self.status,
+                "peer_id": self.peer_id
+            })
+            identity.encoded = jsonutils.dumps(identity)
+            identity._binary = None
+            self._identity = identity
+        return self._identity
 
     def get_sibling(self):
         if self.parent is None:
@@ -163,12 +219,36 @@ class BTree(object):
                              lun=utils.generate_uuid(),
                              image_id=volume_id,
                              status='OK', fake_root=True)
+            # As update_levels numbers it, so that only the moved nodes
+            # change level when a node is removed
+            root.level = 0
         root.left = None
         root.right = None
         root.parent = None
         self.root = root
         self.volume_id = volume_id
         self.nodes = {root.peer_id: root}
+        self.version = next(_VERSIONS)
+        # Hosts whose parents may have changed and (peer_id, host, old,
+        # new) status changes, see BtreeExecutor.notify
+        self.moved = set()
+        self.status_changes = []
+
+    def touch(self, *moved):
+        """ Record a change of the topology, e.g. to expire the ETags.
+
+        :param moved: the nodes whose parents the change may have changed
+        """
+        self.version = next(_VERSIONS)
+        for node in moved:
+            if node is not None:
+                self.moved.add(node.host)
+
+    def touch_parent(self, node):
+        """ Record a change of the identity of node, which its children
+        get as a parent.
+        """
+        self.touch(node.left, node.right)
 
     def insert_by_node(self, new_node):
         """ Insert a new node to the binary tree by node instance.
@@ -208,12 +288,16 @@ class BTree(object):
         else:
             slot.right = new_node
 
+        self.touch(new_node)
         return slot
 
-    def tree_remove_by_node(self, target):
+    def tree_remove_by_node(self, target, update_levels=True):
         """Delete a tree node with the specific node instance
 
         :param target: the target instance of the node to be removed
+        :param update_levels: recompute the levels of the tree afterwards,
+                              callers removing several nodes pass False and
+                              call update_levels once at the end
         """
 
         if not target:
@@ -224,9 +308,9 @@ class BTree(object):
 
         if target.status == 'pending':
             if target.left:
-                self.tree_remove_by_node(target.left)
+                self.tree_remove_by_node(target.left, update_levels=False)
             if target.right:
-                self.tree_remove_by_node(target.right)
+                self.tree_remove_by_node(target.right, update_levels=False)
 
         up = None
         # TODO(zpfalpc23@gmail.com): After the node removal, the tree
@@ -259,10 +343,15 @@ class BTree(object):
         if target == self.root:
             self.root = up
 
-        # update the level info
-        update_tree_status(self.root)
+        self.touch(target, up, target.right)
+        if update_levels:
+            self.update_levels()
         return target
 
+    def update_levels(self):
+        """Recompute the level of every node after removals."""
+        update_tree_status(self.root)
+
     def insert_by_peer_id(self, peer_id):
         """ Insert a new node to the binary tree by peer id.
 
@@ -275,10 +364,11 @@ class BTree(object):
 
         return self.insert_by_node(node)
 
-    def remove_by_peer_id(self, peer_id):
+    def remove_by_peer_id(self, peer_id, update_levels=True):
         """ Delete a tree node with the specific peer_id
 
         :param peer_id: the peed id of the node to be removed
+        :param update_levels: see tree_remove_by_node
         """
         if peer_id not in self.nodes:
             extra_msg = _('The node to be removed is not in the tree')
@@ -287,7 +377,7 @@ class BTree(object):
                                                   extra_msg=extra_msg)
 
         target = self.nodes[peer_id]
-        self.tree_remove_by_node(target)
+        self.tree_remove_by_node(target, update_levels=update_levels)
         del self.nodes[peer_id]
 
         return target
@@ -295,6 +385,76 @@ class BTree(object):
     def count(self):
         return len(self.nodes)
 
+    def dump(self):
+        """ Return the tree as a list of plain node records.
+
+        Records are ordered breadth first from the root, so a node's parent
+        always precedes it. Nodes which are tracked in ``self.nodes`` but
+        are no longer linked into the tree come last.
+        """
+        records = []
+        seen = set()
+        node_queue = deque([self.root])
+
+        while len(node_queue):
+            node = node_queue.popleft()
+            if node is None:
+                continue
+            position = None
+            if node.parent is not None:
+                if node.parent.left is node:
+                    position = 'left'
+                elif node.parent.right is node:
+                    position = 'right'
+            records.append(node_record(node, position))
+            seen.add(node.peer_id)
+            node_queue.append(node.left)
+            node_queue.append(node.right)
+
+        for peer_id, node in self.nodes.items():
+            if peer_id not in seen:
+                records.append(node_record(node, None))
+
+        return records
+
+    @classmethod
+    def restore(cls, volume_id, records):
+        """ Rebuild a tree from the records produced by ``dump``.
+
+        :param volume_id: the volume id of the tree
+        :param records: node records in any order, the root is the record
+                        without a parent
+        """
+        nodes = {}
+        for record in records:
+            node = BTreeNode(peer_id=record['peer_id'],
+                             host=record['host'],
+                             port=record['port'],
+                             iqn=record['iqn'],
+                             lun=record['lun'],
+                             status=record['status'],
+                             fake_root=bool(record['fake_root']))
+            node.level = record['level']
+            nodes[node.peer_id] = node
+
+        root_id = next((record['peer_id'] for record in records
+                        if record['parent_id'] is None),
+                       records[0]['peer_id'])
+        tree = cls(volume_id, root=nodes[root_id])
+        for record in records:
+            node = nodes[record['peer_id']]
+            parent = nodes.get(record['parent_id'])
+            if parent is None:
+                continue
+            node.parent = parent
+            if record['position'] == 'left':
+                parent.left = node
+            elif record['position'] == 'right':
+                parent.right = node
+
+        tree.nodes = nodes
+        return tree
+
     def get_nodelist_identity(self, node_list=[]):
         nodelist_identity = []
         for node in node_list:
@@ -333,10 +493,13 @@ class BTree(object):
                    not node.parent and parent_node.status == "OK":
                     parents_list.append(parent_node)
 
-        for parent_node in node.parents_list:
-            if parent_node is not node.parent and parent_node not in \
-               parents_list:
-                node.parents_list.remove(parent_node)
+        node.parents_list = [parent_node for parent_node in node.parents_list
+                             if parent_node is node.parent or
+                             parent_node in parents_list]
+        # Only add the candidates which are not parents yet, so that the
+        # parents stay the same as long as the tree does not change
+        parents_list = [parent_node for parent_node in parents_list
+                        if parent_node not in node.parents_list]
 
         add_list = []
         if executor.MAX_PARENT_NUM - len(node.parents_list) < len(parents_list):
@@ -367,6 +530,13 @@ class BTree(object):
             self.insert_by_node(target)
         else:
             target = self.nodes[peer_id]
+            if (target.host, target.port, target.iqn, target.lun,
+                    target.status) != (host, port, iqn, lun, status):
+                target._identity = None
+                self.touch_parent(target)
+                if target.status != status:
+                    self.status_changes.append((peer_id, host,
+                                                target.status, status))
             target.peer_id = peer_id
             target.host = host
             target.port = port
@@ -383,12 +553,76 @@ class BTree(object):
         return target
 
 
+class BTreeWithUncles(BTree):
+    """ A tree whose nodes also get the sibling of their parent as a
+    parent, see BtreeWithUncleExecutor. A node which moves or changes thus
+    changes the parents of the children of its siblings too, and a node
+    which moves those of its own children.
+    """
+
+    def touch(self, *moved):
+        nephews = []
+        for node in moved:
+            if node is not None:
+                nephews.extend((node.left, node.right))
+                nephews.extend(self.nephews(node))
+        super(BTreeWithUncles, self).touch(*(moved + tuple(nephews)))
+
+    def touch_parent(self, node):
+        super(BTreeWithUncles, self).touch(node.left, node.right,
+                                           *self.nephews(node))
+
+    def nephews(self, node):
+        """ Return the children of the siblings of node, or of the
+        siblings it had if it was removed.
+        """
+        nephews = []
+        if node.parent is not None:
+            for sibling in (node.parent.left, node.parent.right):
+                if sibling is not None and sibling is not node:
+                    nephews.extend((sibling.left, sibling.right))
+        return nephews
+
+
 class BtreeExecutor(executor.Executor):
     """
     """
+    # The class of the trees of the volumes
+    tree_class = BTree
+
     def __init__(self):
+        super(BtreeExecutor, self).__init__()
         self.volumes = {}
         self.host_to_volumes = {}
+        # Tells the versions of two executors apart, e.g. of two workers
+        self.epoch = uuid.uuid4().hex[:8]
+
+    def notify(self, event, **payload):
+        super(BtreeExecutor, self).notify(event, **payload)
+        if 'volume_id' in payload:
+            trees = [(payload['volume_id'],
+                      self.volumes.get(payload['volume_id']))]
+        else:
+            trees = self.volumes.items()
+        for volume_id, tree in trees:
+            if tree is None:
+                continue
+            if tree.moved:
+                hosts, tree.moved = tree.moved, set()
+                self.notify_topology('reparent', volume_id=volume_id,
+                                     hosts=hosts)
+            if tree.status_changes:
+                changes, tree.status_changes = tree.status_changes, []
+                for peer_id, host, old, new in changes:
+                    self.notify_topology('status', volume_id=volume_id,
+                                         peer_id=peer_id, host=host,
+                                         old=old, new=new)
+
+    def get_volume_version(self, volume_id):
+        tree = self.volumes.get(volume_id)
+        if tree is None:
+            return None
+        return '%s-%x' % (self.epoch, tree.version)
 
     def get_volumes_list(self):
         volumes_list = []
@@ -408,7 +642,7 @@ class BtreeExecutor(executor.Executor):
         else:
             volumes_nodes = volumes_tree.nodes
         for peer_id in volumes_nodes:
-            tree_node = self.nodes[peer_id]
+            tree_node = volumes_nodes[peer_id]
             volumes_list.append({
                 'host': tree_node.host,
                 'port': tree_node.port,
@@ -419,6 +653,62 @@ class BtreeExecutor(executor.Executor):
 
         return volumes_list
 
+    def iter_volumes(self, marker=None, limit=None, host=None, status=None):
+        filtered = host is not None or status is not None
+        if host is None:
+            volume_ids = self.volumes.iterkeys()
+        else:
+            host_info = self.host_to_volumes.get(host)
+            volume_list = host_info['volume_list'] if host_info else {}
+            volume_ids = set(utils.get_image_id_from_peerid(peer_id)
+                             for peer_id in volume_list)
+        if status is not None:
+            volume_ids = [volume_id for volume_id in volume_ids
+                          if volume_id in self.volumes and
+                          any(node.status == status for node in
+                              self.volumes[volume_id].nodes.itervalues())]
+        volume_ids = page_keys(volume_ids, marker, limit)
+
+        def records():
+            for volume_id in volume_ids:
+                tree = self.volumes.get(volume_id)
+                if tree is None:
+                    # Removed while the response was streamed
+                    continue
+                if filtered:
+                    count = len([node for node in tree.nodes.values()
+                                 if node_matches(node, host, status)])
+                else:
+                    count = tree.count()
+                yield {'id': volume_id, 'count': count}
+        return records()
+
+    def iter_volume_peers(self, volume_id, marker=None, limit=None,
+                          host=None, status=None):
+        tree = self.volumes.get(volume_id, None)
+        nodes = tree.nodes if tree is not None else {}
+        if host is None and status is None:
+            peer_ids = nodes.iterkeys()
+        else:
+            peer_ids = [peer_id for peer_id, node in nodes.iteritems()
+                        if node_matches(node, host, status)]
+        peer_ids = page_keys(peer_ids, marker, limit)
+
+        def records():
+            for peer_id in peer_ids:
+                node = nodes.get(peer_id)
+                if node is None:
+                    continue
+                yield {
+                    'peer_id': peer_id,
+                    'host': node.host,
+                    'port': node.port,
+                    'iqn': node.iqn,
+                    'lun': node.lun,
+                    'status': node.status
+                }
+        return records()
+
     def add_volume_metadata(self, volume_id, peer_id, **kwargs):
         """
         """
@@ -442,11 +732,36 @@ class BtreeExecutor(executor.Executor):
                                                       iqn=iqn,
                                                       lun=lun,
                                                       status='OK')
+        self.notify('register', volume_id=volume_id, peer_id=peer_id,
+                    host=host, port=port, iqn=iqn, lun=lun)
         return target.identity()
 
     def delete_volume_metadata(self, volume_id, peer_id):
         """
         """
+        self._delete_peer(volume_id, peer_id)
+
+    def delete_volumes_metadata(self, peers):
+        """ Remove the peers tree by tree, repairing the levels of each
+        tree once after all its peers were removed.
+        """
+        by_volume = OrderedDict()
+        for index, (volume_id, peer_id) in enumerate(peers):
+            by_volume.setdefault(volume_id, []).append((index, peer_id))
+
+        results = [None] * len(peers)
+        for volume_id, items in by_volume.items():
+            for index, peer_id in items:
+                try:
+                    self._delete_peer(volume_id, peer_id, update_levels=False)
+                except exception.VoltException as e:
+                    results[index] = e
+            tree = self.volumes.get(volume_id)
+            if tree is not None:
+                tree.update_levels()
+        return results
+
+    def _delete_peer(self, volume_id, peer_id, update_levels=True):
         if peer_id is None:
             extra_msg = _('peer_id should not be None.')
             raise exception.InvalidParameterValue(value=peer_id,
@@ -464,9 +779,11 @@ class BtreeExecutor(executor.Executor):
                     raise exception.InvalidParameterValue
 
                 self.remove_host_bookkeeping(host=node.host, peer_id=peer_id)
-                vol_tree.remove_by_peer_id(peer_id)
+                vol_tree.remove_by_peer_id(peer_id,
+                                           update_levels=update_levels)
             except exception.InvalidParameterValue, e:
                 raise exception.NotFound
+            self.notify('remove', volume_id=volume_id, peer_id=peer_id)
 
     def insert_node_slot(self, volume_id, peer_id=None, host=None):
         if peer_id is None and host is None:
@@ -482,7 +799,7 @@ class BtreeExecutor(executor.Executor):
                                                   extra_msg=extra_msg)
 
         if volume_id not in self.volumes:
-            self.volumes[volume_id] = BTree(volume_id)
+            self.volumes[volume_id] = self.tree_class(volume_id)
 
         peer_id = utils.generate_uuid(False, host, volume_id)
 
@@ -505,6 +822,7 @@ class BtreeExecutor(executor.Executor):
                                           node=new_node)
 
                 target = self.volumes[volume_id].nodes[peer_id]
+                self.notify('join', volume_id=volume_id, host=host)
             except Exception as exc:
                 target = None
                 LOG.debug(_(" fatal error occured insert_node_slot: %s" % exc))
@@ -533,6 +851,11 @@ class BtreeExecutor(executor.Executor):
                 'parents': parents_list
             }
 
+    def is_placed(self, volume_id, host):
+        tree = self.volumes.get(volume_id, None)
+        return tree is not None and \
+            utils.generate_uuid(False, host, volume_id) in tree.nodes
+
     def get_parents_info(self, target):
         if target.parent.fake_root:
             return []
@@ -544,7 +867,7 @@ class BtreeExecutor(executor.Executor):
             return parents_list
 
     def update_status(self, host=None):
-        if host not in self.host_to_volumes.keys():
+        if host not in self.host_to_volumes:
             return []
 
         volume_list = self.host_to_volumes[host]['volume_list']
@@ -562,6 +885,13 @@ class BtreeExecutor(executor.Executor):
 
         return volume_info
 
+    def touch_host(self, host):
+        host_info = self.host_to_volumes.get(host)
+        if host_info is None:
+            return False
+        host_info['timestamp'] = datetime.datetime.now()
+        return True
+
     def add_host_bookkeeping(self, host=None, peer_id=None, node=None):
 
         host_info = self.host_to_volumes.get(host, None)
@@ -593,38 +923,90 @@ class BtreeExecutor(executor.Executor):
     def kickoff_dead_node(self):
 
         while True:
-            now_time = datetime.datetime.now()
-            LOG.debug('scanning host_to_volumes list: %s host lists: %s' %
-                      (now_time, self.host_to_volumes.keys()))
-            for host in self.host_to_volumes.keys():
-                host_info = self.host_to_volumes[host]
-                last_save_time = host_info['timestamp']
-                if (now_time - last_save_time).seconds > \
-                   executor.MAX_POLLING_TIME:
-                    #if time exceed MAX_POLLING_TIME, then kick out of the tree               
-                    volume_list = host_info['volume_list']
-
-                    for peer_id in volume_list.keys():
-                        LOG.debug('volume_list.keys(): %s', volume_list.keys())
-                        self.remove_host_bookkeeping(host, peer_id)
-                        vol_tree = self.volumes[
-                            utils.get_image_id_from_peerid(peer_id)]
-                        vol_tree.remove_by_peer_id(peer_id)
-                        LOG.debug(_('kick out host %(host)s, peer_id: '
-                                    '%(peer_id)s elapse time: %(time)s'),
-                                  {'host': host, 'peer_id': peer_id,
-                                   'time': now_time - last_save_time})
-                    del self.host_to_volumes[host]
-
-            LOG.debug('scanning host_to_volumes list: %s host lists: %s' %
-                      (now_time, self.host_to_volumes.keys()))
+            self.kickoff_expired_hosts(datetime.datetime.now())
             timeout = threading.Event()
             timeout.wait(executor.MAX_POLLING_TIME)
 
+    def kickoff_expired_hosts(self, now_time):
+        """ Remove every host whose last heartbeat is older than
+        MAX_POLLING_TIME, together with all its peers.
+
+        :param now_time: the datetime the expiry is measured against
+        """
+        LOG.debug('scanning host_to_volumes list: %s host lists: %s' %
+                  (now_time, self.host_to_volumes.keys()))
+        for host in self.host_to_volumes.keys():
+            last_save_time = self.host_to_volumes[host]['timestamp']
+            if (now_time - last_save_time).seconds > \
+               executor.MAX_POLLING_TIME:
+                #if time exceed MAX_POLLING_TIME, then kick out of the tree
+                self.evict_host(host)
+                LOG.debug(_('kick out host %(host)s elapse time: %(time)s'),
+                          {'host': host, 'time': now_time - last_save_time})
+
+        LOG.debug('scanning host_to_volumes list: %s host lists: %s' %
+                  (now_time, self.host_to_volumes.keys()))
+
+    def evict_host(self, host):
+        """ Remove a host and all its peers from the trees.
+
+        :param host: the host to be removed
+        """
+        host_info = self.host_to_volumes.get(host, None)
+        if host_info is None:
+            return
+
+        volume_list = host_info['volume_list']
+        for peer_id in volume_list.keys():
+            LOG.debug('volume_list.keys(): %s', volume_list.keys())
+            self.remove_host_bookkeeping(host, peer_id)
+            vol_tree = self.volumes[utils.get_image_id_from_peerid(peer_id)]
+            vol_tree.remove_by_peer_id(peer_id)
+            LOG.debug(_('kick out host %(host)s, peer_id: %(peer_id)s'),
+                      {'host': host, 'peer_id': peer_id})
+        del self.host_to_volumes[host]
+        self.notify('evict', host=host)
+
+    def dump_state(self):
+        hosts = {}
+        for host, host_info in self.host_to_volumes.items():
+            hosts[host] = {
+                'timestamp': timeutils.strtime(host_info['timestamp']),
+                'peers': host_info['volume_list'].keys(),
+            }
+
+        return {
+            'volumes': dict((volume_id, tree.dump())
+                            for volume_id, tree in self.volumes.items()),
+            'hosts': hosts,
+        }
+
+    def restore_state(self, state):
+        volumes = {}
+        for volume_id, records in state['volumes'].items():
+            volumes[volume_id] = self.tree_class.restore(volume_id, records)
+
+        host_to_volumes = {}
+        for host, host_state in state['hosts'].items():
+            volume_list = {}
+            for peer_id in host_state['peers']:
+                tree = volumes.get(utils.get_image_id_from_peerid(peer_id))
+                if tree is not None and peer_id in tree.nodes:
+                    volume_list[peer_id] = tree.nodes[peer_id]
+            host_to_volumes[host] = {
+                'volume_list': volume_list,
+                'timestamp': timeutils.parse_strtime(host_state['timestamp']),
+            }
+
+        self.volumes = volumes
+        self.host_to_volumes = host_to_volumes
+        self.notify_topology('reparent', volume_id=None, hosts=None)
+
 
 class BtreeWithUncleExecutor(BtreeExecutor):
     """
     """
+    tree_class = BTreeWithUncles
 
     def get_parents_info(self, target):
         if target.parent.fake_root:
@@ -0,0 +1,402 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2014 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+""" A durable executor which keeps the binary trees of impl_btree in memory
+    as a hot cache and persists trees and host records into SQLite.
+"""
+import datetime
+import os
+import sqlite3
+import threading
+import time
+
+from oslo.config import cfg
+
+from volt.common import utils
+from volt.executor import impl_btree
+from volt.openstack.common import fileutils
+from volt.openstack.common.gettextutils import _
+from volt.openstack.common import log as logging
+
+
+LOG = logging.getLogger(__name__)
+
+sqlite_executor_opts = [
+    cfg.StrOpt('executor_db_path', default='/var/lib/volt/executor.sqlite',
+               help=_('Path of the SQLite database used by the sqlite '
+                      'executor. It is written by the process serving the '
+                      'requests, so the sqlite executor refuses to run with '
+                      'workers > 1.')),
+    cfg.StrOpt('executor_db_synchronous', default='NORMAL',
+               help=_('Value of the SQLite "synchronous" pragma used by the '
+                      'sqlite executor. With WAL journaling NORMAL keeps the '
+                      'database consistent after a crash, FULL also keeps '
+                      'the last committed request cycle after a power '
+                      'loss.')),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(sqlite_executor_opts)
+
+# host, port, iqn and lun are left untyped so that values are read back
+# with the type they were registered with. A node is linked to the tree by
+# the peer_id of its parent and its position, so moving a node only
+# rewrites its own row.
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS nodes ('
+    ' volume_id TEXT NOT NULL,'
+    ' peer_id TEXT NOT NULL,'
+    ' host,'
+    ' port,'
+    ' iqn,'
+    ' lun,'
+    ' status TEXT,'
+    ' level INTEGER NOT NULL,'
+    ' fake_root INTEGER NOT NULL,'
+    ' parent_id TEXT,'
+    ' position TEXT,'
+    ' PRIMARY KEY (volume_id, peer_id))',
+    'CREATE INDEX IF NOT EXISTS nodes_host_idx ON nodes (host)',
+    'CREATE TABLE IF NOT EXISTS hosts ('
+    ' host TEXT PRIMARY KEY,'
+    ' timestamp REAL NOT NULL)',
+    'CREATE TABLE IF NOT EXISTS host_peers ('
+    ' host TEXT NOT NULL,'
+    ' peer_id TEXT NOT NULL,'
+    ' volume_id TEXT NOT NULL,'
+    ' PRIMARY KEY (host, peer_id))',
+)
+
+NODE_COLUMNS = ('peer_id', 'host', 'port', 'iqn', 'lun', 'status',
+                'level', 'fake_root', 'parent_id', 'position')
+
+# The user_version of a database with the current SCHEMA. Version 0 is a
+# new database, or one whose nodes also have the seq column of their
+# breadth first position, which is dropped.
+SCHEMA_VERSION = 1
+
+
+def to_timestamp(value):
+    return time.mktime(value.timetuple()) + value.microsecond / 1e6
+
+
+def from_timestamp(value):
+    return datetime.datetime.fromtimestamp(value)
+
+
+class SqliteExecutor(impl_btree.BtreeExecutor):
+    """
+    Binary tree executor backed by an SQLite database in WAL mode.
+
+    Mutations are applied to the in-memory trees first, which remain the hot
+    cache for parent lookups, and the touched trees and hosts are written to
+    the database in a single transaction when the request cycle ends (see
+    volt.executor.flush_after). Listings are answered from the database, so
+    every process opening the same file sees the last committed state. Only
+    one process writes it though, see check_workers.
+    """
+
+    def __init__(self, db_path=None):
+        super(SqliteExecutor, self).__init__()
+        self.db_path = db_path or CONF.executor_db_path
+        self.lock = threading.RLock()
+        self.dirty_volumes = set()
+        self.dirty_hosts = set()
+        # The node records of every tree as last written to the database,
+        # so a flush only writes the rows which actually changed.
+        self.persisted = {}
+        self._conn = None
+        self._load()
+
+    @property
+    def conn(self):
+        """The database connection, opened on first use after close."""
+        if self._conn is None:
+            self._conn = self._connect()
+        return self._conn
+
+    def close(self):
+        """ Flush and close the database connection, which SQLite does not
+        allow to carry across a fork.
+        """
+        self.flush()
+        with self.lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def check_workers(self, workers):
+        """ Refuse several workers, each of which would keep its own trees
+        and overwrite the rows written by the others.
+        """
+        if workers > 1:
+            raise RuntimeError(_("The sqlite executor is served by a single "
+                                 "process, run it with workers = 1."))
+
+    def _connect(self):
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir:
+            fileutils.ensure_tree(db_dir)
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=%s' % CONF.executor_db_synchronous)
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        if version < SCHEMA_VERSION:
+            self._upgrade(conn, version)
+        with conn:
+            for statement in SCHEMA:
+                conn.execute(statement)
+        return conn
+
+    def _upgrade(self, conn, version):
+        """Upgrade the schema of a database at an older user_version."""
+        statements = []
+        columns = [row[1] for row in conn.execute('PRAGMA table_info(nodes)')]
+        if 'seq' in columns:
+            LOG.info(_("Dropping the seq column of the nodes of %s"),
+                     self.db_path)
+            statements.extend([
+                'ALTER TABLE nodes RENAME TO nodes_v0',
+                'DROP INDEX IF EXISTS nodes_host_idx',
+            ] + list(SCHEMA) + [
+                'INSERT INTO nodes (volume_id, %(columns)s) '
+                'SELECT volume_id, %(columns)s FROM nodes_v0' %
+                {'columns': ', '.join(NODE_COLUMNS)},
+                'DROP TABLE nodes_v0',
+            ])
+        statements.append('PRAGMA user_version = %d' % SCHEMA_VERSION)
+        # executescript runs DDL without the implicit commits of execute
+        conn.executescript('BEGIN; %s; COMMIT;' % '; '.join(statements))
+
+    def _load(self):
+        """Rebuild the in-memory trees and host records from the database.
+        """
+        records = {}
+        for row in self.conn.execute(
+                'SELECT volume_id, %s FROM nodes' % ', '.join(NODE_COLUMNS)):
+            records.setdefault(row[0], []).append(
+                dict(zip(NODE_COLUMNS, row[1:])))
+
+        for volume_id, tree_records in records.items():
+            tree = self.tree_class.restore(volume_id, tree_records)
+            self.volumes[volume_id] = tree
+            self.persisted[volume_id] = dict(
+                (record['peer_id'], record) for record in tree_records)
+
+        for host, timestamp in self.conn.execute(
+                'SELECT host, timestamp FROM hosts'):
+            self.host_to_volumes[host] = {
+                'volume_list': {},
+                'timestamp': from_timestamp(timestamp),
+            }
+        for host, peer_id, volume_id in self.conn.execute(
+                'SELECT host, peer_id, volume_id FROM host_peers'):
+            tree = self.volumes.get(volume_id)
+            host_info = self.host_to_volumes.get(host)
+            if tree is None or host_info is None or peer_id not in tree.nodes:
+                continue
+            host_info['volume_list'][peer_id] = tree.nodes[peer_id]
+
+        LOG.debug(_("Loaded %(volumes)d trees and %(hosts)d hosts from "
+                    "%(path)s"),
+                  {'volumes': len(self.volumes),
+                   'hosts': len(self.host_to_volumes),
+                   'path': self.db_path})
+
+    def _mark_peer(self, host, peer_id):
+        self.dirty_hosts.add(host)
+        self.dirty_volumes.add(utils.get_image_id_from_peerid(peer_id))
+
+    def get_volumes_list(self):
+        self.flush()
+        with self.lock:
+            rows = self.conn.execute('SELECT volume_id, COUNT(*) FROM nodes '
+                                     'GROUP BY volume_id').fetchall()
+        return [{'id': volume_id, 'count': count}
+                for volume_id, count in rows]
+
+    def get_volumes_detail(self, volume_id):
+        self.flush()
+        with self.lock:
+            rows = self.conn.execute('SELECT host, port, iqn, lun, status '
+                                     'FROM nodes WHERE volume_id = ?',
+                                     (volume_id,)).fetchall()
+        return [{'host': host, 'port': port, 'iqn': iqn, 'lun': lun,
+                 'status': status}
+                for host, port, iqn, lun, status in rows]
+
+    def _select_page(self, columns, key, volume_id=None, marker=None,
+                     limit=None, host=None, status=None, group_by=None):
+        """ Return the rows of one page of the nodes ordered by key. The
+        page is read at once, so that the connection is not held while it
+        is streamed.
+        """
+        conditions = []
+        params = []
+        for condition, value in (('volume_id = ?', volume_id),
+                                 ('%s > ?' % key, marker),
+                                 ('host = ?', host),
+                                 ('status = ?', status)):
+            if value is not None:
+                conditions.append(condition)
+                params.append(value)
+        query = 'SELECT %s FROM nodes' % columns
+        if conditions:
+            query += ' WHERE %s' % ' AND '.join(conditions)
+        if group_by is not None:
+            query += ' GROUP BY %s' % group_by
+        query += ' ORDER BY %s LIMIT ?' % key
+        params.append(-1 if limit is None else limit)
+
+        self.flush()
+        with self.lock:
+            return self.conn.execute(query, params).fetchall()
+
+    def iter_volumes(self, marker=None, limit=None, host=None, status=None):
+        rows = self._select_page('volume_id, COUNT(*)', 'volume_id',
+                                 marker=marker, limit=limit, host=host,
+                                 status=status, group_by='volume_id')
+        return ({'id': volume_id, 'count': count}
+                for volume_id, count in rows)
+
+    def iter_volume_peers(self, volume_id, marker=None, limit=None,
+                          host=None, status=None):
+        rows = self._select_page('peer_id, host, port, iqn, lun, status',
+                                 'peer_id', volume_id=volume_id,
+                                 marker=marker, limit=limit, host=host,
+                                 status=status)
+        return ({'peer_id': row[0], 'host': row[1], 'port': row[2],
+                 'iqn': row[3], 'lun': row[4], 'status': row[5]}
+                for row in rows)
+
+    def add_volume_metadata(self, volume_id, peer_id, **kwargs):
+        try:
+            return super(SqliteExecutor, self).add_volume_metadata(
+                volume_id, peer_id, **kwargs)
+        finally:
+            self.dirty_volumes.add(volume_id)
+
+    def delete_volume_metadata(self, volume_id, peer_id):
+        try:
+            return super(SqliteExecutor, self).delete_volume_metadata(
+                volume_id, peer_id)
+        finally:
+            self.dirty_volumes.add(volume_id)
+
+    def delete_volumes_metadata(self, peers):
+        try:
+            return super(SqliteExecutor, self).delete_volumes_metadata(peers)
+        finally:
+            self.dirty_volumes.update(volume_id for volume_id, peer_id
+                                      in peers if volume_id is not None)
+
+    def update_status(self, host=None):
+        if host in self.host_to_volumes:
+            self.dirty_hosts.add(host)
+        return super(SqliteExecutor, self).update_status(host=host)
+
+    def touch_host(self, host):
+        if host in self.host_to_volumes:
+            self.dirty_hosts.add(host)
+        return super(SqliteExecutor, self).touch_host(host)
+
+    def add_host_bookkeeping(self, host=None, peer_id=None, node=None):
+        super(SqliteExecutor, self).add_host_bookkeeping(host=host,
+                                                         peer_id=peer_id,
+                                                         node=node)
+        self._mark_peer(host, peer_id)
+
+    def remove_host_bookkeeping(self, host=None, peer_id=None):
+        super(SqliteExecutor, self).remove_host_bookkeeping(host=host,
+                                                            peer_id=peer_id)
+        self._mark_peer(host, peer_id)
+
+    def restore_state(self, state):
+        with self.lock:
+            self.dirty_volumes.update(self.volumes)
+            self.dirty_hosts.update(self.host_to_volumes)
+            super(SqliteExecutor, self).restore_state(state)
+            self.dirty_volumes.update(self.volumes)
+            self.dirty_hosts.update(self.host_to_volumes)
+        self.flush()
+
+    def kickoff_expired_hosts(self, now_time):
+        with self.lock:
+            super(SqliteExecutor, self).kickoff_expired_hosts(now_time)
+        self.flush()
+
+    def flush(self):
+        """Write the trees and hosts touched since the last flush in a
+        single transaction.
+        """
+        if not self.dirty_volumes and not self.dirty_hosts:
+            return
+
+        with self.lock:
+            dirty_volumes, self.dirty_volumes = self.dirty_volumes, set()
+            dirty_hosts, self.dirty_hosts = self.dirty_hosts, set()
+            with self.conn:
+                for volume_id in dirty_volumes:
+                    self._flush_volume(volume_id)
+                for host in dirty_hosts:
+                    self._flush_host(host)
+
+    def _flush_volume(self, volume_id):
+        tree = self.volumes.get(volume_id)
+        persisted = self.persisted.pop(volume_id, {})
+        current = {}
+        # A removed tree only deletes the rows this executor loaded or
+        # wrote, not those of a volume it never knew
+        records = tree.dump() if tree is not None else []
+        for record in records:
+            current[record['peer_id']] = record
+            if persisted.get(record['peer_id']) == record:
+                continue
+            self.conn.execute(
+                'INSERT OR REPLACE INTO nodes (volume_id, %s) '
+                'VALUES (?, %s)' % (', '.join(NODE_COLUMNS),
+                                    ', '.join('?' * len(NODE_COLUMNS))),
+                (volume_id,) + tuple(record[column]
+                                     for column in NODE_COLUMNS))
+        for peer_id in persisted:
+            if peer_id not in current:
+                self.conn.execute('DELETE FROM nodes WHERE volume_id = ? '
+                                  'AND peer_id = ?', (volume_id, peer_id))
+        if tree is not None:
+            self.persisted[volume_id] = current
+
+    def _flush_host(self, host):
+        host_info = self.host_to_volumes.get(host)
+        self.conn.execute('DELETE FROM host_peers WHERE host = ?', (host,))
+        if host_info is None:
+            self.conn.execute('DELETE FROM hosts WHERE host = ?', (host,))
+            return
+
+        self.conn.execute('INSERT OR REPLACE INTO hosts (host, timestamp) '
+                          'VALUES (?, ?)',
+                          (host, to_timestamp(host_info['timestamp'])))
+        self.conn.executemany(
+            'INSERT INTO host_peers (host, peer_id, volume_id) '
+            'VALUES (?, ?, ?)',
+            [(host, peer_id, utils.get_image_id_from_peerid(peer_id))
+             for peer_id in host_info['volume_list']])
+
+
+class SqliteWithUncleExecutor(SqliteExecutor,
+                              impl_btree.BtreeWithUncleExecutor):
+    """
+    Durable variant of BtreeWithUncleExecutor.
+    """
@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2014 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+""" Primary/follower replication of the executor state.
+
+    The primary keeps a bounded journal of the mutations reported by its
+    executor. A follower bootstraps from a snapshot of the primary, then
+    polls the journal and replays the mutations on its own executor, so it
+    can serve read only requests from its copy. Both are served to
+    administrators only, a follower sends replication_admin_token.
+"""
+import collections
+import time
+import urllib
+import urllib2
+
+import eventlet
+from oslo.config import cfg
+
+from volt.common import exception
+from volt.openstack.common.gettextutils import _
+from volt.openstack.common import jsonutils
+from volt.openstack.common import log as logging
+
+
+LOG = logging.getLogger(__name__)
+
+replication_opts = [
+    cfg.IntOpt('replication_journal_size', default=0,
+               help=_('Number of executor mutations kept for followers. '
+                      'Set it on the primary to allow followers to '
+                      'replicate from it, 0 disables the journal. The '
+                      'journal is kept by the process serving the '
+                      'requests, so the primary must run with workers = 1 '
+                      'or 0, it refuses to start otherwise.')),
+    cfg.StrOpt('replication_primary_url',
+               help=_('Endpoint of the primary volt-api, e.g. '
+                      'http://primary:7447. When set this instance runs as '
+                      'a read only follower of the primary.')),
+    cfg.StrOpt('replication_admin_token', secret=True,
+               help=_('Token of an administrator of the primary, sent by a '
+                      'follower to fetch the snapshot and the journal, '
+                      'which the primary serves to administrators only.')),
+    cfg.FloatOpt('replication_poll_interval', default=0.5,
+                 help=_('Seconds between two polls of the primary journal '
+                        'by a follower.')),
+    cfg.IntOpt('replication_batch_size', default=1000,
+               help=_('Maximum number of journal entries fetched by a '
+                      'follower per poll.')),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(replication_opts)
+
+JOURNAL = None
+FOLLOWER = None
+
+
+def is_follower():
+    return bool(CONF.replication_primary_url)
+
+
+def primary_url(path):
+    """Return the url of path on the primary."""
+    return CONF.replication_primary_url.rstrip('/') + path
+
+
+class MutationJournal(object):
+    """ Bounded, sequence numbered journal of executor mutations.
+
+    Instances are registered as executor listeners.
+    """
+
+    def __init__(self, size):
+        self.entries = collections.deque(maxlen=size)
+        self.seq = 0
+
+    def __call__(self, event, payload):
+        self.seq += 1
+        self.entries.append((self.seq, event, payload))
+
+    def since(self, seq, limit):
+        """ Return up to limit entries following the entry seq.
+
+        :raises exception.JournalTruncated: if the entries following seq
+                                            were dropped from the journal.
+        """
+        if seq > self.seq:
+            return []
+        if not self.entries or self.entries[0][0] > seq + 1:
+            if seq < self.seq:
+                raise exception.JournalTruncated(seq=seq)
+            return []
+
+        start = seq + 1 - self.entries[0][0]
+        entries = []
+        for index in xrange(start, min(start + limit, len(self.entries))):
+            entry_seq, event, payload = self.entries[index]
+            entries.append({'seq': entry_seq, 'event': event,
+                            'payload': payload})
+        return entries
+
+
+def apply_entry(executor, event, payload):
+    """Replay one journal entry on the executor of a follower."""
+    if event == 'join':
+        executor.insert_node_slot(payload['volume_id'], host=payload['host'])
+    elif event == 'register':
+        kwargs = dict(payload)
+        volume_id = kwargs.pop('volume_id')
+        peer_id = kwargs.pop('peer_id')
+        executor.add_volume_metadata(volume_id, peer_id, **kwargs)
+    elif event == 'remove':
+        executor.delete_volume_metadata(payload['volume_id'],
+                                        payload['peer_id'])
+    elif event == 'evict':
+        executor.evict_host(payload['host'])
+    else:
+        LOG.warn(_('Ignoring unknown replication event %s'), event)
+
+
+class Follower(object):
+    """ Keeps the executor of a follower in sync with the primary.
+    """
+
+    def __init__(self, executor):
+        self.executor = executor
+        self.applied_seq = 0
+        self.primary_seq = 0
+        self.caught_up_at = None
+        self.synced = False
+        self.thread = None
+
+    def _get(self, path, **params):
+        url = primary_url(path)
+        if params:
+            url = '%s?%s' % (url, urllib.urlencode(params))
+        request = urllib2.Request(url)
+        if CONF.replication_admin_token:
+            request.add_header('X-Auth-Token', CONF.replication_admin_token)
+        response = urllib2.urlopen(request, timeout=30)
+        try:
+            return jsonutils.loads(response.read())
+        finally:
+            response.close()
+
+    def resync(self):
+        """Replace the local state with a snapshot of the primary."""
+        snapshot = self._get('/v1/replication/snapshot')
+        self.executor.restore_state(snapshot['state'])
+        self.executor.flush()
+        self.applied_seq = self.primary_seq = snapshot['seq']
+        self.synced = True
+        LOG.info(_('Restored snapshot of %(url)s at journal entry %(seq)s'),
+                 {'url': CONF.replication_primary_url, 'seq': snapshot['seq']})
+
+    def poll(self):
+        """Fetch and replay the next batch of journal entries."""
+        try:
+            journal = self._get('/v1/replication/journal',
+                                since=self.applied_seq,
+                                limit=CONF.replication_batch_size)
+        except urllib2.HTTPError as e:
+            if e.code != 410:
+                raise
+            LOG.warn(_('Fell behind the primary journal, resynchronizing'))
+            self.resync()
+            return
+
+        if journal['seq'] < self.applied_seq:
+            LOG.warn(_('Primary journal was reset, resynchronizing'))
+            self.resync()
+            return
+
+        for entry in journal['entries']:
+            try:
+                apply_entry(self.executor, entry['event'], entry['payload'])
+            except exception.VoltException as e:
+                LOG.warn(_('Failed to replay journal entry %(seq)s: %(e)s'),
+                         {'seq': entry['seq'], 'e': e})
+            self.applied_seq = entry['seq']
+        self.executor.flush()
+
+        self.primary_seq = journal['seq']
+        if self.applied_seq >= self.primary_seq:
+            self.caught_up_at = time.time()
+
+    def run(self):
+        while True:
+            interval = CONF.replication_poll_interval
+            try:
+                if not self.synced:
+                    self.resync()
+                self.poll()
+                if self.applied_seq < self.primary_seq:
+                    # More entries are waiting, fetch them right away.
+                    interval = 0
+            except Exception as e:
+                LOG.warn(_('Replication from %(url)s failed: %(e)s'),
+                         {'url': CONF.replication_primary_url, 'e': e})
+            eventlet.sleep(interval)
+
+    def start(self):
+        if self.thread is None:
+            self.thread = eventlet.spawn(self.run)
+
+    def status(self):
+        """ Report the replication progress. lag_seconds is the time since
+        the follower was last confirmed to be in sync with the primary.
+        """
+        lag_seconds = None
+        if self.caught_up_at is not None:
+            lag_seconds = time.time() - self.caught_up_at
+        return {
+            'role': 'follower',
+            'primary': CONF.replication_primary_url,
+            'applied_seq': self.applied_seq,
+            'primary_seq': self.primary_seq,
+            'lag_entries': max(0, self.primary_seq - self.applied_seq),
+            'lag_seconds': lag_seconds,
+        }
+
+
+def setup(executor):
+    """Attach the mutation journal to the executor of a primary."""
+    global JOURNAL
+
+    if (not is_follower() and CONF.replication_journal_size > 0 and
+            JOURNAL is None):
+        JOURNAL = MutationJournal(CONF.replication_journal_size)
+        executor.add_listener(JOURNAL)
+
+
+def check_workers(workers):
+    """ Refuse to run a primary with several workers, each of which would
+    journal its own mutations only.
+
+    :raises RuntimeError: if the journal is enabled and workers > 1
+    """
+    if JOURNAL is not None and workers > 1:
+        raise RuntimeError(_("The replication journal is kept by a single "
+                             "process, run the primary with workers = 1."))
+
+
+def get_follower(executor):
+    """ Return the follower replicating into executor, starting it on first
+    use, or None if this instance is not a follower.
+
+    The follower is started lazily from a request, so that it runs in the
+    worker process which serves the requests.
+    """
+    global FOLLOWER
+
+    if not is_follower():
+        return None
+    if FOLLOWER is None:
+        FOLLOWER = Follower(executor)
+        FOLLOWER.start()
+    return FOLLOWER
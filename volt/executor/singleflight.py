@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2014 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+""" Coalescing of concurrent identical executor calls.
+
+    While a host boots, its agent retries the query of a volume before the
+    first one was answered. A query places the host and writes the change
+    to the executor storage, during which the greenthread may yield, e.g.
+    waiting for the lock of SqliteExecutor. A query arriving meanwhile for
+    the same volume and host does not run again, it waits for the running
+    one and returns its result, or raises its exception.
+"""
+import sys
+
+from eventlet import event
+
+from volt.common import stats
+from volt.openstack.common import excutils
+
+
+class SingleFlight(object):
+    """ The calls in flight, by key.
+    """
+
+    def __init__(self):
+        # key -> event.Event sent the outcome of the call
+        self.calls = {}
+
+    def do(self, key, func, *args, **kwargs):
+        """ Return func(*args, **kwargs), or the result of the call of the
+        same key in flight. Waiting calls are counted in the
+        singleflight.coalesced counter.
+        """
+        call = self.calls.get(key)
+        if call is not None:
+            stats.incr('singleflight.coalesced')
+            return call.wait()
+
+        call = self.calls[key] = event.Event()
+        try:
+            result = func(*args, **kwargs)
+        except BaseException:
+            with excutils.save_and_reraise_exception():
+                del self.calls[key]
+                call.send_exception(*sys.exc_info())
+        del self.calls[key]
+        call.send(result)
+        return result
+
+
+def get_flights(executor):
+    """ Return the calls in flight of executor, so that every API handler
+    serving it shares them.
+    """
+    if getattr(executor, 'flights', None) is None:
+        executor.flights = SingleFlight()
+    return executor.flights
+
+
+def _place(executor, volume_id, peer_id, host):
+    try:
+        return executor.get_volume_parents(volume_id=volume_id,
+                                           peer_id=peer_id, host=host)
+    finally:
+        executor.flush()
+
+
+def get_volume_parents(executor, volume_id, peer_id=None, host=None):
+    """ Executor.get_volume_parents followed by Executor.flush, coalesced
+    with the call in flight for the same volume and host.
+    """
+    return get_flights(executor).do((volume_id, host), _place, executor,
+                                    volume_id, peer_id, host)
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import zlib
+
+from oslo.config import cfg
+import webob
+
+from volt.api import compression
+from volt.common import stats
+from volt.tests import base
+
+
+BODY = '[%s]' % ', '.join(['{"host": "10.0.0.1", "status": "OK"}'] * 100)
+
+
+def application(environ, start_response):
+    if environ['PATH_INFO'] == '/stream':
+        start_response('200 OK', [('Content-Type', 'application/json')])
+        return iter([BODY[:1000], '', BODY[1000:]])
+    body = BODY if environ['PATH_INFO'] == '/large' else '[]'
+    start_response('200 OK', [('Content-Type', 'application/json'),
+                              ('Content-Length', str(len(body)))])
+    return [body]
+
+
+class TestCompression(base.TestCase):
+
+    def setUp(self):
+        super(TestCompression, self).setUp()
+        cfg.CONF([], project='volt')
+        self.addCleanup(cfg.CONF.reset)
+        stats.reset()
+        self.addCleanup(stats.reset)
+        self.app = compression.CompressionMiddleware(application)
+
+    def _get(self, path, accept_encoding):
+        req = webob.Request.blank(path)
+        if accept_encoding is not None:
+            req.headers['Accept-Encoding'] = accept_encoding
+        status, headers, app_iter = req.call_application(self.app)
+        return dict(headers), list(app_iter)
+
+    def test_negotiates_encoding_above_threshold(self):
+        for accept_encoding, encoding, wbits in (
+                ('gzip, deflate', 'gzip', 16 + zlib.MAX_WBITS),
+                ('gzip;q=0, deflate', 'deflate', zlib.MAX_WBITS)):
+            headers, chunks = self._get('/large', accept_encoding)
+            self.assertEqual(encoding, headers['Content-Encoding'])
+            self.assertEqual('Accept-Encoding', headers['Vary'])
+            self.assertEqual(str(len(''.join(chunks))),
+                             headers['Content-Length'])
+            self.assertEqual(BODY, zlib.decompress(''.join(chunks), wbits))
+
+        for path, accept_encoding in (('/small', 'gzip'),
+                                      ('/large', 'identity'),
+                                      ('/large', None)):
+            headers, chunks = self._get(path, accept_encoding)
+            self.assertNotIn('Content-Encoding', headers)
+        self.assertEqual(2, stats.get('compression.responses'))
+
+    def test_streamed_chunks_are_flushed(self):
+        headers, chunks = self._get('/stream', 'gzip')
+        self.assertNotIn('Content-Length', headers)
+        self.assertEqual(3, len(chunks))
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        self.assertEqual(BODY[:1000], decompressor.decompress(chunks[0]))
+        self.assertEqual(BODY, BODY[:1000] +
+                         decompressor.decompress(''.join(chunks[1:])))
+
+        self.assertEqual(len(BODY), stats.get('compression.bytes_in'))
+        self.assertEqual(len(''.join(chunks)),
+                         stats.get('compression.bytes_out'))
+        self.assertTrue(compression.ratio() < 0.1)
+
+    def test_unstarted_response_is_passed_through(self):
+        app_iter = []
+        app = compression.CompressionMiddleware(
+            lambda environ, start_response: app_iter)
+        environ = webob.Request.blank(
+            '/', headers={'Accept-Encoding': 'gzip'}).environ
+        self.assertIs(app_iter, app(environ, None))
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import fixtures
+from oslo.config import cfg
+from paste import urlmap
+import webob
+
+from volt.api import auth
+from volt.api import conditional
+from volt.api import fastpath
+from volt.api.v1 import router
+from volt.common import stats
+from volt.common import wsgi
+from volt.executor import impl_btree
+from volt.tests import base
+
+
+class TestConditional(base.TestCase):
+
+    def setUp(self):
+        super(TestConditional, self).setUp()
+        cfg.CONF([], project='volt')
+        self.addCleanup(cfg.CONF.reset)
+        self.useFixture(fixtures.MonkeyPatch(
+            'volt.executor.start_scanning', lambda executor: None))
+        self.useFixture(fixtures.MonkeyPatch('volt.api.conditional._CACHE',
+                                             None))
+        stats.reset()
+        self.addCleanup(stats.reset)
+        self.executor = impl_btree.BtreeExecutor()
+        self.useFixture(fixtures.MonkeyPatch(
+            'volt.executor.get_default_executor', lambda: self.executor))
+        rootapp = urlmap.URLMap()
+        rootapp['/v1'] = router.API(wsgi.APIMapper())
+        self.app = auth.UnauthenticatedContextMiddleware(rootapp)
+        self.queries = []
+        get_volume_parents = self.executor.get_volume_parents
+
+        def record(volume_id, peer_id=None, host=None):
+            self.queries.append(host)
+            return get_volume_parents(volume_id, peer_id=peer_id, host=host)
+        self.executor.get_volume_parents = record
+
+    def _request(self, path, host='10.0.0.9', method='GET', etag=None,
+                 app=None):
+        req = webob.Request.blank(path, method=method)
+        req.environ['REMOTE_ADDR'] = host
+        if etag is not None:
+            req.headers['If-None-Match'] = etag
+        return req.get_response(app or self.app)
+
+    def _join(self, host):
+        self._request('/v1/volumes/query/vol-1', host)
+        self.executor.add_volume_metadata('vol-1', '%s:vol-1' % host,
+                                          host=host, port=3260, iqn='iqn',
+                                          lun=1)
+
+    def test_matches(self):
+        self.assertTrue(conditional.matches('*', 'W/"a"'))
+        self.assertTrue(conditional.matches('"b", W/"a"', 'W/"a"'))
+        self.assertTrue(conditional.matches('"a"', 'W/"a"'))
+        self.assertFalse(conditional.matches('"ab"', 'W/"a"'))
+        self.assertFalse(conditional.matches('*', None))
+
+    def test_query_not_modified(self):
+        for host in ('10.0.0.1', '10.0.0.2', '10.0.0.3'):
+            self._join(host)
+        resp = self._request('/v1/volumes/query/vol-1')
+        self.assertEqual(200, resp.status_int)
+        etag = resp.headers['ETag']
+        del self.queries[:]
+
+        fast = fastpath.FastPathMiddleware(self.app)
+        for app in (self.app, fast):
+            resp = self._request('/v1/volumes/query/vol-1', etag=etag,
+                                 app=app)
+            self.assertEqual(304, resp.status_int)
+            self.assertEqual(etag, resp.headers['ETag'])
+            self.assertEqual('', resp.body)
+        self.assertEqual([], self.queries)
+
+        # A change of the tree which leaves the parents alone
+        self._request('/v1/volumes/query/vol-1', '10.0.0.4')
+        self.assertEqual(304, self._request('/v1/volumes/query/vol-1',
+                                            etag=etag).status_int)
+        self.assertEqual(['10.0.0.4', '10.0.0.9'], self.queries)
+
+        self.executor.delete_volume_metadata('vol-1', '10.0.0.1:vol-1')
+        resp = self._request('/v1/volumes/query/vol-1', etag=etag)
+        self.assertEqual(200, resp.status_int)
+        self.assertNotEqual(etag, resp.headers['ETag'])
+        self.assertEqual(3, stats.get('etag.hits'))
+        self.assertEqual(1, stats.get('etag.misses'))
+        self.assertEqual(0.75, conditional.hit_rate())
+
+    def test_volume_peers_not_modified(self):
+        self._join('10.0.0.1')
+        resp = self._request('/v1/volumes/vol-1', method='HEAD')
+        self.assertEqual(200, resp.status_int)
+        etag = resp.headers['ETag']
+        for method in ('HEAD', 'GET'):
+            self.assertEqual(304, self._request('/v1/volumes/vol-1',
+                                                method=method,
+                                                etag=etag).status_int)
+
+        self._join('10.0.0.2')
+        resp = self._request('/v1/volumes/vol-1', method='HEAD', etag=etag)
+        self.assertEqual(200, resp.status_int)
+        self.assertNotEqual(etag, resp.headers['ETag'])
+        self.assertNotIn('ETag', self._request('/v1/volumes').headers)
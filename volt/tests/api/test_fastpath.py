@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import json
+
+import fixtures
+from oslo.config import cfg
+from paste import urlmap
+import webob
+
+from volt.api import auth
+from volt.api import fastpath
+from volt.api.v1 import router
+from volt.common import binary
+from volt.common import exception
+from volt.common import wsgi
+from volt.executor import impl_btree
+from volt.tests import base
+
+
+class TestFastPath(base.TestCase):
+
+    def setUp(self):
+        super(TestFastPath, self).setUp()
+        cfg.CONF([], project='volt')
+        self.addCleanup(cfg.CONF.reset)
+        self.useFixture(fixtures.MonkeyPatch(
+            'volt.executor.start_scanning', lambda executor: None))
+        self.pipeline = self._pipeline()
+        self.fast = fastpath.FastPathMiddleware(self._pipeline())
+        self.passed = []
+        application = self.fast.application
+
+        def record(environ, start_response):
+            self.passed.append(environ['PATH_INFO'])
+            return application(environ, start_response)
+        self.fast.application = record
+
+    def _pipeline(self):
+        volt_executor = impl_btree.BtreeExecutor()
+        self.useFixture(fixtures.MonkeyPatch(
+            'volt.executor.get_default_executor', lambda: volt_executor))
+        rootapp = urlmap.URLMap()
+        rootapp['/v1'] = router.API(wsgi.APIMapper())
+        return auth.UnauthenticatedContextMiddleware(rootapp)
+
+    def _call(self, app, method, path, host, body=None):
+        req = webob.Request.blank(path, method=method)
+        req.environ['REMOTE_ADDR'] = host
+        if body is not None:
+            req.body = json.dumps(body)
+        resp = req.get_response(app)
+        self.assertTrue(resp.headers.pop('x-openstack-request-id')
+                        .startswith('req-'))
+        return resp.status, resp.headerlist, resp.body
+
+    def test_same_responses_as_pipeline(self):
+        requests = []
+        for index in range(4):
+            host = '10.0.0.%d' % index
+            requests.extend([
+                ('GET', '/v1/volumes/query/vol-1', host, None),
+                ('POST', '/v1/volumes/vol-1/%s:vol-1' % host, host,
+                 {'host': host, 'port': 3260, 'iqn': 'iqn', 'lun': 1}),
+                ('PUT', '/v1/members/heartbeat', host, None),
+                ('GET', '/v1/volumes/query/vol-1', host, None),
+            ])
+        requests.append(('PUT', '/v1/members/heartbeat', '10.0.1.1', None))
+        requests.append(('GET', '/v1/volumes/query/', '10.0.0.1', None))
+        for method, path, host, body in requests:
+            self.assertEqual(self._call(self.pipeline, method, path, host,
+                                        body),
+                             self._call(self.fast, method, path, host, body))
+        # Only the registrations and the malformed query went down the
+        # pipeline
+        self.assertEqual(5, len(self.passed))
+
+    def test_request_with_body_goes_down_the_pipeline(self):
+        environ = {'CONTENT_LENGTH': '2'}
+        self.assertFalse(self.fast._is_plain(environ))
+        environ = {'HTTP_X_IDENTITY_STATUS': 'Invalid'}
+        self.assertFalse(self.fast._is_plain(environ))
+        self.assertTrue(self.fast._is_plain({}))
+
+    def test_binary_responses_match_pipeline(self):
+        for index in range(3):
+            host = '10.0.0.%d' % index
+            for app in (self.pipeline, self.fast):
+                for method, path in (('GET', '/v1/volumes/query/vol-1'),
+                                     ('PUT', '/v1/members/heartbeat')):
+                    req = webob.Request.blank(path, method=method)
+                    req.environ['REMOTE_ADDR'] = host
+                    req.accept = 'application/x-volt-binary, */*;q=0.5'
+                    resp = req.get_response(app)
+                    self.assertEqual(binary.CONTENT_TYPE, resp.content_type)
+                    json_req = webob.Request.blank(path, method=method)
+                    json_req.environ['REMOTE_ADDR'] = host
+                    self.assertEqual(
+                        json.loads(json_req.get_response(app).body),
+                        binary.loads(resp.body))
+        self.assertEqual([], self.passed)
+
+    def test_errors_are_answered_once(self):
+        calls = []
+
+        def not_found(*args, **kwargs):
+            calls.append(args)
+            raise exception.NotFound()
+
+        for name in ('get_volume_parents', 'update_status'):
+            self.useFixture(fixtures.MonkeyPatch(
+                'volt.executor.impl_btree.BtreeExecutor.%s' % name,
+                not_found))
+        responses = []
+        for app in (self.pipeline, self.fast):
+            del calls[:]
+            responses.append([
+                self._call(app, 'GET', '/v1/volumes/query/vol-1', '10.0.0.1'),
+                self._call(app, 'PUT', '/v1/members/heartbeat', '10.0.0.1')])
+            self.assertEqual(2, len(calls))
+        self.assertEqual(['404 Not Found', '404 Not Found'],
+                         [status for status, headers, body in responses[1]])
+        self.assertEqual(responses[0], responses[1])
+        self.assertEqual([], self.passed)
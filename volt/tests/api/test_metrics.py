@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from oslo.config import cfg
+import webob
+
+from volt.api import metrics as metrics_api
+from volt.common import metrics
+from volt.common import stats
+from volt.executor import impl_btree
+from volt.tests import base
+
+
+class TestMetrics(base.TestCase):
+
+    def setUp(self):
+        super(TestMetrics, self).setUp()
+        cfg.CONF([], project='volt')
+        self.addCleanup(cfg.CONF.reset)
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+        stats.reset()
+        self.addCleanup(stats.reset)
+
+    def _app(self, environ, start_response):
+        if environ['PATH_INFO'].startswith('/v1/volumes/query/'):
+            start_response('200 OK', [('Content-Type', 'text/plain')])
+            return ['ok']
+        start_response('404 Not Found', [('Content-Type', 'text/plain')])
+        return ['']
+
+    def test_histogram(self):
+        histogram = metrics.Histogram()
+        for value in (0.000001, 0.00001, 0.000011, 0.25, 100):
+            histogram.observe(value)
+        self.assertEqual(2, histogram.counts[0])
+        self.assertEqual(1, histogram.counts[1])
+        self.assertEqual(1, histogram.counts[metrics.BOUNDS.index(0.3)])
+        self.assertEqual(1, histogram.counts[-1])
+        self.assertEqual(5, sum(histogram.counts))
+
+    def test_requests(self):
+        app = metrics_api.MetricsMiddleware(self._app)
+        for path in ('/v1/volumes/query/vol-1', '/v1/volumes/query/vol-2',
+                     '/v1/other', '/v1/a/b/c'):
+            webob.Request.blank(path).get_response(app)
+        webob.Request.blank('/v1/stats', method='MADEUP').get_response(app)
+        stats.incr('etag.hits')
+
+        resp = webob.Request.blank('/metrics').get_response(app)
+        self.assertEqual(200, resp.status_int)
+        self.assertTrue(resp.content_type.startswith('text/plain'))
+        lines = resp.body.splitlines()
+        self.assertIn('volt_http_requests_total{method="GET",'
+                      'route="/v1/volumes/query/*",status="200"} 2', lines)
+        self.assertIn('volt_http_requests_total{method="GET",'
+                      'route="unmatched",status="404"} 2', lines)
+        self.assertIn('volt_http_requests_total{method="OTHER",'
+                      'route="/v1/stats",status="404"} 1', lines)
+        self.assertIn('volt_http_request_duration_seconds_count{'
+                      'method="GET",route="/v1/volumes/query/*"} 2', lines)
+        self.assertIn('volt_http_request_duration_seconds_bucket{'
+                      'le="+Inf",method="GET",route="/v1/volumes/query/*"} 2',
+                      lines)
+        self.assertIn('volt_stat{name="etag.hits"} 1', lines)
+        # /metrics itself is not recorded
+        self.assertEqual(5, sum(metrics.REQUESTS.values()))
+
+    def test_executor_calls(self):
+        executor = impl_btree.BtreeExecutor()
+        metrics.instrument(executor)
+        executor.get_volume_parents('vol-1', host='10.0.0.1')
+        executor.update_status('10.0.0.1')
+        self.assertEqual(['get_volume_parents', 'update_status'],
+                         sorted(metrics.CALLS))
+        self.assertIn('volt_executor_call_duration_seconds_count{'
+                      'call="update_status"} 1',
+                      metrics.export().splitlines())
+
+        cfg.CONF.set_override('time_executor_calls', False)
+        executor = impl_btree.BtreeExecutor()
+        metrics.instrument(executor)
+        self.assertNotIn('flush', executor.__dict__)
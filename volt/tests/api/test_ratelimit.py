@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from oslo.config import cfg
+import webob
+
+from volt.api import ratelimit
+from volt.common import stats
+from volt.tests import base
+
+
+class TestRateLimit(base.TestCase):
+
+    def setUp(self):
+        super(TestRateLimit, self).setUp()
+        cfg.CONF([], project='volt')
+        self.addCleanup(cfg.CONF.reset)
+        stats.reset()
+        self.addCleanup(stats.reset)
+        self.streams = []
+
+    def _app(self, environ, start_response):
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        if environ['PATH_INFO'].endswith('/events'):
+            stream = iter(['data'])
+            self.streams.append(stream)
+            return stream
+        return ['ok']
+
+    def _request(self, app, path, host='10.0.0.1', method='GET'):
+        req = webob.Request.blank(path, method=method)
+        req.environ['REMOTE_ADDR'] = host
+        return req.get_response(app)
+
+    def test_route_of(self):
+        self.assertEqual('GET /v1/volumes/query/*',
+                         ratelimit.route_of('GET', '/v1/volumes/query/vol-1'))
+        self.assertEqual('PUT /v1/members/heartbeat',
+                         ratelimit.route_of('PUT', '/v1/members/heartbeat'))
+
+    def test_token_buckets(self):
+        buckets = ratelimit.TokenBuckets(2.0, 3, 100)
+        for _i in range(3):
+            self.assertEqual(0, buckets.take('a', now=100.0))
+        self.assertEqual(0.5, buckets.take('a', now=100.0))
+        self.assertEqual(0, buckets.take('b', now=100.0))
+        self.assertEqual(0, buckets.take('a', now=100.5))
+        self.assertEqual(0.5, buckets.take('a', now=100.5))
+
+        # Idle buckets are dropped by the next sweep
+        self.assertEqual(0, buckets.take('c', now=102.0))
+        self.assertEqual(['c'], buckets.buckets.keys())
+
+    def test_token_buckets_bounded(self):
+        buckets = ratelimit.TokenBuckets(1.0, 1000, 4)
+        for i in range(10):
+            buckets.take(i, now=100.0 + i)
+            self.assertTrue(len(buckets.buckets) <= 4)
+        self.assertIn(9, buckets.buckets)
+        self.assertNotIn(0, buckets.buckets)
+
+    def test_too_many_requests(self):
+        cfg.CONF.set_override('rate_limit_per_second', 1.0)
+        cfg.CONF.set_override('rate_limit_burst', 2)
+        cfg.CONF.set_override('rate_limit_exempt_hosts', ['10.0.0.9'])
+        app = ratelimit.RateLimitMiddleware(self._app)
+        for _i in range(2):
+            self.assertEqual(200, self._request(app, '/v1/volumes/query/a')
+                             .status_int)
+        resp = self._request(app, '/v1/volumes/query/b')
+        self.assertEqual(429, resp.status_int)
+        self.assertEqual('1', resp.headers['Retry-After'])
+        self.assertEqual(1, stats.get('ratelimit.rejected'))
+
+        # Other routes, hosts and the exempt hosts have their own budget
+        self.assertEqual(200, self._request(app, '/v1/volumes/query/a',
+                                            method='PUT').status_int)
+        self.assertEqual(200, self._request(app, '/v1/volumes/query/a',
+                                            host='10.0.0.2').status_int)
+        for _i in range(5):
+            self.assertEqual(200, self._request(app, '/v1/volumes/query/a',
+                                                host='10.0.0.9').status_int)
+
+    def test_max_concurrent_requests(self):
+        cfg.CONF.set_override('rate_limit_per_second', 0)
+        cfg.CONF.set_override('max_concurrent_requests', 1)
+        app = ratelimit.RateLimitMiddleware(self._app)
+        environ = {'REQUEST_METHOD': 'GET', 'PATH_INFO': '/v1/stream/events',
+                   'REMOTE_ADDR': '10.0.0.1'}
+        app_iter = app(environ, lambda status, headers: None)
+        self.assertEqual(1, app.concurrent)
+
+        resp = self._request(app, '/v1/volumes/query/a')
+        self.assertEqual(429, resp.status_int)
+        self.assertEqual(1, stats.get('ratelimit.rejected_concurrency'))
+        # Long polls are not capped
+        self.assertEqual(200, self._request(app, '/v1/events').status_int)
+
+        app_iter.close()
+        self.assertEqual(0, app.concurrent)
+        self.assertEqual(200, self._request(app, '/v1/volumes/query/a')
+                         .status_int)
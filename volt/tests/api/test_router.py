@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import fixtures
+from oslo.config import cfg
+import routes
+
+from volt.api.v1 import router
+from volt.common import wsgi
+from volt.executor import impl_btree
+from volt.tests import base
+
+
+class TestCompiledRoutes(base.TestCase):
+
+    def setUp(self):
+        super(TestCompiledRoutes, self).setUp()
+        cfg.CONF([], project='volt')
+        self.addCleanup(cfg.CONF.reset)
+        volt_executor = impl_btree.BtreeExecutor()
+        self.useFixture(fixtures.MonkeyPatch(
+            'volt.executor.get_default_executor', lambda: volt_executor))
+        self.api = router.API(wsgi.APIMapper())
+
+    def test_compiled_matches_mapper(self):
+        requests = [
+            ('GET', '/volumes'), ('HEAD', '/volumes/vol-1'),
+            ('HEAD', '/volumes/query'), ('POST', '/volumes/query'),
+            ('POST', '/volumes/register'), ('POST', '/volumes/remove'),
+            ('GET', '/volumes/query/vol-1'), ('GET', '/volumes/query/v.json'),
+            ('GET', '/volumes/query/\xc3\xa9'), ('GET', '/volumes/query/'),
+            ('POST', '/volumes/vol-1/peer-1'), ('POST', '/volumes//peer-1'),
+            ('DELETE', '/volumes/vol-1/peer-1'), ('DELETE', '/volumes/vol-1'),
+            ('DELETE', '/volumes/query'), ('PUT', '/members/heartbeat'),
+            ('GET', '/members/heartbeat'), ('GET', '/replication/journal'),
+            ('GET', '/stats'), ('GET', '/stats/'), ('GET', '/volumes/'),
+            ('GET', '/unknown'), ('GET', 'volumes'), ('GET', '/'),
+        ]
+        for method, path in requests:
+            environ = {'REQUEST_METHOD': method, 'PATH_INFO': path}
+            expected = self.api.map.routematch(environ=environ)
+            compiled = self.api._match(environ)
+            if compiled is None:
+                self.assertIsNone(expected, '%s %s' % (method, path))
+            else:
+                self.assertEqual(expected, compiled, '%s %s' % (method, path))
+
+    def test_method_override_uses_mapper(self):
+        environ = {'REQUEST_METHOD': 'POST', 'PATH_INFO': '/volumes/query',
+                   'QUERY_STRING': '_method=GET'}
+        self.assertIsNone(self.api._match(environ))
+
+    def test_uncompiled_mapper_is_not_compiled(self):
+        mapper = routes.Mapper()
+        mapper.connect("/volumes", controller=None, action='index',
+                       conditions={'method': ['GET']})
+        mapper.connect("/v1/{path_info:.*}", controller=None)
+        self.assertIsNone(wsgi.compile_routes(mapper))
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import hashlib
+import json
+import threading
+from wsgiref import simple_server
+
+import fixtures
+from oslo.config import cfg
+import webob
+
+from volt.api import auth
+from volt.api import token_cache
+from volt.tests import base
+
+
+class _QuietHandler(simple_server.WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class TestTokenCache(base.TestCase):
+
+    def setUp(self):
+        super(TestTokenCache, self).setUp()
+        cfg.CONF([], project='volt')
+        self.addCleanup(cfg.CONF.reset)
+        self.cache = token_cache.TokenCache(60, 4)
+        self.useFixture(fixtures.MonkeyPatch(
+            'volt.api.token_cache.get_cache', lambda: self.cache))
+        self.middleware = auth.ContextMiddleware(None)
+
+    def _context(self, token, roles='Member', tenant='t1'):
+        req = webob.Request.blank('/v1/volumes')
+        req.headers.update({
+            'X-Identity-Status': 'Confirmed',
+            'X-Auth-Token': token,
+            'X-User-Id': 'u1',
+            'X-Tenant-Id': tenant,
+            'X-Roles': roles,
+            'X-Service-Catalog': json.dumps([{'type': 'volume'}]),
+        })
+        self.middleware.process_request(req)
+        return req.context
+
+    def test_repeated_token_reuses_parsed_identity(self):
+        first = self._context('tok-1')
+        self.assertEqual(['member'], first.roles)
+        self.assertEqual([{'type': 'volume'}], first.service_catalog)
+
+        # authtoken sets the same headers for the same token
+        second = self._context('tok-1', roles='admin', tenant='t2')
+        self.assertEqual(('t1', ['member'], 'tok-1'),
+                         (second.tenant, second.roles, second.auth_tok))
+        self.assertIs(first.service_catalog, second.service_catalog)
+        self.assertIsNot(first.roles, second.roles)
+        self.assertNotEqual(first.request_id, second.request_id)
+
+        self.assertEqual(['admin'], self._context('tok-2', 'admin').roles)
+
+    def test_entries_expire_and_stay_bounded(self):
+        for index in range(10):
+            self.cache.put('tok-%d' % index, index, now=100)
+            self.assertTrue(len(self.cache.entries) <= 4)
+        self.assertEqual(9, self.cache.get('tok-9', now=159))
+        self.assertIsNone(self.cache.get('tok-9', now=160))
+        self.assertNotIn('tok-9', self.cache.entries)
+
+    def test_revocation_list_of_stub_identity_service(self):
+        pki_token = 'MII' + 'x' * 200
+        revoked = {'revoked': [{'id': 'tok-1'},
+                               {'id': hashlib.md5(pki_token).hexdigest()}]}
+        fetched = []
+
+        def identity(environ, start_response):
+            fetched.append((environ['PATH_INFO'],
+                            environ.get('HTTP_X_AUTH_TOKEN')))
+            start_response('200 OK', [('Content-Type', 'application/json')])
+            return [json.dumps(revoked)]
+
+        server = simple_server.make_server('127.0.0.1', 0, identity,
+                                           handler_class=_QuietHandler)
+        self.addCleanup(server.server_close)
+        thread = threading.Thread(target=server.handle_request)
+        thread.start()
+        self.addCleanup(thread.join)
+        cfg.CONF.set_override('token_revocation_admin_token', 'admin-tok')
+
+        for token in ('tok-1', 'tok-2', pki_token):
+            self._context(token)
+        poller = token_cache.RevocationPoller(
+            self.cache,
+            'http://127.0.0.1:%d/v2.0/tokens/revoked' % server.server_port,
+            10)
+        poller.poll()
+
+        self.assertEqual([('/v2.0/tokens/revoked', 'admin-tok')], fetched)
+        self.assertEqual(['tok-2'], list(self.cache.entries))
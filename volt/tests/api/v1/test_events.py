@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import json
+
+import fixtures
+from oslo.config import cfg
+from paste import urlmap
+import webob
+
+from volt.api import auth
+from volt.api.v1 import events as events_api
+from volt.api.v1 import router
+from volt.common import wsgi
+from volt.executor import events
+from volt.executor import impl_btree
+from volt.tests import base
+
+
+class TestEvents(base.TestCase):
+
+    def setUp(self):
+        super(TestEvents, self).setUp()
+        cfg.CONF([], project='volt')
+        self.addCleanup(cfg.CONF.reset)
+        cfg.CONF.set_override('event_batch_interval', 0)
+        self.useFixture(fixtures.MonkeyPatch('volt.executor.events.STREAM',
+                                             None))
+        self.useFixture(fixtures.MonkeyPatch(
+            'volt.executor.events.DRAINING', False))
+        self.executor = impl_btree.BtreeExecutor()
+        events.setup(self.executor)
+        self.useFixture(fixtures.MonkeyPatch(
+            'volt.executor.get_default_executor', lambda: self.executor))
+        rootapp = urlmap.URLMap()
+        rootapp['/v1'] = router.API(wsgi.APIMapper())
+        self.app = auth.UnauthenticatedContextMiddleware(rootapp)
+
+    def test_server_sent_events(self):
+        status, headers, app_iter = webob.Request.blank(
+            '/v1/events').call_application(self.app)
+        self.assertEqual('200 OK', status)
+        self.assertTrue(dict(headers)['Content-Type'].startswith(
+            'text/event-stream'))
+        chunks = iter(app_iter)
+        self.assertEqual(': subscribed\n\n', next(chunks))
+        self.assertEqual(1, len(events.STREAM.subscribers))
+
+        self.executor.get_volume_parents('vol-1', host='10.0.0.1')
+        messages = next(chunks).split('\n\n')[:-1]
+        self.assertEqual(2, len(messages))
+        lines = messages[0].split('\n')
+        self.assertEqual(['id: 1', 'event: join'], lines[:2])
+        data = json.loads(lines[2][len('data: '):])
+        self.assertEqual(('join', 'vol-1', '10.0.0.1'),
+                         (data['event'], data['volume_id'], data['host']))
+
+        app_iter.close()
+        self.assertEqual([], events.STREAM.subscribers)
+
+    def test_stream_ends_when_draining(self):
+        status, headers, app_iter = webob.Request.blank(
+            '/v1/events').call_application(self.app)
+        chunks = iter(app_iter)
+        self.assertEqual(': subscribed\n\n', next(chunks))
+
+        self.executor.get_volume_parents('vol-1', host='10.0.0.1')
+        events.drain()
+        # The events of the last delivery are still sent
+        self.assertIn('event: join', next(chunks))
+        self.assertRaises(StopIteration, next, chunks)
+        self.assertEqual([], events.STREAM.subscribers)
+
+    def test_admin_only(self):
+        req = webob.Request.blank('/v1/events')
+        req.context = type('Context', (object,), {'is_admin': False})()
+        self.assertRaises(webob.exc.HTTPForbidden,
+                          events_api.Controller().index, req)
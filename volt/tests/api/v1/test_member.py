@@ -14,3 +14,186 @@
 # WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 # License for the specific language governing permissions and limitations
 # under the License.
+
+import json
+import os
+
+import eventlet
+from eventlet.green import httplib
+import eventlet.wsgi
+import fixtures
+from oslo.config import cfg
+from paste import urlmap
+import webob
+
+from volt.api import auth
+from volt.api import heartbeat
+from volt.api.v1 import router
+from volt.common import stats
+from volt.common import wsgi
+from volt.executor import impl_btree
+from volt.tests import base
+
+
+class TestWatch(base.TestCase):
+
+    def setUp(self):
+        super(TestWatch, self).setUp()
+        cfg.CONF([], project='volt')
+        self.addCleanup(cfg.CONF.reset)
+        self.useFixture(fixtures.MonkeyPatch('volt.api.watch._REGISTRY',
+                                             None))
+        stats.reset()
+        self.addCleanup(stats.reset)
+        self.executor = impl_btree.BtreeExecutor()
+        self.useFixture(fixtures.MonkeyPatch(
+            'volt.executor.get_default_executor', lambda: self.executor))
+        rootapp = urlmap.URLMap()
+        rootapp['/v1'] = router.API(wsgi.APIMapper())
+        self.app = auth.UnauthenticatedContextMiddleware(rootapp)
+        for host in ('10.0.0.1', '10.0.0.2', '10.0.0.3'):
+            self.executor.get_volume_parents('vol-1', host=host)
+            self.executor.add_volume_metadata('vol-1', '%s:vol-1' % host,
+                                              host=host, port=3260,
+                                              iqn='iqn', lun=1)
+
+    def _watch(self, host, query=''):
+        req = webob.Request.blank('/v1/members/watch%s' % query)
+        req.environ['REMOTE_ADDR'] = host
+        resp = req.get_response(self.app)
+        self.assertEqual(200, resp.status_int)
+        return json.loads(resp.body)
+
+    def test_wakes_the_moved_hosts(self):
+        watchers = [eventlet.spawn(self._watch, host, '?timeout=5')
+                    for host in ('10.0.0.2', '10.0.0.3')]
+        eventlet.sleep(0)
+        self.assertEqual(2, stats.get('watch.parked'))
+
+        # 10.0.0.3 is the child of 10.0.0.1
+        self.executor.delete_volume_metadata('vol-1', '10.0.0.1:vol-1')
+        result = watchers[1].wait()
+        self.assertTrue(result['changed'])
+        self.assertEqual(1, stats.get('watch.parked'))
+        watchers[0].kill()
+
+        # The changes made between two watches are not missed
+        cursor = result['cursor']
+        self.executor.delete_volume_metadata('vol-1', '10.0.0.3:vol-1')
+        result = self._watch('10.0.0.3', '?timeout=0&cursor=%s' % cursor)
+        self.assertTrue(result['changed'])
+        self.assertNotEqual(cursor, result['cursor'])
+
+    def test_timeout(self):
+        result = self._watch('10.0.0.3', '?timeout=0')
+        self.assertFalse(result['changed'])
+        self.assertEqual(result, self._watch('10.0.0.3', '?timeout=0&'
+                                             'cursor=%s' % result['cursor']))
+        for timeout in ('soon', '-1'):
+            req = webob.Request.blank('/v1/members/watch?timeout=%s' %
+                                      timeout)
+            req.environ['REMOTE_ADDR'] = '10.0.0.3'
+            self.assertEqual(400, req.get_response(self.app).status_int)
+
+    def test_cursor_of_another_worker(self):
+        cursor = self._watch('10.0.0.3', '?timeout=0')['cursor']
+        # Changes made while the host polled another worker are not missed
+        for foreign in ('0123abcd-%s' % cursor.split('-')[1], 'garbage'):
+            result = self._watch('10.0.0.3', '?timeout=5&cursor=%s' % foreign)
+            self.assertTrue(result['changed'])
+            self.assertEqual(cursor, result['cursor'])
+        self.assertEqual(2, stats.get('watch.foreign_cursors'))
+
+    def _request(self, port, method, path):
+        conn = httplib.HTTPConnection('127.0.0.1', port)
+        try:
+            conn.request(method, path)
+            return conn.getresponse().status
+        finally:
+            conn.close()
+
+    def test_parked_watches_leave_room_for_heartbeats(self):
+        cfg.CONF.set_override('watch_max_parked', 2)
+        self.executor.get_volume_parents('vol-1', host='127.0.0.1')
+        # Every connection holds one of the 3 greenthreads of the pool
+        sock = eventlet.listen(('127.0.0.1', 0))
+        server = eventlet.spawn(eventlet.wsgi.server, sock, self.app,
+                                custom_pool=eventlet.GreenPool(3),
+                                protocol=wsgi.HttpProtocol,
+                                log=open(os.devnull, 'w'))
+        self.addCleanup(server.kill)
+        port = sock.getsockname()[1]
+
+        watchers = [eventlet.spawn(self._request, port, 'GET',
+                                   '/v1/members/watch?timeout=5')
+                    for _i in range(3)]
+        self.addCleanup(lambda: [watcher.kill() for watcher in watchers])
+        while not stats.get('watch.rejected'):
+            eventlet.sleep(0.01)
+        self.assertEqual(2, stats.get('watch.parked'))
+
+        with eventlet.Timeout(2):
+            self.assertEqual(200, self._request(port, 'PUT',
+                                                '/v1/members/heartbeat'))
+        self.assertEqual(429, [watcher for watcher in watchers
+                               if watcher.dead][0].wait())
+
+
+class TestAsyncHeartbeat(base.TestCase):
+
+    def setUp(self):
+        super(TestAsyncHeartbeat, self).setUp()
+        cfg.CONF([], project='volt')
+        self.addCleanup(cfg.CONF.reset)
+        cfg.CONF.set_override('async_heartbeat', True)
+        self.useFixture(fixtures.MonkeyPatch('volt.api.heartbeat._CACHE',
+                                             None))
+        stats.reset()
+        self.addCleanup(stats.reset)
+        self.executor = impl_btree.BtreeExecutor()
+        self.useFixture(fixtures.MonkeyPatch(
+            'volt.executor.get_default_executor', lambda: self.executor))
+        rootapp = urlmap.URLMap()
+        rootapp['/v1'] = router.API(wsgi.APIMapper())
+        self.app = auth.UnauthenticatedContextMiddleware(rootapp)
+        for host in ('10.0.0.1', '10.0.0.2', '10.0.0.3'):
+            self.executor.get_volume_parents('vol-1', host=host)
+            self.executor.add_volume_metadata('vol-1', '%s:vol-1' % host,
+                                              host=host, port=3260,
+                                              iqn='iqn', lun=1)
+        self.computed = []
+        update_status = self.executor.update_status
+
+        def record(host=None):
+            self.computed.append(host)
+            return update_status(host=host)
+        self.executor.update_status = record
+
+    def _heartbeat(self, host):
+        req = webob.Request.blank('/v1/members/heartbeat', method='PUT')
+        req.environ['REMOTE_ADDR'] = host
+        resp = req.get_response(self.app)
+        self.assertEqual(200, resp.status_int)
+        return json.loads(resp.body)
+
+    def test_cached_parents(self):
+        first = self._heartbeat('10.0.0.3')
+        self.assertEqual(first, self._heartbeat('10.0.0.3'))
+        self.assertEqual(['10.0.0.3'], self.computed)
+        cache = heartbeat._CACHE
+        self.addCleanup(lambda: [thread.kill() for thread in cache.threads])
+
+        # 10.0.0.3 is the child of 10.0.0.1, it is answered its old parents
+        # until a worker computed the new ones, once
+        self.executor.delete_volume_metadata('vol-1', '10.0.0.1:vol-1')
+        self.assertEqual(first, self._heartbeat('10.0.0.3'))
+        self.assertEqual(first, self._heartbeat('10.0.0.3'))
+        self.assertEqual(1, stats.get('heartbeat.coalesced'))
+        eventlet.sleep(0)
+        self.assertEqual(['10.0.0.3'] * 2, self.computed)
+        self.assertNotEqual(first, self._heartbeat('10.0.0.3'))
+        self.assertEqual(1, stats.get('heartbeat.recomputed'))
+
+        self.executor.evict_host('10.0.0.3')
+        self.assertEqual({}, cache.results)
+        self.assertEqual([], self._heartbeat('10.0.0.3'))
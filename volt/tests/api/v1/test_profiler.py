@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import marshal
+import signal
+import time
+
+import eventlet
+import fixtures
+from oslo.config import cfg
+from paste import urlmap
+import webob
+
+from volt.api import auth
+from volt.api.v1 import profiler as profiler_api
+from volt.api.v1 import router
+from volt.common import wsgi
+from volt.executor import impl_btree
+from volt.tests import base
+
+
+def burn(seconds):
+    deadline = time.time() + seconds
+    while time.time() < deadline:
+        sum(xrange(1000))
+
+
+class TestProfiler(base.TestCase):
+
+    def setUp(self):
+        super(TestProfiler, self).setUp()
+        cfg.CONF([], project='volt')
+        self.addCleanup(cfg.CONF.reset)
+        cfg.CONF.set_override('enable_profiler', True)
+        cfg.CONF.set_override('profiler_sample_interval', 0.001)
+        self.executor = impl_btree.BtreeExecutor()
+        self.useFixture(fixtures.MonkeyPatch(
+            'volt.executor.get_default_executor', lambda: self.executor))
+        rootapp = urlmap.URLMap()
+        rootapp['/v1'] = router.API(wsgi.APIMapper())
+        self.app = auth.UnauthenticatedContextMiddleware(rootapp)
+
+    def _profile(self, query):
+        return webob.Request.blank('/v1/profile?%s' % query).get_response(
+            self.app)
+
+    def test_sample(self):
+        busy = eventlet.spawn_after(0, burn, 0.2)
+        resp = self._profile('duration=0.2')
+        busy.wait()
+        self.assertEqual(200, resp.status_int)
+        self.assertIn(':burn', resp.body)
+        stack, count = resp.body.splitlines()[0].rsplit(' ', 1)
+        self.assertTrue(int(count) > 0)
+        # Nothing is left armed
+        self.assertEqual((0.0, 0.0), signal.getitimer(signal.ITIMER_PROF))
+        self.assertEqual(signal.SIG_DFL, signal.getsignal(signal.SIGPROF))
+
+    def test_cprofile(self):
+        busy = eventlet.spawn_after(0, burn, 0.05)
+        resp = self._profile('mode=cprofile&duration=0.05')
+        busy.wait()
+        self.assertEqual(200, resp.status_int)
+        self.assertIn('function calls', resp.body)
+
+        resp = self._profile('mode=cprofile&format=pstats&duration=0.01')
+        self.assertEqual('application/octet-stream', resp.content_type)
+        self.assertIsInstance(marshal.loads(resp.body), dict)
+
+    def test_refused(self):
+        self.assertEqual(400, self._profile('duration=x').status_int)
+        self.assertEqual(400, self._profile('mode=perf').status_int)
+        self.assertEqual(400, self._profile('format=pstats').status_int)
+        self.useFixture(fixtures.MonkeyPatch(
+            'volt.common.profiler._RUNNING', True))
+        self.assertEqual(409, self._profile('duration=0.01').status_int)
+
+        req = webob.Request.blank('/v1/profile')
+        req.context = type('Context', (object,), {'is_admin': False})()
+        self.assertRaises(webob.exc.HTTPForbidden,
+                          profiler_api.Controller().index, req)
+
+        cfg.CONF.set_override('enable_profiler', False)
+        self.assertEqual(404, self._profile('duration=0.01').status_int)
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import json
+import os
+
+import fixtures
+from oslo.config import cfg
+from paste import urlmap
+import webob
+
+from volt.api import auth
+from volt.api.v1 import router
+from volt.api.v1 import stats as stats_api
+from volt.common import stats
+from volt.common import wsgi
+from volt.executor import impl_btree
+from volt.tests import base
+
+
+class TestStats(base.TestCase):
+
+    def setUp(self):
+        super(TestStats, self).setUp()
+        cfg.CONF([], project='volt')
+        self.addCleanup(cfg.CONF.reset)
+        stats.reset()
+        self.addCleanup(stats.reset)
+        self.executor = impl_btree.BtreeExecutor()
+        self.useFixture(fixtures.MonkeyPatch(
+            'volt.executor.get_default_executor', lambda: self.executor))
+        rootapp = urlmap.URLMap()
+        rootapp['/v1'] = router.API(wsgi.APIMapper())
+        self.app = auth.UnauthenticatedContextMiddleware(rootapp)
+
+    def test_counters_of_the_worker(self):
+        stats.incr('compression.bytes_in', 200)
+        stats.incr('compression.bytes_out', 50)
+        stats.incr('etag.hits')
+        resp = webob.Request.blank('/v1/stats').get_response(self.app)
+        self.assertEqual(200, resp.status_int)
+        self.assertEqual({'pid': os.getpid(), 'scope': 'worker',
+                          'counters': {'compression.bytes_in': 200,
+                                       'compression.bytes_out': 50,
+                                       'etag.hits': 1},
+                          'compression_ratio': 0.25,
+                          'etag_hit_rate': 1.0},
+                         json.loads(resp.body))
+
+    def test_admin_only(self):
+        req = webob.Request.blank('/v1/stats')
+        req.context = type('Context', (object,), {'is_admin': False})()
+        self.assertRaises(webob.exc.HTTPForbidden,
+                          stats_api.Controller().index, req)
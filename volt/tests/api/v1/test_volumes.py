@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import json
+
+import fixtures
+from oslo.config import cfg
+from paste import urlmap
+import webob
+
+from volt.api import auth
+from volt.api.v1 import router
+from volt.common import binary
+from volt.common import wsgi
+from volt.executor import impl_btree
+from volt.tests import base
+
+
+class TestListing(base.TestCase):
+
+    def setUp(self):
+        super(TestListing, self).setUp()
+        cfg.CONF([], project='volt')
+        self.addCleanup(cfg.CONF.reset)
+        self.executor = impl_btree.BtreeExecutor()
+        self.useFixture(fixtures.MonkeyPatch(
+            'volt.executor.get_default_executor', lambda: self.executor))
+        self.useFixture(fixtures.MonkeyPatch('volt.common.wsgi.'
+                                             'STREAM_CHUNK_ITEMS', 2))
+        for index in range(5):
+            host = '10.0.0.%d' % index
+            for volume in range(index + 1):
+                volume_id = 'vol-%d' % volume
+                self.executor.get_volume_parents(volume_id, host=host)
+                self.executor.add_volume_metadata(
+                    volume_id, '%s:%s' % (host, volume_id), host=host,
+                    port=3260, iqn='iqn', lun=1)
+        rootapp = urlmap.URLMap()
+        rootapp['/v1'] = router.API(wsgi.APIMapper())
+        self.app = auth.UnauthenticatedContextMiddleware(rootapp)
+
+    def _list(self, path):
+        req = webob.Request.blank(path)
+        req.environ['REMOTE_ADDR'] = '10.0.0.9'
+        status, headers, app_iter = req.call_application(self.app)
+        self.assertEqual('200 OK', status)
+        self.assertNotIn('Content-Length', dict(headers))
+        return list(app_iter)
+
+    def _pages(self, path, key):
+        items = []
+        marker = ''
+        while True:
+            chunks = self._list('%s&marker=%s' % (path, marker))
+            page = json.loads(''.join(chunks))
+            if not page:
+                return items
+            items.extend(page)
+            marker = page[-1][key]
+
+    def test_pages_list_every_volume_once(self):
+        chunks = self._list('/v1/volumes')
+        self.assertEqual(3, len(chunks))
+        self.assertEqual(sorted(self.executor.get_volumes_list(),
+                                key=lambda volume: volume['id']),
+                         json.loads(''.join(chunks)))
+        self.assertEqual(json.loads(''.join(chunks)),
+                         self._pages('/v1/volumes?limit=2', 'id'))
+
+    def test_filters(self):
+        self.assertEqual([{'id': 'vol-0', 'count': 1},
+                          {'id': 'vol-1', 'count': 1}],
+                         json.loads(''.join(self._list(
+                             '/v1/volumes?host=10.0.0.1'))))
+        self.executor.volumes['vol-4'].nodes['10.0.0.4:vol-4'].status = 'DOWN'
+        self.assertEqual([{'id': 'vol-4', 'count': 1}],
+                         json.loads(''.join(self._list(
+                             '/v1/volumes?status=DOWN'))))
+
+        peers = self._pages('/v1/volumes/vol-2?limit=1&status=OK',
+                            'peer_id')
+        peer_ids = [peer.pop('peer_id') for peer in peers]
+        self.assertEqual(sorted(self.executor.volumes['vol-2'].nodes),
+                         peer_ids)
+        self.assertEqual(sorted(self.executor.get_volumes_detail('vol-2')),
+                         sorted(peers))
+
+    def test_invalid_limit(self):
+        for limit in ('two', '-1'):
+            req = webob.Request.blank('/v1/volumes?limit=%s' % limit)
+            self.assertEqual(400, req.get_response(self.app).status_int)
+
+    def test_binary_listing(self):
+        req = webob.Request.blank('/v1/volumes?limit=3')
+        req.accept = binary.CONTENT_TYPE
+        resp = req.get_response(self.app)
+        self.assertEqual(binary.CONTENT_TYPE, resp.content_type)
+        self.assertEqual(
+            json.loads(''.join(self._list('/v1/volumes?limit=3'))),
+            binary.loads(resp.body))
+
+    def test_invalid_batch_query(self):
+        for volumes in ([['vol-1']], [{'volume_id': {}}], [None],
+                        [{'volume_id': 'vol-1', 'peer_id': 1}]):
+            req = webob.Request.blank('/v1/volumes/query', method='POST')
+            req.environ['REMOTE_ADDR'] = '10.0.0.9'
+            req.content_type = 'application/json'
+            req.body = json.dumps({'volumes': volumes})
+            self.assertEqual(400, req.get_response(self.app).status_int)
+
+    def test_invalid_batch_peers(self):
+        for action in ('register', 'remove'):
+            for peer in ({'volume_id': ['vol-1'], 'peer_id': 'a:vol-1'},
+                         {'volume_id': 'vol-1', 'peer_id': {}}):
+                req = webob.Request.blank('/v1/volumes/%s' % action,
+                                          method='POST')
+                req.content_type = 'application/json'
+                req.body = json.dumps({'peers': [peer]})
+                self.assertEqual(400, req.get_response(self.app).status_int)
+
+    def test_default_page_size(self):
+        cfg.CONF.set_override('api_limit_max', 2)
+        list_ids = lambda url: [volume['id'] for volume in
+                                json.loads(''.join(self._list(url)))]
+        # A listing without pagination is complete
+        ids = list_ids('/v1/volumes')
+        self.assertEqual(sorted(self.executor.volumes), ids)
+        self.assertTrue(len(ids) > 3)
+        self.assertEqual(ids[1:3], list_ids('/v1/volumes?marker=%s' % ids[0]))
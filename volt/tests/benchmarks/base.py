@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""
+Helpers shared by the micro benchmarks in this package.
+
+The benchmarks are plain scripts, they are not collected by the test runner
+and are meant to be run by hand, e.g.::
+
+    python -m volt.tests.benchmarks.bench_executor
+"""
+
+from __future__ import print_function
+
+import timeit
+
+
+class _Manager(object):
+    """Stands for the stevedore manager of volt.executor.EXECUTOR."""
+
+    def __init__(self, driver):
+        self.driver = driver
+
+
+def api_app(volt_executor=None):
+    """
+    Return the v1 API behind the unauthenticated context middleware, served
+    by volt_executor (a fresh BtreeExecutor by default) without loading the
+    executor entry points.
+    """
+    from volt.api import auth
+    from volt.api.v1 import router
+    from volt.common import wsgi
+    from volt import executor
+    from volt.executor import impl_btree
+
+    executor.EXECUTOR = _Manager(volt_executor or impl_btree.BtreeExecutor())
+    return auth.UnauthenticatedContextMiddleware(
+        router.API(wsgi.APIMapper()))
+
+
+def measure(func, number=1000, repeat=3):
+    """Return the best time in microseconds of one call of func."""
+    timer = timeit.Timer(func)
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1e6
+
+
+def percentile(samples, fraction):
+    """Return the given fraction (0..1) percentile of a list of samples."""
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def report(title, rows):
+    """Print a table of (name, microseconds per operation) rows."""
+    print(title)
+    print('-' * len(title))
+    for name, usec in rows:
+        ops = 1e6 / usec if usec else float('inf')
+        print('%-40s %12.2f us/op %12.0f ops/s' % (name, usec, ops))
+    print('')
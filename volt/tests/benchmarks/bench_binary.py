@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""
+Compare the size and the encoding time of the JSON and the binary encoding
+of heartbeat, query and listing responses.
+
+    python -m volt.tests.benchmarks.bench_binary [hosts] [volumes]
+"""
+
+from __future__ import print_function
+
+import sys
+
+from volt.common import binary
+from volt.common import wsgi
+from volt.executor import impl_btree
+from volt.tests.benchmarks import base
+from volt.tests.benchmarks import bench_executor
+
+
+def main():
+    hosts = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    volumes = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    volt_executor = impl_btree.BtreeExecutor()
+    bench_executor.populate(volt_executor, hosts, volumes)
+    host = bench_executor.host_name(hosts - 1)
+    serializer = wsgi.JSONResponseSerializer()
+
+    results = (
+        ('heartbeat', volt_executor.update_status(host=host)),
+        ('query', volt_executor.get_volume_parents('volume-0', host=host)),
+        ('100 peers', list(volt_executor.iter_volume_peers('volume-0',
+                                                           limit=100))),
+    )
+    rows = []
+    sizes = []
+    for name, result in results:
+        json_body = serializer.to_json(result)
+        binary_body = binary.dumps(result)
+        sizes.append((name, len(json_body), len(binary_body)))
+        rows.append(('%s, JSON' % name,
+                     base.measure(lambda: serializer.to_json(result),
+                                  number=2000)))
+        rows.append(('%s, binary' % name,
+                     base.measure(lambda: binary.dumps(result),
+                                  number=2000)))
+    base.report('Encoding for a host in %d trees of %d hosts' %
+                (volumes, hosts), rows)
+
+    print('Response bytes')
+    print('--------------')
+    for name, json_size, binary_size in sizes:
+        print('%-20s JSON %8d   binary %8d   %5.1f%%' %
+              (name, json_size, binary_size, 100.0 * binary_size / json_size))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""
+Measure the size and the time of compressing a heartbeat response of a
+host in many trees and a listing of the peers of a volume, per level.
+
+    python -m volt.tests.benchmarks.bench_compression [hosts] [volumes]
+"""
+
+from __future__ import print_function
+
+import sys
+
+from oslo.config import cfg
+import webob
+
+from volt.api import compression
+from volt.common import wsgi
+from volt.executor import impl_btree
+from volt.tests.benchmarks import base
+from volt.tests.benchmarks import bench_executor
+
+
+def main():
+    hosts = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    volumes = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    cfg.CONF([], project='volt')
+    volt_executor = impl_btree.BtreeExecutor()
+    bench_executor.populate(volt_executor, hosts, volumes)
+    serializer = wsgi.JSONResponseSerializer()
+    bodies = (
+        ('heartbeat', serializer.to_json(volt_executor.update_status(
+            host=bench_executor.host_name(hosts - 1)))),
+        ('listing', ''.join(serializer.iter_json(
+            volt_executor.iter_volume_peers('volume-0')))),
+    )
+
+    rows = []
+    sizes = []
+    for name, body in bodies:
+        def app(environ, start_response):
+            start_response('200 OK', [('Content-Length', str(len(body)))])
+            return [body]
+
+        middleware = compression.CompressionMiddleware(app)
+
+        def request(accept_encoding):
+            req = webob.Request.blank('/')
+            if accept_encoding:
+                req.headers['Accept-Encoding'] = accept_encoding
+            return lambda: ''.join(req.call_application(middleware)[2])
+
+        rows.append(('%s, uncompressed' % name,
+                     base.measure(request(None), number=20)))
+        for level in (1, 6, 9):
+            cfg.CONF.set_override('compression_level', level)
+            sizes.append((name, level, len(body), len(request('gzip')())))
+            rows.append(('%s, gzip level %d' % (name, level),
+                         base.measure(request('gzip'), number=20)))
+    base.report('Compression (%d hosts, %d volumes)' % (hosts, volumes),
+                rows)
+
+    print('Response bytes')
+    print('--------------')
+    for name, level, size, compressed in sizes:
+        print('%-10s level %d %9d -> %8d   %5.1f%%' %
+              (name, level, size, compressed, 100.0 * compressed / size))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""
+Compare the cost of polling queries and volume peers with and without the
+ETag of the previous response, through the pipeline and FastPathMiddleware.
+
+    python -m volt.tests.benchmarks.bench_conditional [hosts]
+"""
+
+from __future__ import print_function
+
+import itertools
+import sys
+
+from oslo.config import cfg
+
+from volt.api import fastpath
+from volt.executor import impl_btree
+from volt.tests.benchmarks import base
+from volt.tests.benchmarks import bench_fastpath
+
+
+def main():
+    hosts = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    cfg.CONF([], project='volt')
+    volt_executor = impl_btree.BtreeExecutor()
+    bench_fastpath.populate(volt_executor, hosts)
+    pipeline = base.api_app(volt_executor)
+    apps = (('pipeline', pipeline),
+            ('fastpath', fastpath.FastPathMiddleware(pipeline)))
+
+    rows = []
+    for method, path in (('GET', '/volumes/query/volume-0'),
+                         ('HEAD', '/volumes/volume-0')):
+        for name, app in apps:
+            etags = {}
+
+            def call(conditional):
+                index = next(placed)
+                environ = {'REQUEST_METHOD': method, 'SCRIPT_NAME': '/v1',
+                           'PATH_INFO': path, 'QUERY_STRING': '',
+                           'SERVER_NAME': 'localhost', 'SERVER_PORT': '9191',
+                           'REMOTE_ADDR': '10.0.%d.%d' % (index >> 8,
+                                                          index & 255),
+                           'wsgi.url_scheme': 'http'}
+                if conditional and index in etags:
+                    environ['HTTP_IF_NONE_MATCH'] = etags[index]
+
+                def start_response(status, headers, exc_info=None):
+                    etags[index] = dict(headers).get('ETag')
+                ''.join(app(environ, start_response))
+
+            for conditional in (False, True):
+                placed = itertools.cycle(range(hosts))
+                label = 'If-None-Match' if conditional else 'unconditional'
+                rows.append(('%-8s %-4s %s' % (name, method, label),
+                             base.measure(lambda: call(conditional),
+                                          number=2000)))
+    base.report('Cost per poll with %d placed hosts' % hosts, rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""
+Measure the cost of the request context built for every API request, with
+an Enforcer per context and with the enforcer shared by the process, and
+behind authtoken with and without the token cache.
+
+    python -m volt.tests.benchmarks.bench_context
+"""
+
+from __future__ import print_function
+
+import json
+import os
+import shutil
+import tempfile
+
+from oslo.config import cfg
+
+import webob
+
+from volt.api import auth
+from volt.api import token_cache
+from volt.common import context
+from volt.common import policy
+from volt.tests.benchmarks import base
+
+
+def catalog(regions):
+    """A service catalog of keystone, nova, glance and volt per region"""
+    return [{'type': service, 'name': service,
+             'endpoints': [{'region': 'region-%d' % region,
+                            'publicURL': 'http://%s-%d:8080/v1' % (service,
+                                                                   region),
+                            'internalURL': 'http://%s-%d:8080/v1' % (
+                                service, region)}
+                           for region in range(regions)]}
+            for service in ('identity', 'compute', 'image', 'volt')]
+
+
+def keystone_request():
+    req = webob.Request.blank('/v1/members/heartbeat', method='PUT')
+    req.headers.update({
+        'X-Identity-Status': 'Confirmed',
+        'X-Auth-Token': 'a' * 32,
+        'X-User-Id': 'nova',
+        'X-Tenant-Id': 'service',
+        'X-Roles': 'admin,_member_',
+        'X-Service-Catalog': json.dumps(catalog(3)),
+    })
+    return req
+
+
+def main():
+    tempdir = tempfile.mkdtemp()
+    try:
+        policy_file = os.path.join(tempdir, 'policy.json')
+        with open(policy_file, 'w') as f:
+            f.write(json.dumps({'context_is_admin': 'role:admin',
+                                'default': ''}))
+        cfg.CONF([], project='volt')
+        cfg.CONF.set_override('policy_file', policy_file)
+        cfg.CONF.set_override('policy_reload_interval', 0)
+        middleware = auth.ContextMiddleware(None)
+        req = keystone_request()
+
+        def parsed():
+            token_cache.get_cache().clear()
+            middleware.process_request(req)
+
+        rows = [
+            ('unauthenticated, Enforcer per context',
+             base.measure(lambda: context.RequestContext(
+                 is_admin=True, policy_enforcer=policy.Enforcer()))),
+            ('unauthenticated, shared enforcer',
+             base.measure(lambda: context.RequestContext(is_admin=True),
+                          number=10000)),
+            ('member, shared enforcer',
+             base.measure(lambda: context.RequestContext(roles=['member']),
+                          number=10000)),
+            ('keystone headers, parsed',
+             base.measure(parsed, number=10000)),
+            ('keystone headers, cached token',
+             base.measure(lambda: middleware.process_request(req),
+                          number=10000)),
+        ]
+        base.report('Request context creation', rows)
+    finally:
+        shutil.rmtree(tempdir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""
+Compare encoding the responses of queries and heartbeats with
+jsonutils.dumps and with the cached identities of the tree nodes.
+
+    python -m volt.tests.benchmarks.bench_encoding [hosts] [volumes]
+"""
+
+from __future__ import print_function
+
+import sys
+
+from volt.common import wsgi
+from volt.executor import impl_btree
+from volt.openstack.common import jsonutils
+from volt.tests.benchmarks import base
+from volt.tests.benchmarks import bench_executor
+
+
+def main():
+    hosts = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    volumes = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    volt_executor = impl_btree.BtreeExecutor()
+    bench_executor.populate(volt_executor, hosts, volumes)
+    host = bench_executor.host_name(hosts - 1)
+    serializer = wsgi.JSONResponseSerializer()
+    node = volt_executor.volumes['volume-0'].nodes['%s:volume-0' % host]
+
+    def rebuild_identity():
+        node._identity = None
+        return node.identity()
+
+    rows = [('identity(), rebuilt', base.measure(rebuild_identity,
+                                                 number=10000)),
+            ('identity(), cached', base.measure(node.identity,
+                                                number=10000))]
+    results = (('query', volt_executor.get_volume_parents('volume-0',
+                                                          host=host)),
+               ('heartbeat', volt_executor.update_status(host=host)))
+    for name, result in results:
+        rows.append(('%s, jsonutils.dumps' % name,
+                     base.measure(lambda: jsonutils.dumps(
+                         result, default=serializer._sanitizer),
+                         number=10000)))
+        rows.append(('%s, joined identities' % name,
+                     base.measure(lambda: serializer.to_json(result),
+                                  number=10000)))
+    base.report('Encoding for a host in %d trees of %d hosts' %
+                (volumes, hosts), rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""
+Measure what the stream of topology events adds to the cost of a
+re-registration, without a stream, without subscribers and with a
+subscriber which never reads and drops batches.
+
+    python -m volt.tests.benchmarks.bench_events [hosts]
+"""
+
+from __future__ import print_function
+
+import itertools
+import sys
+
+from oslo.config import cfg
+
+from volt.executor import events
+from volt.executor import impl_btree
+from volt.tests.benchmarks import base
+from volt.tests.benchmarks import bench_executor
+
+
+def main():
+    hosts = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    cfg.CONF([], project='volt')
+    rows = []
+    for name in ('no stream', 'stream, no subscriber',
+                 'stream, slow subscriber'):
+        volt_executor = impl_btree.BtreeExecutor()
+        bench_executor.populate(volt_executor, hosts, 1)
+        if name != 'no stream':
+            stream = events.EventStream(cfg.CONF.event_batch_size)
+            volt_executor.add_listener(stream)
+            volt_executor.add_topology_listener(stream)
+            if name == 'stream, slow subscriber':
+                stream.subscribe()
+        ports = itertools.count(3261)
+        placed = itertools.cycle(range(hosts))
+
+        def register():
+            host = bench_executor.host_name(next(placed))
+            volt_executor.add_volume_metadata('volume-0',
+                                              '%s:volume-0' % host,
+                                              host=host, port=next(ports),
+                                              iqn='iqn', lun=1)
+        rows.append(('register, %s' % name,
+                     base.measure(register, number=5000)))
+    base.report('Re-registering one of %d peers' % hosts, rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""
+Compare the in-memory BtreeExecutor with the durable SqliteExecutor.
+
+Every operation is followed by executor.flush(), like a request cycle of the
+API controllers.
+
+    python -m volt.tests.benchmarks.bench_executor [hosts] [volumes]
+"""
+
+from __future__ import print_function
+
+import itertools
+import os
+import shutil
+import sys
+import tempfile
+
+from volt.executor import impl_btree
+from volt.executor import impl_sqlite
+from volt.tests.benchmarks import base
+
+
+def host_name(index):
+    return '10.%d.%d.%d' % (index >> 16 & 255, index >> 8 & 255, index & 255)
+
+
+def populate(executor, hosts, volumes):
+    for volume in range(volumes):
+        volume_id = 'volume-%d' % volume
+        for index in range(hosts):
+            host = host_name(index)
+            executor.get_volume_parents(volume_id, host=host)
+            executor.add_volume_metadata(volume_id,
+                                         '%s:%s' % (host, volume_id),
+                                         host=host, port=3260,
+                                         iqn='iqn.2014-01.%s' % host, lun=1)
+    executor.flush()
+
+
+def run(executor, hosts, volumes):
+    populate(executor, hosts, volumes)
+    joining = itertools.count(hosts)
+    placed = itertools.cycle(range(hosts))
+
+    def cycle(func):
+        def wrapper():
+            func()
+            executor.flush()
+        return wrapper
+
+    def join():
+        executor.get_volume_parents('volume-0',
+                                    host=host_name(next(joining)))
+
+    def query():
+        executor.get_volume_parents('volume-0',
+                                    host=host_name(next(placed)))
+
+    def heartbeat():
+        executor.update_status(host=host_name(next(placed)))
+
+    return [
+        ('join (new peer)', base.measure(cycle(join), number=200)),
+        ('query (placed peer)', base.measure(cycle(query), number=500)),
+        ('heartbeat', base.measure(cycle(heartbeat), number=500)),
+        ('GET /volumes', base.measure(cycle(executor.get_volumes_list),
+                                      number=50)),
+        ('HEAD /volumes/<id>',
+         base.measure(cycle(lambda: executor.get_volumes_detail('volume-0')),
+                      number=50)),
+    ]
+
+
+def main(argv):
+    hosts = int(argv[1]) if len(argv) > 1 else 500
+    volumes = int(argv[2]) if len(argv) > 2 else 4
+    tempdir = tempfile.mkdtemp()
+    try:
+        base.report('BtreeExecutor (%d hosts, %d volumes)' % (hosts, volumes),
+                    run(impl_btree.BtreeExecutor(), hosts, volumes))
+        executor = impl_sqlite.SqliteExecutor(
+            db_path=os.path.join(tempdir, 'executor.sqlite'))
+        base.report('SqliteExecutor (%d hosts, %d volumes)' % (hosts, volumes),
+                    run(executor, hosts, volumes))
+    finally:
+        shutil.rmtree(tempdir)
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""
+Compare the CPU cost of heartbeats and queries through the context
+middleware and the v1 router with the cost through FastPathMiddleware.
+
+    python -m volt.tests.benchmarks.bench_fastpath [hosts]
+"""
+
+from __future__ import print_function
+
+import itertools
+import sys
+
+from oslo.config import cfg
+
+from volt.api import fastpath
+from volt.executor import impl_btree
+from volt.tests.benchmarks import base
+
+
+def start_response(status, headers, exc_info=None):
+    pass
+
+
+def populate(volt_executor, hosts):
+    for index in range(hosts):
+        host = '10.0.%d.%d' % (index >> 8, index & 255)
+        volt_executor.get_volume_parents('volume-0', host=host)
+        volt_executor.add_volume_metadata('volume-0',
+                                          '%s:volume-0' % host, host=host,
+                                          port=3260, iqn='iqn.%s' % host,
+                                          lun=1)
+
+
+def main():
+    hosts = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    cfg.CONF([], project='volt')
+    volt_executor = impl_btree.BtreeExecutor()
+    populate(volt_executor, hosts)
+    pipeline = base.api_app(volt_executor)
+    apps = (('pipeline', pipeline),
+            ('fastpath', fastpath.FastPathMiddleware(pipeline)))
+
+    requests = (('PUT', '/members/heartbeat'),
+                ('GET', '/volumes/query/volume-0'))
+    rows = []
+    for method, path in requests:
+        for name, app in apps:
+            placed = itertools.cycle(range(hosts))
+
+            def call():
+                index = next(placed)
+                environ = {'REQUEST_METHOD': method, 'SCRIPT_NAME': '/v1',
+                           'PATH_INFO': path, 'QUERY_STRING': '',
+                           'SERVER_NAME': 'localhost', 'SERVER_PORT': '9191',
+                           'REMOTE_ADDR': '10.0.%d.%d' % (index >> 8,
+                                                          index & 255),
+                           'wsgi.url_scheme': 'http'}
+                ''.join(app(environ, start_response))
+            rows.append(('%-8s %s %s' % (name, method, path),
+                         base.measure(call, number=2000)))
+    base.report('Cost per request with %d placed hosts' % hosts, rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""
+Compare the cost of a heartbeat with and without async_heartbeat, as the
+trees grow.
+
+    python -m volt.tests.benchmarks.bench_heartbeat [volumes]
+"""
+
+from __future__ import print_function
+
+import itertools
+import sys
+
+from oslo.config import cfg
+
+from volt.api import heartbeat
+from volt.executor import impl_btree
+from volt.tests.benchmarks import base
+from volt.tests.benchmarks import bench_executor
+
+
+def main():
+    volumes = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    cfg.CONF([], project='volt')
+    rows = []
+    for hosts in (10, 100, 500):
+        volt_executor = impl_btree.BtreeExecutor()
+        bench_executor.populate(volt_executor, hosts, volumes)
+        for mode in (False, True):
+            cfg.CONF.set_override('async_heartbeat', mode)
+            heartbeat._CACHE = None
+            placed = itertools.cycle(range(hosts))
+
+            def call():
+                heartbeat.heartbeat(volt_executor,
+                                    bench_executor.host_name(next(placed)))
+
+            label = 'async' if mode else 'sync'
+            rows.append(('%-5s %4d hosts' % (label, hosts),
+                         base.measure(call, number=500)))
+    base.report('Cost per heartbeat of a host in %d trees' % volumes, rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""
+Heartbeats over a new connection per request compared with keep-alive
+connections, against an in-process eventlet server.
+
+    python -m volt.tests.benchmarks.bench_keepalive [clients] [requests]
+"""
+
+from __future__ import print_function
+
+import eventlet
+eventlet.monkey_patch(socket=True, select=True, time=True)
+
+import httplib
+import os
+import sys
+import time
+
+import eventlet.wsgi
+from oslo.config import cfg
+
+from volt.common import wsgi
+from volt.tests.benchmarks import base
+
+
+def serve(keepalive):
+    sock = eventlet.listen(('127.0.0.1', 0))
+    app = base.api_app()
+    thread = eventlet.spawn(eventlet.wsgi.server, sock, app,
+                            protocol=wsgi.HttpProtocol, keepalive=keepalive,
+                            log=open(os.devnull, 'w'))
+    return thread, sock.getsockname()[1]
+
+
+def client(port, requests, reuse, latencies):
+    conn = None
+    for index in range(requests):
+        start = time.time()
+        if conn is None:
+            conn = httplib.HTTPConnection('127.0.0.1', port)
+        conn.request('PUT', '/members/heartbeat')
+        conn.getresponse().read()
+        if not reuse:
+            conn.close()
+            conn = None
+        latencies.append(time.time() - start)
+    if conn is not None:
+        conn.close()
+
+
+def run(clients, requests, keepalive):
+    thread, port = serve(keepalive)
+    latencies = []
+    pool = eventlet.GreenPool(clients)
+    start = time.time()
+    for index in range(clients):
+        pool.spawn(client, port, requests // clients, keepalive, latencies)
+    pool.waitall()
+    elapsed = time.time() - start
+    thread.kill()
+    return len(latencies) / elapsed, latencies
+
+
+def main(argv):
+    clients = int(argv[1]) if len(argv) > 1 else 20
+    requests = int(argv[2]) if len(argv) > 2 else 4000
+    cfg.CONF([], project='volt')
+    title = ('PUT /members/heartbeat (%d clients, %d requests)' %
+             (clients, requests))
+    print(title)
+    print('-' * len(title))
+    for name, keepalive in (('connection per request', False),
+                            ('keep-alive', True)):
+        rps, latencies = run(clients, requests, keepalive)
+        print('%-24s %8.0f req/s  p50 %7.2f ms  p99 %7.2f ms' %
+              (name, rps, base.percentile(latencies, 0.5) * 1e3,
+               base.percentile(latencies, 0.99) * 1e3))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""
+Compare encoding the peers of a volume in one jsonutils.dumps call with
+streaming them, until the first chunk and in full, and with one page.
+
+    python -m volt.tests.benchmarks.bench_listing [hosts]
+"""
+
+from __future__ import print_function
+
+import sys
+
+from volt.common import wsgi
+from volt.executor import impl_btree
+from volt.openstack.common import jsonutils
+from volt.tests.benchmarks import base
+from volt.tests.benchmarks import bench_executor
+
+
+def main():
+    hosts = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    volt_executor = impl_btree.BtreeExecutor()
+    bench_executor.populate(volt_executor, hosts, 1)
+    serializer = wsgi.JSONResponseSerializer()
+
+    def dumps():
+        return jsonutils.dumps(volt_executor.get_volumes_detail('volume-0'))
+
+    def first_chunk():
+        chunks = serializer.iter_json(
+            volt_executor.iter_volume_peers('volume-0'))
+        return next(chunks)
+
+    def streamed():
+        return list(serializer.iter_json(
+            volt_executor.iter_volume_peers('volume-0')))
+
+    def page():
+        return list(serializer.iter_json(
+            volt_executor.iter_volume_peers('volume-0',
+                                            marker=bench_executor.host_name(
+                                                hosts // 2),
+                                            limit=100)))
+
+    rows = [('whole list, jsonutils.dumps', base.measure(dumps, number=5)),
+            ('streamed, first chunk', base.measure(first_chunk, number=5)),
+            ('streamed, whole list', base.measure(streamed, number=5)),
+            ('page of 100 after a marker', base.measure(page, number=5))]
+    base.report('Listing the %d peers of a volume' % hosts, rows)
+
+
+if __name__ == '__main__':
+    main()
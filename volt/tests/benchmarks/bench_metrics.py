@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""
+Measure the overhead of recording the metrics: MetricsMiddleware in front
+of FastPathMiddleware, the timing of the executor calls and the export of
+/metrics.
+
+    python -m volt.tests.benchmarks.bench_metrics [hosts]
+"""
+
+from __future__ import print_function
+
+import itertools
+import sys
+
+from oslo.config import cfg
+
+from volt.api import fastpath
+from volt.api import metrics as metrics_api
+from volt.common import metrics
+from volt.executor import impl_btree
+from volt.tests.benchmarks import base
+from volt.tests.benchmarks import bench_fastpath
+
+
+def main():
+    hosts = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    cfg.CONF([], project='volt')
+    rows = []
+    for instrumented in (False, True):
+        volt_executor = impl_btree.BtreeExecutor()
+        bench_fastpath.populate(volt_executor, hosts)
+        if instrumented:
+            metrics.instrument(volt_executor)
+        app = fastpath.FastPathMiddleware(base.api_app(volt_executor))
+        if instrumented:
+            app = metrics_api.MetricsMiddleware(app)
+        label = 'metrics' if instrumented else 'plain'
+
+        for method, path in (('PUT', '/members/heartbeat'),
+                             ('GET', '/volumes/query/volume-0')):
+            placed = itertools.cycle(range(hosts))
+
+            def call():
+                index = next(placed)
+                environ = {'REQUEST_METHOD': method, 'SCRIPT_NAME': '/v1',
+                           'PATH_INFO': path, 'QUERY_STRING': '',
+                           'SERVER_NAME': 'localhost', 'SERVER_PORT': '9191',
+                           'REMOTE_ADDR': '10.0.%d.%d' % (index >> 8,
+                                                          index & 255),
+                           'wsgi.url_scheme': 'http'}
+                ''.join(app(environ, lambda status, headers: None))
+
+            rows.append(('%-7s %-4s %s' % (label, method, path),
+                         base.measure(call, number=2000)))
+
+    histogram = metrics.Histogram()
+    rows.append(('Histogram.observe',
+                 base.measure(lambda: histogram.observe(0.00042),
+                              number=100000)))
+    rows.append(('export of %d series' % (len(metrics.LATENCIES) +
+                                          len(metrics.CALLS)),
+                 base.measure(metrics.export, number=100)))
+    base.report('Cost per request with %d placed hosts' % hosts, rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""
+Measure policy enforcement by evaluating the parsed rule trees, as before
+the rules were compiled, and through the compiled rules and their cached
+decisions.
+
+    python -m volt.tests.benchmarks.bench_policy
+"""
+
+from __future__ import print_function
+
+import json
+
+from oslo.config import cfg
+
+from volt.common import context
+from volt.common import policy
+from volt.openstack.common import policy as openstack_policy
+from volt.tests.benchmarks import base
+
+
+RULES = {
+    'context_is_admin': 'role:admin',
+    'admin_or_member': 'rule:context_is_admin or role:member',
+    'get_volumes': 'rule:admin_or_member and not role:banned',
+    'delete_volume': 'rule:context_is_admin or tenant:%(tenant)s',
+    'default': 'rule:admin_or_member',
+}
+
+
+class RuleTrees(object):
+    """Evaluates the parsed rule trees, as policy.check did before"""
+
+    rules = None
+
+    def decide(self, name, target, creds):
+        try:
+            return policy._rules[name](target, creds, policy._CURRENT_RULES)
+        except KeyError:
+            return False
+
+    def is_memoizable(self, name):
+        # check_is_admin always passed the whole context as the target
+        return False
+
+
+def main():
+    cfg.CONF([], project='volt')
+    enforcer = policy.get_enforcer()
+    policy.set_rules(openstack_policy.Rules.load_json(json.dumps(RULES),
+                                                      'default'))
+    ctx = context.RequestContext(user='bob', tenant='t1',
+                                 roles=['member', 'reader'],
+                                 policy_enforcer=enforcer)
+    target = {'tenant': 't1'}
+    compiled = policy._get_compiled()
+    trees = RuleTrees()
+
+    def uncached(action):
+        def func():
+            compiled.decisions.clear()
+            enforcer.enforce(ctx, action, target)
+        return func
+
+    rows = []
+    for action in ('get_volumes', 'delete_volume', 'context_is_admin'):
+        if action == 'context_is_admin':
+            func = lambda: enforcer.check_is_admin(ctx)
+        else:
+            func = lambda: enforcer.enforce(ctx, action, target)
+        policy._compiled = trees
+        trees.rules = policy._rules
+        rows.append(('%s, rule tree' % action,
+                     base.measure(func, number=10000)))
+        policy._compiled = compiled
+        if compiled.compiled[action][2]:
+            rows.append(('%s, compiled' % action,
+                         base.measure(uncached(action), number=10000)))
+            rows.append(('%s, compiled and cached' % action,
+                         base.measure(func, number=10000)))
+        else:
+            rows.append(('%s, compiled' % action,
+                         base.measure(func, number=10000)))
+    base.report('Policy enforcement', rows)
+
+
+if __name__ == '__main__':
+    main()
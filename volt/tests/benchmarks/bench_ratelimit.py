@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""
+Measure the cost RateLimitMiddleware adds to a heartbeat served by
+FastPathMiddleware, and the cost of rejecting one.
+
+    python -m volt.tests.benchmarks.bench_ratelimit [hosts]
+"""
+
+from __future__ import print_function
+
+import itertools
+import sys
+
+from oslo.config import cfg
+
+from volt.api import fastpath
+from volt.api import ratelimit
+from volt.executor import impl_btree
+from volt.tests.benchmarks import base
+from volt.tests.benchmarks import bench_fastpath
+
+
+def main():
+    hosts = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    cfg.CONF([], project='volt')
+    volt_executor = impl_btree.BtreeExecutor()
+    bench_fastpath.populate(volt_executor, hosts)
+    fast = fastpath.FastPathMiddleware(base.api_app(volt_executor))
+    cfg.CONF.set_override('rate_limit_per_second', 1e9)
+    limited = ratelimit.RateLimitMiddleware(fast)
+    cfg.CONF.set_override('rate_limit_per_second', 1e-9)
+    cfg.CONF.set_override('rate_limit_burst', 1)
+    rejecting = ratelimit.RateLimitMiddleware(fast)
+
+    def start_response(status, headers, exc_info=None):
+        pass
+
+    rows = []
+    for name, app in (('fastpath', fast), ('ratelimit + fastpath', limited),
+                      ('rejected', rejecting)):
+        placed = itertools.cycle(range(hosts))
+
+        def call():
+            index = next(placed)
+            environ = {'REQUEST_METHOD': 'PUT', 'SCRIPT_NAME': '/v1',
+                       'PATH_INFO': '/members/heartbeat',
+                       'QUERY_STRING': '', 'SERVER_NAME': 'localhost',
+                       'SERVER_PORT': '9191',
+                       'REMOTE_ADDR': '10.0.%d.%d' % (index >> 8,
+                                                      index & 255),
+                       'wsgi.url_scheme': 'http'}
+            ''.join(app(environ, start_response))
+
+        rows.append((name, base.measure(call, number=2000)))
+    base.report('Cost per heartbeat with %d placed hosts' % hosts, rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""
+Measure the per-request routing cost of the v1 API, through RoutesMiddleware
+and through the compiled route table of wsgi.Router.
+
+The routes of volt.api.v1.router are connected to an application which does
+nothing, so only the routing is measured.
+
+    python -m volt.tests.benchmarks.bench_routing
+"""
+
+from __future__ import print_function
+
+from oslo.config import cfg
+import webob.dec
+
+from volt.api.v1 import router
+from volt.common import wsgi
+from volt.tests.benchmarks import base
+
+
+REQUESTS = [
+    ('PUT', '/members/heartbeat'),
+    ('GET', '/volumes/query/vol-1'),
+    ('POST', '/volumes/vol-1/peer-1'),
+    ('DELETE', '/volumes/vol-1/peer-1'),
+    ('GET', '/replication/journal'),
+]
+
+
+def null_app(environ, start_response):
+    start_response('200 OK', [])
+    return []
+
+
+def start_response(status, headers, exc_info=None):
+    pass
+
+
+def v1_router():
+    """Return a Router with the routes of the v1 API and null_app."""
+    base.api_app()
+    mapper = wsgi.APIMapper()
+    for route in router.API(wsgi.APIMapper()).map.matchlist:
+        if route.routepath and not route.static:
+            mapper.connect(route.routepath, controller=null_app,
+                           action=route.defaults['action'],
+                           conditions=route.conditions)
+    return wsgi.Router(mapper)
+
+
+def main():
+    cfg.CONF([], project='volt')
+    api = v1_router()
+    # The routing of the Router before the table was compiled
+    legacy = webob.dec.wsgify(lambda req: api._router)
+
+    rows = []
+    for method, path in REQUESTS:
+        environ = {'REQUEST_METHOD': method, 'PATH_INFO': path,
+                   'SCRIPT_NAME': '', 'QUERY_STRING': '',
+                   'SERVER_NAME': 'localhost', 'SERVER_PORT': '9191',
+                   'wsgi.url_scheme': 'http'}
+        for name, app in (('routes', legacy), ('compiled', api)):
+            rows.append(('%-8s %s %s' % (name, method, path),
+                         base.measure(lambda: app(environ.copy(),
+                                                  start_response),
+                                      number=5000)))
+    base.report('Routing cost per request', rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""
+Compare the cost per host of a heartbeat received over UDP, in batches of
+udp_heartbeat_batch_size datagrams, with PUT /v1/members/heartbeat served
+by FastPathMiddleware.
+
+    python -m volt.tests.benchmarks.bench_udp_heartbeat [hosts]
+"""
+
+from __future__ import print_function
+
+import itertools
+import sys
+
+from oslo.config import cfg
+
+from volt.api import fastpath
+from volt.common import udp_heartbeat
+from volt.common import wsgi  # noqa
+from volt.executor import impl_btree
+from volt.tests.benchmarks import base
+from volt.tests.benchmarks import bench_executor
+
+
+def main():
+    hosts = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    cfg.CONF([], project='volt')
+    volt_executor = impl_btree.BtreeExecutor()
+    bench_executor.populate(volt_executor, hosts, 1)
+    names = [bench_executor.host_name(index) for index in range(hosts)]
+    app = fastpath.FastPathMiddleware(base.api_app(volt_executor))
+    placed = itertools.cycle(names)
+
+    def http():
+        environ = {'REQUEST_METHOD': 'PUT', 'SCRIPT_NAME': '/v1',
+                   'PATH_INFO': '/members/heartbeat', 'QUERY_STRING': '',
+                   'SERVER_NAME': 'localhost', 'SERVER_PORT': '9191',
+                   'REMOTE_ADDR': next(placed), 'wsgi.url_scheme': 'http'}
+        ''.join(app(environ, lambda status, headers, exc_info=None: None))
+
+    listener = udp_heartbeat.UDPHeartbeatListener(None, volt_executor, 'key')
+    batch_size = listener.batch_size
+    clock = itertools.count(10 ** 12)
+
+    def udp():
+        now = next(clock)
+        batch = [(udp_heartbeat.pack('key', host, now), host)
+                 for host in itertools.islice(placed, batch_size)]
+        listener.process(batch, now=now)
+
+    base.report('Cost per heartbeat with %d hosts' % hosts, [
+        ('HTTP through fastpath', base.measure(http, number=2000)),
+        ('UDP, packed and processed', base.measure(udp, number=20) /
+         batch_size),
+    ])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""
+Measure the cost of parked watchers: parking one, a heartbeat and a
+removal of a peer while every host of the tree is watching, compared with
+a removal nobody watches.
+
+    python -m volt.tests.benchmarks.bench_watch [hosts]
+"""
+
+from __future__ import print_function
+
+import sys
+import time
+
+import eventlet
+
+from volt.api import watch
+from volt.executor import impl_btree
+from volt.tests.benchmarks import base
+from volt.tests.benchmarks import bench_executor
+
+
+def main():
+    hosts = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    volt_executor = impl_btree.BtreeExecutor()
+    bench_executor.populate(volt_executor, hosts, 1)
+    registry = watch.get_registry(volt_executor)
+
+    start = time.time()
+    watchers = [eventlet.spawn(registry.watch,
+                               bench_executor.host_name(index), None, 3600)
+                for index in range(hosts)]
+    eventlet.sleep(0)
+    park = (time.time() - start) / hosts * 1e6
+
+    host = bench_executor.host_name(hosts // 2)
+    heartbeat = base.measure(lambda: volt_executor.update_status(host=host),
+                             number=1000)
+
+    # Remove a peer with children, which wakes the watchers of its children
+    peer_id = bench_executor.host_name(1) + ':volume-0'
+    start = time.time()
+    volt_executor.delete_volume_metadata('volume-0', peer_id)
+    eventlet.sleep(0)
+    remove = (time.time() - start) * 1e6
+    woken = len([watcher for watcher in watchers if watcher.dead])
+
+    # The same removal without watchers
+    volt_executor.topology_listeners = []
+    peer_id = bench_executor.host_name(2) + ':volume-0'
+    start = time.time()
+    volt_executor.delete_volume_metadata('volume-0', peer_id)
+    unwatched = (time.time() - start) * 1e6
+
+    base.report('%d parked watchers, %d woken by the removal' %
+                (hosts, woken),
+                [('park one watcher', park),
+                 ('heartbeat', heartbeat),
+                 ('remove a peer and wake its watchers', remove),
+                 ('remove a peer, nobody watching', unwatched)])
+    for watcher in watchers:
+        watcher.kill()
+
+
+if __name__ == '__main__':
+    main()
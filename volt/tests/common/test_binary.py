@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from volt.common import binary
+from volt.tests import base
+
+
+class TestBinary(base.TestCase):
+
+    VALUE = {
+        'peer_id': u'10.0.0.1:vol-\xe9',
+        'parents': [{'host': '10.0.0.2', 'port': 3260, 'lun': -1,
+                     'status': 'OK', 'iqn': 'iqn.2014-01'},
+                    {'host': '10.0.0.3', 'port': 3260, 'lun': 2 ** 40,
+                     'status': None, 'iqn': 'iqn.2014-01'}],
+        'unknown': True,
+        'ratio': 0.25,
+        'empty': [],
+    }
+
+    def test_round_trip(self):
+        self.assertEqual(self.VALUE, binary.loads(binary.dumps(self.VALUE)))
+        for chunk_items in (1, 2, 10):
+            items = [self.VALUE] * 3
+            data = ''.join(binary.iter_dumps(items, chunk_items))
+            self.assertEqual(items, binary.loads(data))
+        self.assertEqual([], binary.loads(''.join(binary.iter_dumps([], 2))))
+
+    def test_repeated_strings_are_referenced(self):
+        data = binary.dumps(self.VALUE)
+        self.assertEqual(binary.HEADER, data[:5])
+        self.assertEqual(1, data.count('iqn.2014-01'))
+        self.assertEqual(0, data.count('status'))
+        self.assertEqual(0, data.count('OK'))
+
+        fragment = binary.fragment(self.VALUE['parents'][0])
+        self.assertIn('iqn.2014-01', fragment)
+        self.assertEqual(self.VALUE['parents'][0],
+                         binary.loads(binary.HEADER + fragment))
+
+    def test_rejects_other_versions_and_truncation(self):
+        data = binary.dumps(self.VALUE)
+        self.assertRaises(ValueError, binary.loads, 'VOLT\x02N')
+        self.assertRaises(ValueError, binary.loads, '{"json": 1}')
+        self.assertRaises(ValueError, binary.loads, data[:-3])
+        self.assertRaises(ValueError, binary.loads, data + 'N')
+        self.assertRaises(TypeError, binary.dumps, object())
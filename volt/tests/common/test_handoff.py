@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import os
+
+import fixtures
+
+from volt.common import handoff
+from volt.executor import impl_btree
+from volt.tests import base
+
+
+class TestHandoff(base.TestCase):
+
+    def setUp(self):
+        super(TestHandoff, self).setUp()
+        self.tempdir = self.useFixture(fixtures.TempDir()).path
+
+    def _use_executor(self, executor):
+        self.useFixture(fixtures.MonkeyPatch(
+            'volt.executor.get_default_executor', lambda: executor))
+
+    def _populate(self, executor, hosts):
+        for host in hosts:
+            executor.get_volume_parents('vol-1', host=host)
+            executor.add_volume_metadata('vol-1', '%s:vol-1' % host,
+                                         host=host, port=3260,
+                                         iqn='iqn.%s' % host, lun=1)
+
+    def test_state_survives_handoff(self):
+        old = impl_btree.BtreeExecutor()
+        self._populate(old, ('10.0.0.1', '10.0.0.2', '10.0.0.3'))
+        self._use_executor(old)
+        path = os.path.join(self.tempdir, 'worker.json')
+        handoff.write_state(path)
+
+        new = impl_btree.BtreeExecutor()
+        self._use_executor(new)
+        self.useFixture(fixtures.EnvironmentVariable(handoff.STATE_FILES_ENV,
+                                                     path))
+        handoff.restore_state()
+
+        self.assertFalse(os.path.exists(path))
+        self.assertNotIn(handoff.STATE_FILES_ENV, os.environ)
+        self.assertEqual(old.volumes['vol-1'].dump(),
+                         new.volumes['vol-1'].dump())
+        self.assertEqual(sorted(old.host_to_volumes),
+                         sorted(new.host_to_volumes))
+
+    def test_merge_keeps_largest_tree_and_latest_heartbeat(self):
+        small = impl_btree.BtreeExecutor()
+        self._populate(small, ('10.0.0.1',))
+        large = impl_btree.BtreeExecutor()
+        self._populate(large, ('10.0.0.1', '10.0.0.2'))
+        large.update_status(host='10.0.0.1')
+
+        state = handoff.merge_states([small.dump_state(),
+                                      large.dump_state()])
+        self.assertEqual(large.dump_state()['volumes'], state['volumes'])
+        self.assertEqual(large.dump_state()['hosts']['10.0.0.1']['timestamp'],
+                         state['hosts']['10.0.0.1']['timestamp'])
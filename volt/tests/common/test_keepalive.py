@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import os
+
+import eventlet
+from eventlet.green import httplib
+import eventlet.wsgi
+from oslo.config import cfg
+
+from volt.common import wsgi
+from volt.tests import base
+
+CONF = cfg.CONF
+
+
+def client_port(environ, start_response):
+    body = str(environ['REMOTE_PORT'])
+    start_response('200 OK', [('Content-Length', str(len(body)))])
+    return [body]
+
+
+class TestKeepAlive(base.TestCase):
+
+    def setUp(self):
+        super(TestKeepAlive, self).setUp()
+        sock = eventlet.listen(('127.0.0.1', 0))
+        server = eventlet.spawn(eventlet.wsgi.server, sock, client_port,
+                                protocol=wsgi.HttpProtocol,
+                                log=open(os.devnull, 'w'))
+        self.addCleanup(server.kill)
+        self.conn = httplib.HTTPConnection('127.0.0.1', sock.getsockname()[1])
+        self.addCleanup(self.conn.close)
+
+    def _get(self):
+        self.conn.request('GET', '/')
+        response = self.conn.getresponse()
+        response.body = response.read()
+        return response
+
+    def test_connection_is_reused(self):
+        first = self._get()
+        sock = self.conn.sock
+        second = self._get()
+        self.assertIsNone(second.getheader('connection'))
+        # Served on the same client socket, not a reconnection
+        self.assertIs(sock, self.conn.sock)
+        self.assertEqual(first.body, second.body)
+
+    def test_connection_closed_after_max_requests(self):
+        CONF.set_override('max_requests_per_connection', 2)
+        self.addCleanup(CONF.clear_override, 'max_requests_per_connection')
+        self.assertIsNone(self._get().getheader('connection'))
+        self.assertEqual('close', self._get().getheader('connection'))
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import json
+import os
+
+import fixtures
+from oslo.config import cfg
+
+from volt.common import context
+from volt.common import policy
+from volt.openstack.common import policy as openstack_policy
+from volt.tests import base
+
+
+class TestSharedEnforcer(base.TestCase):
+
+    def setUp(self):
+        super(TestSharedEnforcer, self).setUp()
+        cfg.CONF([], project='volt')
+        self.addCleanup(cfg.CONF.reset)
+        self.useFixture(fixtures.MonkeyPatch('volt.common.policy._rules',
+                                             None))
+        self.useFixture(fixtures.MonkeyPatch('volt.common.policy._ENFORCER',
+                                             None))
+        self.policy_file = os.path.join(
+            self.useFixture(fixtures.TempDir()).path, 'policy.json')
+        self._write_policy({'context_is_admin': 'role:admin'})
+        cfg.CONF.set_override('policy_file', self.policy_file)
+        cfg.CONF.set_override('policy_reload_interval', 0)
+
+    def _write_policy(self, rules, mtime=None):
+        with open(self.policy_file, 'w') as f:
+            f.write(json.dumps(rules))
+        if mtime is not None:
+            os.utime(self.policy_file, (mtime, mtime))
+
+    def test_contexts_share_the_enforcer(self):
+        first = context.RequestContext(roles=['member'])
+        second = context.RequestContext(roles=['admin'])
+        self.assertIs(first.policy_enforcer, second.policy_enforcer)
+        self.assertIs(policy.get_enforcer(), first.policy_enforcer)
+        self.assertFalse(first.is_admin)
+        self.assertTrue(second.is_admin)
+
+    def test_reload_changes_admin_decision(self):
+        enforcer = policy.get_enforcer()
+        self.assertFalse(enforcer.reload_if_changed())
+        self.assertFalse(context.RequestContext(roles=['operator']).is_admin)
+
+        self._write_policy({'context_is_admin': 'role:operator'},
+                           mtime=os.path.getmtime(self.policy_file) + 10)
+        self.assertTrue(enforcer.reload_if_changed())
+        self.assertTrue(context.RequestContext(roles=['operator']).is_admin)
+        self.assertFalse(context.RequestContext(roles=['admin']).is_admin)
+
+
+class TestCompiledRules(base.TestCase):
+
+    RULES = {
+        'context_is_admin': 'role:admin',
+        'admin_or_member': 'rule:context_is_admin or role:member',
+        'get_volumes': 'rule:admin_or_member and not role:banned',
+        'delete_volume': 'rule:context_is_admin or tenant:%(tenant)s',
+        'owner': 'user:alice',
+        'pinned': 'tenant:t1 and role:member',
+        'literal': "'t1':%(tenant)s",
+        'nobody': '!',
+        'broken': 'rule:missing',
+        'default': 'role:member',
+    }
+
+    def setUp(self):
+        super(TestCompiledRules, self).setUp()
+        self.rules = openstack_policy.Rules.load_json(json.dumps(self.RULES),
+                                                      'default')
+
+    def test_decisions_match_rule_trees(self):
+        compiled = policy.CompiledRules(self.rules, 2)
+        creds = [{'roles': roles, 'user': user, 'tenant': tenant}
+                 for roles in ([], ['Admin'], ['member'], ['member', 'banned'])
+                 for user in ('alice', 'bob') for tenant in ('t1', 't2')]
+        for _round in range(2):
+            for name in list(self.RULES) + ['unknown']:
+                for cred in creds:
+                    target = {'tenant': 't1'}
+                    self.assertEqual(
+                        self.rules[name](target, cred, compiled),
+                        compiled.decide(name, target, cred),
+                        '%s %s' % (name, cred))
+        self.assertEqual(2, len(compiled.decisions))
+        self.assertFalse(compiled.is_memoizable('delete_volume'))
+        self.assertFalse(compiled.is_memoizable('owner'))
+        self.assertTrue(compiled.is_memoizable('get_volumes'))
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import socket
+
+import testtools
+
+from volt.common import wsgi
+from volt.tests import base
+
+
+class TestReusePort(base.TestCase):
+
+    @testtools.skipUnless(hasattr(socket, 'SO_REUSEPORT'),
+                          'SO_REUSEPORT is not supported')
+    def test_workers_bind_the_same_port(self):
+        first = wsgi.listen_reuse_port(('127.0.0.1', 0), socket.AF_INET)
+        self.addCleanup(first.close)
+        second = wsgi.listen_reuse_port(first.getsockname(), socket.AF_INET)
+        self.addCleanup(second.close)
+        self.assertEqual(first.getsockname(), second.getsockname())
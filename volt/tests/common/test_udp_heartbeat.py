@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import datetime
+import socket
+
+import fixtures
+from oslo.config import cfg
+
+from volt.common import stats
+from volt.common import udp_heartbeat
+from volt.common import utils
+from volt.common import wsgi  # noqa
+from volt.executor import impl_btree
+from volt.tests import base
+
+
+class TestUDPHeartbeat(base.TestCase):
+
+    def setUp(self):
+        super(TestUDPHeartbeat, self).setUp()
+        cfg.CONF([], project='volt')
+        self.addCleanup(cfg.CONF.reset)
+        cfg.CONF.set_override('bind_host', '127.0.0.1')
+        stats.reset()
+        self.addCleanup(stats.reset)
+        self.executor = impl_btree.BtreeExecutor()
+        self.executor.get_volume_parents('vol-1', host='127.0.0.1')
+        self.long_ago = datetime.datetime(2014, 1, 1)
+        self.executor.host_to_volumes['127.0.0.1']['timestamp'] = \
+            self.long_ago
+        self.sock = udp_heartbeat.get_socket()
+        self.addCleanup(self.sock.close)
+        self.listener = udp_heartbeat.UDPHeartbeatListener(
+            self.sock, self.executor, 'secret')
+
+    def test_pack(self):
+        datagram = udp_heartbeat.pack('secret', '10.0.0.1', 1000)
+        self.assertEqual(udp_heartbeat.DATAGRAM_SIZE, len(datagram))
+        self.assertEqual(1000, udp_heartbeat.unpack('secret', '10.0.0.1',
+                                                    datagram))
+        self.assertIsNone(udp_heartbeat.unpack('secret', '10.0.0.2',
+                                               datagram))
+        self.assertIsNone(udp_heartbeat.unpack('other', '10.0.0.1',
+                                               datagram))
+        self.assertIsNone(udp_heartbeat.unpack('secret', '10.0.0.1',
+                                               datagram[:-1]))
+
+    def test_pack_without_compare_digest(self):
+        self.useFixture(fixtures.MonkeyPatch(
+            'volt.common.utils.constant_time_compare',
+            utils._compare_digest))
+        self.test_pack()
+
+    def test_refreshes_in_bulk(self):
+        client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.addCleanup(client.close)
+        address = self.sock.getsockname()
+        datagram = udp_heartbeat.pack('secret', '127.0.0.1')
+        client.sendto(datagram, address)
+        # Replayed, forged and malformed datagrams
+        client.sendto(datagram, address)
+        client.sendto(udp_heartbeat.pack('other', '127.0.0.1'), address)
+        client.sendto('VHB1', address)
+
+        datagrams = self.listener.receive()
+        self.assertEqual(4, len(datagrams))
+        self.assertEqual(1, self.listener.process(datagrams))
+        self.assertNotEqual(
+            self.long_ago,
+            self.executor.host_to_volumes['127.0.0.1']['timestamp'])
+        self.assertEqual(4, stats.get('udp_heartbeat.received'))
+        self.assertEqual(3, stats.get('udp_heartbeat.rejected'))
+
+    def test_stale_and_unknown(self):
+        now = 10 ** 12
+        stale = udp_heartbeat.pack('secret', '127.0.0.1', now - 31000)
+        unknown = udp_heartbeat.pack('secret', '10.0.0.9', now)
+        self.assertEqual(0, self.listener.process([(stale, '127.0.0.1'),
+                                                   (unknown, '10.0.0.9')],
+                                                  now=now))
+        self.assertEqual(
+            self.long_ago,
+            self.executor.host_to_volumes['127.0.0.1']['timestamp'])
+        self.assertEqual(1, stats.get('udp_heartbeat.rejected'))
+        self.assertEqual(1, stats.get('udp_heartbeat.unknown'))
+        self.assertEqual({}, self.listener.last_seen)
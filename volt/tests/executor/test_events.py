@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import json
+import os
+import shutil
+import tempfile
+
+import eventlet
+import fixtures
+from oslo.config import cfg
+
+from volt.common import stats
+from volt.executor import events
+from volt.executor import impl_btree
+from volt.tests import base
+
+
+class TestEventStream(base.TestCase):
+
+    def setUp(self):
+        super(TestEventStream, self).setUp()
+        cfg.CONF([], project='volt')
+        self.addCleanup(cfg.CONF.reset)
+        cfg.CONF.set_override('event_batch_interval', 0)
+        stats.reset()
+        self.addCleanup(stats.reset)
+        self.useFixture(fixtures.MonkeyPatch('volt.executor.events.STREAM',
+                                             None))
+        self.executor = impl_btree.BtreeExecutor()
+
+    def _populate(self):
+        for host in ('10.0.0.1', '10.0.0.2', '10.0.0.3'):
+            self.executor.get_volume_parents('vol-1', host=host)
+            self.executor.add_volume_metadata('vol-1', '%s:vol-1' % host,
+                                              host=host, port=3260,
+                                              iqn='iqn', lun=1)
+        self.executor.evict_host('10.0.0.1')
+
+    def test_topology_events(self):
+        events.setup(self.executor)
+        subscriber = events.STREAM.subscribe()
+        self._populate()
+        batch, dropped = events.STREAM.wait(subscriber)
+        self.assertEqual(0, dropped)
+        records = [events.event_dict(entry) for entry in batch]
+        self.assertEqual(range(1, len(records) + 1),
+                         [record['seq'] for record in records])
+        self.assertEqual(['join', 'reparent', 'register', 'status'] * 3 +
+                         ['evict', 'reparent'],
+                         [record['event'] for record in records])
+        self.assertEqual({'volume_id': 'vol-1', 'peer_id': '10.0.0.2:vol-1',
+                          'host': '10.0.0.2', 'old': 'pending', 'new': 'OK'},
+                         dict((key, records[7][key]) for key in
+                              ('volume_id', 'peer_id', 'host', 'old',
+                               'new')))
+        # 10.0.0.3 was the child of the evicted 10.0.0.1
+        self.assertEqual(['10.0.0.1', '10.0.0.3'], records[-1]['hosts'])
+
+    def test_slow_subscribers_drop_batches(self):
+        cfg.CONF.set_override('event_batch_size', 2)
+        cfg.CONF.set_override('event_buffer_size', 3)
+        events.setup(self.executor)
+        slow = events.STREAM.subscribe()
+        self._populate()
+        self.assertEqual(3, len(slow.batches))
+        batch, dropped = events.STREAM.wait(slow)
+        self.assertEqual(14, dropped + len(batch))
+        self.assertTrue(dropped > 0)
+        self.assertEqual(dropped, stats.get('events.dropped'))
+        self.assertEqual('reparent', batch[-1][2])
+
+    def test_file_sink(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        path = os.path.join(tmpdir, 'events.log')
+        cfg.CONF.set_override('event_log_file', path)
+        events.setup(self.executor)
+        self._populate()
+        self.addCleanup(events.STREAM.sink.thread.kill)
+        eventlet.sleep(0)
+        eventlet.sleep(0)
+        with open(path) as log:
+            records = [json.loads(line) for line in log]
+        self.assertEqual(14, len(records))
+        self.assertEqual('evict', records[-2]['event'])
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from volt.common import binary
+from volt.common import exception
+from volt.common import wsgi
+from volt.executor import impl_btree
+from volt.openstack.common import jsonutils
+from volt.tests import base
+
+
+class TestBatches(base.TestCase):
+
+    def setUp(self):
+        super(TestBatches, self).setUp()
+        self.executor = impl_btree.BtreeExecutor()
+
+    def test_batch_query_matches_single_queries(self):
+        single = impl_btree.BtreeExecutor()
+        queries = [('vol-1', None), ('vol-2', None), ('vol-1', None)]
+        for host in ('10.0.0.1', '10.0.0.2', '10.0.0.3'):
+            expected = [single.get_volume_parents(volume_id, host=host)
+                        for volume_id, peer_id in queries]
+            self.assertEqual(expected,
+                             self.executor.get_volumes_parents(queries,
+                                                               host=host))
+
+    def test_batch_query_reports_failures_per_item(self):
+        results = self.executor.get_volumes_parents(
+            [('vol-1', None), (None, None)], host='10.0.0.1')
+        self.assertEqual('10.0.0.1:vol-1', results[0]['peer_id'])
+        self.assertIsInstance(results[1], exception.InvalidParameterValue)
+
+    def _populate(self, executor, count):
+        # Register every peer right after it joined, so that the next one
+        # can be placed below it.
+        for index in range(count):
+            host = '10.0.0.%d' % index
+            executor.get_volume_parents('vol-1', host=host)
+            executor.add_volume_metadata('vol-1', '%s:vol-1' % host,
+                                         host=host)
+
+    def test_batch_remove_matches_single_removals(self):
+        single = impl_btree.BtreeExecutor()
+        self._populate(single, 7)
+        self._populate(self.executor, 7)
+        peers = [('vol-1', '10.0.0.1:vol-1'), ('vol-1', '10.0.0.4:vol-1'),
+                 ('vol-1', 'unknown:vol-1'), ('vol-2', '10.0.0.1:vol-2')]
+        for volume_id, peer_id in peers[:2]:
+            single.delete_volume_metadata(volume_id, peer_id)
+
+        results = self.executor.delete_volumes_metadata(peers)
+
+        self.assertEqual([None, None], results[:2])
+        self.assertIsInstance(results[2], exception.NotFound)
+        self.assertIsInstance(results[3], exception.NotFound)
+        levels = lambda tree: sorted((record['peer_id'], record['level'])
+                                     for record in tree.dump()[1:])
+        self.assertEqual(levels(single.volumes['vol-1']),
+                         levels(self.executor.volumes['vol-1']))
+
+
+class TestIdentity(base.TestCase):
+
+    def setUp(self):
+        super(TestIdentity, self).setUp()
+        self.executor = impl_btree.BtreeExecutor()
+        for index in range(7):
+            host = '10.0.0.%d' % index
+            self.executor.get_volume_parents('vol-1', host=host)
+            self.executor.add_volume_metadata('vol-1', '%s:vol-1' % host,
+                                              host=host, port=3260,
+                                              iqn='iqn.%s' % host, lun=1)
+
+    def test_update_invalidates_cached_identity(self):
+        tree = self.executor.volumes['vol-1']
+        node = tree.nodes['10.0.0.1:vol-1']
+        identity = node.identity()
+        self.assertIs(identity, node.identity())
+
+        tree.update_nodes('10.0.0.1:vol-1', host='10.0.0.1', port=3260,
+                          iqn='iqn.10.0.0.1', lun=1, status='OK')
+        self.assertIs(identity, node.identity())
+
+        tree.update_nodes('10.0.0.1:vol-1', host='10.0.0.1', port=3261,
+                          iqn='iqn.10.0.0.1', lun=1, status='OK')
+        self.assertEqual(3261, node.identity()['port'])
+        self.assertEqual(jsonutils.dumps(dict(node.identity())),
+                         node.identity().encoded)
+
+    def test_serializer_joins_cached_identities(self):
+        serializer = wsgi.JSONResponseSerializer()
+        results = [self.executor.get_volume_parents('vol-1', host='10.0.0.6'),
+                   self.executor.update_status(host='10.0.0.3'),
+                   {'volumes': [dict(self.executor.get_volume_parents(
+                       'vol-1', host='10.0.0.5'), status=200)]},
+                   self.executor.get_volumes_list()]
+        for result in results:
+            self.assertEqual(jsonutils.dumps(result),
+                             serializer.to_json(result))
+
+    def test_binary_encoding_is_lazy(self):
+        result = self.executor.get_volume_parents('vol-1', host='10.0.0.6')
+        identity = result['parents'][0]
+        wsgi.JSONResponseSerializer().to_json(result)
+        self.assertIsNone(identity._binary)
+
+        body = binary.dumps(result)
+        self.assertEqual(binary.fragment(dict(identity)), identity._binary)
+        self.assertEqual(jsonutils.loads(jsonutils.dumps(result)),
+                         binary.loads(body))
+
+
+class TestUncleReparent(base.TestCase):
+
+    def setUp(self):
+        super(TestUncleReparent, self).setUp()
+        self.executor = impl_btree.BtreeWithUncleExecutor()
+        self.hosts = ['10.0.0.%d' % index for index in range(15)]
+        for host in self.hosts:
+            self._register(host, 3260)
+        self.notified = set()
+        self.executor.add_topology_listener(self._listen)
+
+    def _register(self, host, port):
+        self.executor.get_volume_parents('vol-1', host=host)
+        self.executor.add_volume_metadata('vol-1', '%s:vol-1' % host,
+                                          host=host, port=port,
+                                          iqn='iqn', lun=1)
+
+    def _listen(self, event, payload):
+        if event == 'reparent':
+            self.notified.update(payload['hosts'])
+
+    def _parents(self):
+        return dict((host, self.executor.get_volume_parents(
+            'vol-1', host=host)['parents'])
+            for host in self.hosts
+            if self.executor.is_placed('vol-1', host))
+
+    def _assert_notified(self, change):
+        before = self._parents()
+        self.notified.clear()
+        change()
+        after = self._parents()
+        changed = set(host for host in after
+                      if after[host] != before.get(host))
+        self.assertTrue(changed)
+        self.assertEqual(set(), changed - self.notified)
+
+    def test_uncle_changes_are_notified(self):
+        tree = self.executor.volumes['vol-1']
+        # 10.0.0.3 is the uncle of the children of 10.0.0.2
+        self.assertIs(tree.nodes['10.0.0.3:vol-1'],
+                      tree.nodes['10.0.0.2:vol-1'].get_sibling())
+        self._assert_notified(lambda: self._register('10.0.0.3', 3261))
+        # 10.0.0.7 is the uncle of 10.0.0.14
+        self._assert_notified(lambda: self.executor.delete_volume_metadata(
+            'vol-1', '10.0.0.7:vol-1'))
+        self._assert_notified(lambda: self.executor.delete_volume_metadata(
+            'vol-1', '10.0.0.2:vol-1'))
+        self._assert_notified(lambda: self._register('10.0.0.7', 3260))
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import threading
+import urllib2
+from wsgiref import simple_server
+
+import fixtures
+from oslo.config import cfg
+from paste import urlmap
+import webob
+
+from volt.api import auth
+from volt.api.v1 import replication as replication_api
+from volt.api.v1 import router
+from volt.common import exception
+from volt.common import wsgi
+from volt.executor import impl_btree
+from volt.executor import replication
+from volt.tests import base
+
+
+class TestMutationJournal(base.TestCase):
+
+    def setUp(self):
+        super(TestMutationJournal, self).setUp()
+        self.primary = impl_btree.BtreeExecutor()
+        self.journal = replication.MutationJournal(100)
+        self.primary.add_listener(self.journal)
+
+    def _shape(self, tree):
+        """The topology of a tree, leaving out the random fake root."""
+        root_id = tree.root.peer_id
+        return [(r['peer_id'], r['parent_id'] != root_id and r['parent_id'],
+                 r['position'], r['status'])
+                for r in tree.dump()[1:]]
+
+    def _replay(self, follower, since=0):
+        for entry in self.journal.since(since, 1000):
+            replication.apply_entry(follower, entry['event'],
+                                    entry['payload'])
+
+    def test_follower_converges(self):
+        for host in ('10.0.0.1', '10.0.0.2', '10.0.0.3', '10.0.0.4'):
+            self.primary.get_volume_parents('vol-1', host=host)
+            self.primary.add_volume_metadata('vol-1', '%s:vol-1' % host,
+                                             host=host, port=3260,
+                                             iqn='iqn', lun=1)
+        self.primary.delete_volume_metadata('vol-1', '10.0.0.2:vol-1')
+        self.primary.evict_host('10.0.0.3')
+
+        follower = impl_btree.BtreeExecutor()
+        follower.restore_state(impl_btree.BtreeExecutor().dump_state())
+        self._replay(follower)
+
+        self.assertEqual(self._shape(self.primary.volumes['vol-1']),
+                         self._shape(follower.volumes['vol-1']))
+        self.assertEqual(sorted(self.primary.host_to_volumes),
+                         sorted(follower.host_to_volumes))
+        self.assertTrue(follower.is_placed('vol-1', '10.0.0.4'))
+        self.assertFalse(follower.is_placed('vol-1', '10.0.0.3'))
+
+    def test_snapshot_then_journal(self):
+        self.primary.get_volume_parents('vol-1', host='10.0.0.1')
+        follower = impl_btree.BtreeExecutor()
+        follower.restore_state(self.primary.dump_state())
+        seq = self.journal.seq
+
+        self.primary.get_volume_parents('vol-1', host='10.0.0.2')
+        self._replay(follower, since=seq)
+
+        self.assertEqual(self.primary.volumes['vol-1'].dump(),
+                         follower.volumes['vol-1'].dump())
+
+    def test_truncated_journal(self):
+        journal = replication.MutationJournal(2)
+        for index in range(5):
+            journal('evict', {'host': index})
+        self.assertEqual([4, 5], [e['seq'] for e in journal.since(3, 10)])
+        self.assertEqual([], journal.since(5, 10))
+        self.assertRaises(exception.JournalTruncated, journal.since, 1, 10)
+
+    def test_journal_is_admin_only(self):
+        self.useFixture(fixtures.MonkeyPatch(
+            'volt.executor.replication.JOURNAL', self.journal))
+        self.useFixture(fixtures.MonkeyPatch(
+            'volt.executor.get_default_executor', lambda: self.primary))
+        controller = replication_api.Controller()
+        req = webob.Request.blank('/v1/replication/journal')
+        req.context = type('Context', (object,), {'is_admin': False})()
+        self.assertRaises(webob.exc.HTTPForbidden, controller.journal, req)
+        self.assertRaises(webob.exc.HTTPForbidden, controller.snapshot, req)
+        self.assertEqual('primary', controller.status(req)['role'])
+
+        req.context.is_admin = True
+        self.assertEqual(0, controller.journal(req)['seq'])
+
+    def test_journal_needs_a_single_worker(self):
+        replication.check_workers(2)
+        self.useFixture(fixtures.MonkeyPatch(
+            'volt.executor.replication.JOURNAL', self.journal))
+        replication.check_workers(1)
+        self.assertRaises(RuntimeError, replication.check_workers, 2)
+
+
+class _QuietHandler(simple_server.WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def fake_authtoken(application):
+    """Confirms the identity of the administrator holding admin-tok."""
+    def authenticate(environ, start_response):
+        if environ.get('HTTP_X_AUTH_TOKEN') != 'admin-tok':
+            start_response('401 Unauthorized', [('Content-Length', '0')])
+            return []
+        environ['HTTP_X_IDENTITY_STATUS'] = 'Confirmed'
+        environ['HTTP_X_ROLES'] = 'admin'
+        return application(environ, start_response)
+    return authenticate
+
+
+class TestFollower(base.TestCase):
+
+    def setUp(self):
+        super(TestFollower, self).setUp()
+        cfg.CONF([], project='volt')
+        self.addCleanup(cfg.CONF.reset)
+        self.primary = impl_btree.BtreeExecutor()
+        self.useFixture(fixtures.MonkeyPatch(
+            'volt.executor.replication.JOURNAL',
+            replication.MutationJournal(100)))
+        self.primary.add_listener(replication.JOURNAL)
+        self.useFixture(fixtures.MonkeyPatch(
+            'volt.executor.get_default_executor', lambda: self.primary))
+        rootapp = urlmap.URLMap()
+        rootapp['/v1'] = router.API(wsgi.APIMapper())
+        server = simple_server.make_server(
+            '127.0.0.1', 0, fake_authtoken(auth.ContextMiddleware(rootapp)),
+            handler_class=_QuietHandler)
+        self.addCleanup(server.server_close)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(server.shutdown)
+        cfg.CONF.set_override('replication_primary_url',
+                              'http://127.0.0.1:%d' % server.server_port)
+        self.follower = replication.Follower(impl_btree.BtreeExecutor())
+
+    def test_follower_sends_the_admin_token(self):
+        self.primary.get_volume_parents('vol-1', host='10.0.0.1')
+        self.assertRaises(urllib2.HTTPError, self.follower.resync)
+
+        cfg.CONF.set_override('replication_admin_token', 'admin-tok')
+        self.follower.resync()
+        self.primary.get_volume_parents('vol-1', host='10.0.0.2')
+        self.follower.poll()
+
+        self.assertEqual(self.primary.volumes['vol-1'].dump(),
+                         self.follower.executor.volumes['vol-1'].dump())
+        self.assertEqual(self.follower.primary_seq,
+                         self.follower.applied_seq)
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import eventlet
+
+from volt.common import exception
+from volt.common import stats
+from volt.executor import impl_btree
+from volt.executor import singleflight
+from volt.tests import base
+
+
+class TestSingleFlight(base.TestCase):
+
+    def setUp(self):
+        super(TestSingleFlight, self).setUp()
+        stats.reset()
+        self.addCleanup(stats.reset)
+        self.executor = impl_btree.BtreeExecutor()
+        self.calls = []
+        get_volume_parents = self.executor.get_volume_parents
+
+        def slow(volume_id, peer_id=None, host=None):
+            self.calls.append((volume_id, host))
+            # Yields as a flush waiting for a lock
+            eventlet.sleep(0)
+            if volume_id == 'missing':
+                raise exception.NotFound()
+            return get_volume_parents(volume_id, peer_id=peer_id, host=host)
+        self.executor.get_volume_parents = slow
+
+    def _spawn(self, volume_id, host):
+        return eventlet.spawn(singleflight.get_volume_parents, self.executor,
+                              volume_id, host=host)
+
+    def test_coalesced(self):
+        threads = [self._spawn('vol-1', '10.0.0.1') for _i in range(3)]
+        threads.append(self._spawn('vol-1', '10.0.0.2'))
+        results = [thread.wait() for thread in threads]
+
+        self.assertEqual([('vol-1', '10.0.0.1'), ('vol-1', '10.0.0.2')],
+                         self.calls)
+        self.assertIs(results[0], results[1])
+        self.assertIs(results[0], results[2])
+        self.assertNotEqual(results[0]['peer_id'], results[3]['peer_id'])
+        self.assertEqual(2, stats.get('singleflight.coalesced'))
+        self.assertEqual({}, self.executor.flights.calls)
+
+        # Once answered, the next query runs again
+        singleflight.get_volume_parents(self.executor, 'vol-1',
+                                        host='10.0.0.1')
+        self.assertEqual(3, len(self.calls))
+
+    def test_exception_shared(self):
+        threads = [self._spawn('missing', '10.0.0.1') for _i in range(2)]
+        for thread in threads:
+            self.assertRaises(exception.NotFound, thread.wait)
+        self.assertEqual(1, len(self.calls))
+        self.assertEqual({}, self.executor.flights.calls)
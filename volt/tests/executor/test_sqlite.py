@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import os
+import sqlite3
+
+import fixtures
+
+from volt.common import exception
+from volt.executor import impl_sqlite
+from volt.tests import base
+
+
+# The nodes table as created before SCHEMA_VERSION 1
+NODES_V0 = (
+    'CREATE TABLE nodes ('
+    ' volume_id TEXT NOT NULL,'
+    ' peer_id TEXT NOT NULL,'
+    ' seq INTEGER NOT NULL,'
+    ' host,'
+    ' port,'
+    ' iqn,'
+    ' lun,'
+    ' status TEXT,'
+    ' level INTEGER NOT NULL,'
+    ' fake_root INTEGER NOT NULL,'
+    ' parent_id TEXT,'
+    ' position TEXT,'
+    ' PRIMARY KEY (volume_id, peer_id))')
+
+
+class TestSqliteExecutor(base.TestCase):
+
+    def setUp(self):
+        super(TestSqliteExecutor, self).setUp()
+        tempdir = self.useFixture(fixtures.TempDir()).path
+        self.db_path = os.path.join(tempdir, 'executor.sqlite')
+        self.executor = impl_sqlite.SqliteExecutor(db_path=self.db_path)
+
+    def _populate(self):
+        for host in ('10.0.0.1', '10.0.0.2', '10.0.0.3'):
+            self.executor.get_volume_parents('vol-1', host=host)
+            self.executor.add_volume_metadata('vol-1', '%s:vol-1' % host,
+                                              host=host, port=3260,
+                                              iqn='iqn.%s' % host, lun=1)
+        self.executor.flush()
+
+    def test_listing_reads_committed_rows(self):
+        self._populate()
+        reader = impl_sqlite.SqliteExecutor(db_path=self.db_path)
+        self.assertEqual([{'id': 'vol-1', 'count': 4}],
+                         reader.get_volumes_list())
+        hosts = sorted(peer['host'] for peer in
+                       reader.get_volumes_detail('vol-1'))
+        self.assertIn('10.0.0.2', hosts)
+        self.assertEqual(4, len(hosts))
+
+    def test_reload_restores_topology(self):
+        self._populate()
+        tree = self.executor.volumes['vol-1']
+        expected = tree.dump()
+
+        reloaded = impl_sqlite.SqliteExecutor(db_path=self.db_path)
+        self.assertEqual(expected, reloaded.volumes['vol-1'].dump())
+        self.assertEqual(
+            sorted(self.executor.host_to_volumes),
+            sorted(reloaded.host_to_volumes))
+        parents = reloaded.get_volume_parents('vol-1', host='10.0.0.3')
+        self.assertEqual('10.0.0.3:vol-1', parents['peer_id'])
+        self.assertEqual(1, len(parents['parents']))
+
+    def test_delete_is_persisted(self):
+        self._populate()
+        self.executor.delete_volume_metadata('vol-1', '10.0.0.2:vol-1')
+        self.executor.flush()
+
+        reloaded = impl_sqlite.SqliteExecutor(db_path=self.db_path)
+        self.assertNotIn('10.0.0.2:vol-1', reloaded.volumes['vol-1'].nodes)
+        self.assertEqual(
+            {},
+            reloaded.host_to_volumes['10.0.0.2']['volume_list'])
+
+    def test_removal_only_writes_changed_rows(self):
+        for index in range(1, 101):
+            host = '10.0.1.%d' % index
+            self.executor.get_volume_parents('vol-1', host=host)
+            self.executor.add_volume_metadata('vol-1', '%s:vol-1' % host,
+                                              host=host, port=3260,
+                                              iqn='iqn.%s' % host, lun=1)
+        self.executor.flush()
+
+        changes = self.executor.conn.total_changes
+        self.executor.delete_volume_metadata('vol-1', '10.0.1.100:vol-1')
+        self.executor.flush()
+        # The node row, the host_peers row and the host row
+        self.assertEqual(3, self.executor.conn.total_changes - changes)
+
+        reloaded = impl_sqlite.SqliteExecutor(db_path=self.db_path)
+        self.assertEqual(self.executor.volumes['vol-1'].dump(),
+                         reloaded.volumes['vol-1'].dump())
+
+    def test_close_reopens_on_next_use(self):
+        self._populate()
+        self.executor.close()
+        self.assertIsNone(self.executor._conn)
+        self.executor.delete_volume_metadata('vol-1', '10.0.0.2:vol-1')
+        self.executor.flush()
+
+        reader = impl_sqlite.SqliteExecutor(db_path=self.db_path)
+        self.assertEqual([{'id': 'vol-1', 'count': 3}],
+                         reader.get_volumes_list())
+
+    def test_pages_are_read_from_the_database(self):
+        self._populate()
+        self.executor.get_volume_parents('vol-2', host='10.0.0.1')
+        self.executor.flush()
+        reader = impl_sqlite.SqliteExecutor(db_path=self.db_path)
+        self.executor.delete_volume_metadata('vol-1', '10.0.0.2:vol-1')
+        self.executor.flush()
+
+        self.assertEqual([{'id': 'vol-1', 'count': 3},
+                          {'id': 'vol-2', 'count': 2}],
+                         list(reader.iter_volumes()))
+        self.assertEqual([{'id': 'vol-2', 'count': 2}],
+                         list(reader.iter_volumes(marker='vol-1')))
+        self.assertEqual([{'id': 'vol-1', 'count': 1}],
+                         list(reader.iter_volumes(limit=1,
+                                                  host='10.0.0.3')))
+
+        peers = list(reader.iter_volume_peers('vol-1', host='10.0.0.3'))
+        self.assertEqual([{'peer_id': '10.0.0.3:vol-1', 'host': '10.0.0.3',
+                           'port': 3260, 'iqn': 'iqn.10.0.0.3', 'lun': 1,
+                           'status': 'OK'}], peers)
+        peer_ids = [peer['peer_id'] for peer in
+                    reader.iter_volume_peers('vol-1', marker='10.0.0.1:vol-1',
+                                             limit=1, status='OK')]
+        self.assertEqual(['10.0.0.3:vol-1'], peer_ids)
+
+    def test_second_executor_keeps_unknown_rows(self):
+        other = impl_sqlite.SqliteExecutor(db_path=self.db_path)
+        self._populate()
+        # vol-1 was registered after other loaded the file
+        self.assertRaises(exception.NotFound, other.delete_volume_metadata,
+                          'vol-1', '10.0.0.2:vol-1')
+        other.flush()
+
+        reader = impl_sqlite.SqliteExecutor(db_path=self.db_path)
+        self.assertEqual([{'id': 'vol-1', 'count': 4}],
+                         reader.get_volumes_list())
+        self.assertRaises(RuntimeError, self.executor.check_workers, 2)
+        self.executor.check_workers(1)
+
+    def test_upgrade_drops_the_seq_column(self):
+        self._populate()
+        expected = self.executor.volumes['vol-1'].dump()
+        self.executor.close()
+        conn = sqlite3.connect(self.db_path)
+        with conn:
+            conn.execute('DROP TABLE nodes')
+            conn.execute(NODES_V0)
+            for seq, record in enumerate(expected):
+                conn.execute(
+                    'INSERT INTO nodes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, '
+                    '?, ?, ?)', ('vol-1', record['peer_id'], seq) +
+                    tuple(record[column] for column in
+                          impl_sqlite.NODE_COLUMNS[1:]))
+        conn.execute('PRAGMA user_version = 0')
+        conn.close()
+
+        upgraded = impl_sqlite.SqliteExecutor(db_path=self.db_path)
+        self.assertEqual(expected, upgraded.volumes['vol-1'].dump())
+        upgraded.get_volume_parents('vol-1', host='10.0.0.4')
+        upgraded.flush()
+        self.assertEqual([{'id': 'vol-1', 'count': 5}],
+                         upgraded.get_volumes_list())
+        columns = [row[1] for row in
+                   upgraded.conn.execute('PRAGMA table_info(nodes)')]
+        self.assertNotIn('seq', columns)
+        self.assertEqual(impl_sqlite.SCHEMA_VERSION, upgraded.conn.execute(
+            'PRAGMA user_version').fetchone()[0])